@@ -0,0 +1,27 @@
+# System libs
+from functools import lru_cache
+
+# 3rd party
+
+# Local
+
+
+@lru_cache(maxsize=None)
+def s3_client():
+    """
+    One boto3 S3 client per process, built on first use.  Lambda keeps the
+    module loaded between warm invocations, so only the first invocation of
+    a container pays for importing boto3 and building the client.  Clients
+    are thread safe, so the executor threads uploads run on share it too.
+    """
+    import boto3
+
+    return boto3.client("s3")
+
+
+@lru_cache(maxsize=None)
+def lambda_client():
+    """One boto3 Lambda client per process, like s3_client."""
+    import boto3
+
+    return boto3.client("lambda")
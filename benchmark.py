@@ -0,0 +1,290 @@
+"""
+Offline benchmarks of the scrape pipeline, to judge parser and pipeline
+changes by numbers instead of by feel.  Recorded results pages are replayed
+through each parsing stage, listing_parser is timed per listing, and
+fetch_urls is run against the local fake LandWatch server, reporting
+throughput, p50/p99 latency and peak RSS.
+Results are compared with a stored baseline, and any throughput or p50 that
+is worse by more than the tolerance counts as a regression (exit status 1).
+
+    python benchmark.py
+    python benchmark.py --corpus /tmp/landwatch-cache
+    python benchmark.py --save-baseline
+
+The corpus is a directory of .html pages, or the .html.gz pages the local
+response cache saves, so the cache directory of a real run replays as is.
+Baselines only compare on the machine they were saved on.
+"""
+# System libs
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+from pathlib import Path
+import resource
+import sys
+import time
+
+# 3rd party
+
+# Local
+from client_sessions import ClientSessions
+from concurrency import AdaptiveLimiter
+from metrics import percentile
+import scrape_landwatch
+
+
+BASELINE_PATH = Path("benchmark_baseline.json")
+DEFAULT_CORPUS = Path("tests")
+DEFAULT_FETCH_PAGE = Path("tests/county.html")
+REGRESSION_TOLERANCE = 0.2
+PAGE_STAGES = (
+    "parse",
+    "get_location",
+    "get_num_of_results",
+    "gen_paginated_urls",
+    "listing_parser",
+)
+
+
+def load_corpus(corpus_dir):
+    """(name, html) for every recorded page in corpus_dir, by name."""
+    pages = []
+    for path in sorted(Path(corpus_dir).iterdir()):
+        if path.name.endswith(".html"):
+            pages.append((path.name, path.read_text()))
+        elif path.name.endswith(".html.gz"):
+            pages.append((path.name, gzip.decompress(path.read_bytes()).decode()))
+    return pages
+
+
+def latency_summary(latencies):
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def bench_parse(pages, *, parser="soup", repeat=5):
+    """
+    Replay pages through each stage of the parser backend repeat times.
+    A stage that raises on a page (like gen_paginated_urls on a last page
+    with no next link) is counted as a failure and its timing still kept.
+    """
+    backend = scrape_landwatch.get_parser_backend(parser)
+    latencies = {stage: [] for stage in PAGE_STAGES}
+    failures = dict.fromkeys(PAGE_STAGES, 0)
+
+    def timed(stage, func, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        except Exception:
+            failures[stage] += 1
+            return None
+        finally:
+            latencies[stage].append(time.perf_counter() - started)
+
+    num_of_listings = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for name, html in pages:
+            page = timed("parse", backend.parse, html)
+            location = {
+                "landwatchurl": name,
+                "location": timed("get_location", backend.get_location, page),
+            }
+            num_of_results = timed("get_num_of_results", backend.get_num_of_results, page)
+            timed("gen_paginated_urls", backend.gen_paginated_urls, page, num_of_results)
+            rows = backend.result_rows(page)
+            timed(
+                "listing_parser",
+                lambda: [backend.listing_parser(row, location) for row in rows],
+            )
+            num_of_listings += len(rows)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "pages_per_second": round(repeat * len(pages) / elapsed, 2),
+        "listings_per_second": round(num_of_listings / elapsed, 2),
+        "stages": {
+            stage: dict(latency_summary(latencies[stage]), failures=failures[stage])
+            for stage in PAGE_STAGES
+        },
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def bench_listing_parser(pages, *, parser="soup", repeat=20):
+    """
+    Per-listing cost of listing_parser alone: every result row of pages is
+    parsed up front, then run through listing_parser repeat times.
+    """
+    backend = scrape_landwatch.get_parser_backend(parser)
+    rows = []
+    for name, html in pages:
+        location = {"landwatchurl": name, "location": "Benchmark_County-XX"}
+        rows.extend((row, location) for row in backend.result_rows(backend.parse(html)))
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for row, location in rows:
+            listing_started = time.perf_counter()
+            backend.listing_parser(row, location)
+            latencies.append(time.perf_counter() - listing_started)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "listings_per_second": round(repeat * len(rows) / elapsed, 2),
+        "p50_us": round(percentile(latencies, 50) * 1e6, 1),
+        "p99_us": round(percentile(latencies, 99) * 1e6, 1),
+    }
+
+
+class TimedClient:
+    """Wraps a client to record how long each get takes."""
+
+    def __init__(self, client):
+        self.client = client
+        self.latencies = []
+
+    async def get(self, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await self.client.get(url, **kwargs)
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+
+
+class TimedSessions:
+    def __init__(self, sessions):
+        self.sessions = sessions
+        self.timed_clients = {}
+
+    def client(self, proxies):
+        name = getattr(proxies, "name", proxies)
+        if name not in self.timed_clients:
+            self.timed_clients[name] = TimedClient(self.sessions.client(proxies))
+        return self.timed_clients[name]
+
+
+def bench_fetch(html, *, num_of_pages=200, latency=0.01, con_limit=20):
+    """Fetch num_of_pages copies of html from the fake server with fetch_urls."""
+    from tests.fake_landwatch_server import FakeLandwatchServer
+
+    async def run():
+        async with FakeLandwatchServer(html, latency=latency) as server:
+            urls = [server.url(f"/Land/page-{i}") for i in range(num_of_pages)]
+            async with ClientSessions(max_connections=con_limit) as sessions:
+                timed_sessions = TimedSessions(sessions)
+                started = time.perf_counter()
+                await scrape_landwatch.fetch_urls(
+                    urls=urls,
+                    con_limit=con_limit,
+                    tag_check="div",
+                    dict_check={"class": "resultstitle"},
+                    proxies="direct",
+                    sessions=timed_sessions,
+                    limiter=AdaptiveLimiter(initial=con_limit, maximum=con_limit),
+                )
+                elapsed = time.perf_counter() - started
+            return elapsed, timed_sessions.client("direct").latencies, server.bytes_sent
+
+    elapsed, latencies, bytes_sent = asyncio.run(run())
+    return dict(
+        latency_summary(latencies),
+        pages_per_second=round(num_of_pages / elapsed, 2),
+        mb_per_second=round(bytes_sent / elapsed / 2 ** 20, 2),
+        peak_rss_mb=peak_rss_mb(),
+    )
+
+
+def run_benchmarks(
+    pages, fetch_html, *, parsers=("soup", "lxml"), repeat=5, fetch_pages=200, fetch_latency=0.01
+):
+    results = {}
+    for parser in parsers:
+        results[f"parse_{parser}"] = bench_parse(pages, parser=parser, repeat=repeat)
+        results[f"listing_parser_{parser}"] = bench_listing_parser(
+            pages, parser=parser, repeat=repeat * 4
+        )
+    results["fetch"] = bench_fetch(fetch_html, num_of_pages=fetch_pages, latency=fetch_latency)
+    return results
+
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """
+    Regressions of results against baseline: throughputs more than tolerance
+    lower, or p50 latencies of a millisecond or more that are more than
+    tolerance higher.  p99, sub-millisecond p50s and RSS are reported but
+    too noisy on shared machines to fail on.
+    """
+    regressions = []
+    baseline = flatten(baseline)
+    for metric, value in flatten(results).items():
+        before = baseline.get(metric)
+        if not before:
+            continue
+        if metric.endswith("_per_second") and value < before * (1 - tolerance):
+            regressions.append(f"{metric}: {value} vs {before}")
+        elif metric.endswith("p50_ms") and before >= 1 and value > before * (1 + tolerance):
+            regressions.append(f"{metric}: {value} vs {before}")
+    return regressions
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    arg_parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    arg_parser.add_argument("--fetch-page", type=Path, default=DEFAULT_FETCH_PAGE)
+    arg_parser.add_argument("--parser", action="append", choices=("soup", "lxml"))
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--fetch-pages", type=int, default=200)
+    arg_parser.add_argument("--fetch-latency", type=float, default=0.01)
+    arg_parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    arg_parser.add_argument("--save-baseline", action="store_true")
+    arg_parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    args = arg_parser.parse_args(argv)
+    # Per-page fetch logging would dominate what is being measured
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = run_benchmarks(
+        load_corpus(args.corpus),
+        args.fetch_page.read_text(),
+        parsers=args.parser or ("soup", "lxml"),
+        repeat=args.repeat,
+        fetch_pages=args.fetch_pages,
+        fetch_latency=args.fetch_latency,
+    )
+    print(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        return 0
+    regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
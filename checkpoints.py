@@ -0,0 +1,93 @@
+# System libs
+import json
+import os
+from pathlib import Path
+import shutil
+
+# 3rd party
+
+# Local
+from listings import Listing, ListingBatch
+
+
+def encode_page(page_batch):
+    return json.dumps([list(listing) for listing in page_batch]).encode()
+
+
+def decode_page(page_bytes):
+    return ListingBatch(Listing._make(row) for row in json.loads(page_bytes))
+
+
+class LocalCheckpointStore:
+    """
+    Completed pages of a run as one JSON file per page under
+    directory/run_key/.  Files are written to a temporary name and renamed,
+    so a run killed mid-write never leaves a half page behind.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def load(self, run_key):
+        """Completed pages of run_key as {page_num: ListingBatch}."""
+        run_dir = self.directory / run_key
+        if not run_dir.is_dir():
+            return {}
+        return {
+            int(page_path.stem): decode_page(page_path.read_bytes())
+            for page_path in run_dir.glob("*.json")
+        }
+
+    def save_page(self, run_key, page_num, page_batch):
+        run_dir = self.directory / run_key
+        run_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = run_dir / f"{page_num:05d}.json.tmp"
+        tmp_path.write_bytes(encode_page(page_batch))
+        os.replace(tmp_path, run_dir / f"{page_num:05d}.json")
+
+    def clear(self, run_key):
+        shutil.rmtree(self.directory / run_key, ignore_errors=True)
+
+
+class S3CheckpointStore:
+    """
+    Completed pages of a run as one object per page under
+    prefix/run_key/ in bucket.  One small PUT per page keeps saving cheap and
+    needs no read-modify-write of a shared object.
+    """
+
+    def __init__(self, *, s3, bucket, prefix="checkpoints"):
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _run_keys(self, run_key):
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for resp in paginator.paginate(Bucket=self.bucket, Prefix=f"{self.prefix}/{run_key}/"):
+            for s3_object in resp.get("Contents", []):
+                yield s3_object["Key"]
+
+    def load(self, run_key):
+        """Completed pages of run_key as {page_num: ListingBatch}."""
+        pages = {}
+        for key in self._run_keys(run_key):
+            page_num = int(key.rsplit("/", 1)[-1].split(".")[0])
+            body = self.s3.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+            pages[page_num] = decode_page(body)
+        return pages
+
+    def save_page(self, run_key, page_num, page_batch):
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=f"{self.prefix}/{run_key}/{page_num:05d}.json",
+            Body=encode_page(page_batch),
+            ContentType="application/json",
+        )
+
+    def clear(self, run_key):
+        keys = list(self._run_keys(run_key))
+        for i in range(0, len(keys), 1000):
+            self.s3.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": key} for key in keys[i : i + 1000]]},
+            )
@@ -0,0 +1,79 @@
+# System libs
+
+# 3rd party
+
+# Local
+from proxy_providers import ProxyProvider, get_provider
+
+
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE = 10
+DEFAULT_TIMEOUT = 60
+
+
+def proxy_client_kwargs(proxies):
+    """
+    The httpx.AsyncClient settings for a proxy backend, a name or a
+    ProxyProvider (see proxy_providers.get_provider).
+    """
+    return get_provider(proxies).client_kwargs()
+
+
+class ClientSessions:
+    """
+    One pooled httpx.AsyncClient per proxy backend, kept open for a whole
+    scrape run so every page after the first reuses a warm keep-alive
+    connection to the proxy instead of paying a new TCP + TLS handshake.
+
+    httpx is imported when the sessions are made rather than with the
+    module, to keep it out of the handler's cold start import.
+
+    Clients are bound to the event loop they are first used on, so open and
+    close the sessions inside the same asyncio.run call:
+
+        async with ClientSessions(max_connections=10) as sessions:
+            await fetch_urls(..., sessions=sessions)
+    """
+
+    def __init__(
+        self,
+        *,
+        max_connections=DEFAULT_MAX_CONNECTIONS,
+        max_keepalive=DEFAULT_MAX_KEEPALIVE,
+        http2=False,
+        timeout=DEFAULT_TIMEOUT,
+    ):
+        import httpx
+
+        self.pool_limits = httpx.PoolLimits(
+            max_keepalive=max_keepalive, max_connections=max_connections
+        )
+        self.http2 = http2
+        self.timeout = timeout
+        self._clients = {}
+
+    def client(self, proxies):
+        """The client for a provider or provider name, made on first use."""
+        name = proxies.name if isinstance(proxies, ProxyProvider) else proxies
+        if name not in self._clients:
+            import httpx
+
+            self._clients[name] = httpx.AsyncClient(
+                pool_limits=self.pool_limits,
+                http2=self.http2,
+                timeout=self.timeout,
+                **proxy_client_kwargs(proxies),
+            )
+        return self._clients[name]
+
+    async def aclose(self):
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
@@ -0,0 +1,91 @@
+# System libs
+import asyncio
+from contextlib import asynccontextmanager
+import time
+
+# 3rd party
+
+# Local
+
+
+class AdaptiveLimiter:
+    """
+    AIMD (additive increase, multiplicative decrease) limit on concurrent
+    page fetches.  Every healthy fetch grows the limit by increase / limit,
+    so about one extra slot per limit's worth of successes.  A failed fetch
+    (error, 429 or 5xx, failed soup check) multiplies it by decrease_factor.
+    At most one cut per cooldown, so a burst of failures from one overload
+    only counts once.  Fetches slower than slow_latency seconds hold the
+    limit steady rather than growing it.
+
+        limiter = AdaptiveLimiter(initial=10, maximum=50)
+        async with limiter.slot():
+            resp = await client.get(url)
+        limiter.record_success(latency)
+    """
+
+    def __init__(
+        self,
+        *,
+        initial=10,
+        minimum=1,
+        maximum=50,
+        increase=1.0,
+        decrease_factor=0.5,
+        slow_latency=20.0,
+        cooldown=1.0,
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.slow_latency = slow_latency
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.successes = 0
+        self.failures = 0
+        self.last_decrease = float("-inf")
+        self._slot_freed = None
+
+    @property
+    def slots(self):
+        return max(int(self.limit), self.minimum)
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._slot_freed is None:
+            self._slot_freed = asyncio.Condition()
+        async with self._slot_freed:
+            await self._slot_freed.wait_for(lambda: self.in_flight < self.slots)
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._slot_freed:
+                self.in_flight -= 1
+                self._slot_freed.notify_all()
+
+    def record_success(self, latency):
+        self.successes += 1
+        if latency < self.slow_latency:
+            slots = self.slots
+            self.limit = min(self.limit + self.increase / self.limit, self.maximum)
+            if self.slots > slots:
+                self._wake()
+
+    def record_failure(self):
+        self.failures += 1
+        now = time.monotonic()
+        if now - self.last_decrease >= self.cooldown:
+            self.limit = max(self.limit * self.decrease_factor, self.minimum)
+            self.last_decrease = now
+
+    def _wake(self):
+        # A raised limit can let waiting fetchers in before the next release
+        if self._slot_freed is not None and self.in_flight < self.slots:
+            asyncio.ensure_future(self._notify())
+
+    async def _notify(self):
+        async with self._slot_freed:
+            self._slot_freed.notify_all()
@@ -0,0 +1,147 @@
+# System libs
+import csv
+import hashlib
+import io
+import json
+
+# 3rd party
+
+# Local
+from listings import LISTING_FIELDS, Listing
+
+
+# Fields whose change makes a listing count as updated.  location is left
+# out so renaming a location doesn't mark every listing in it as changed.
+CONTENT_FIELDS = tuple(field for field in LISTING_FIELDS if field != "location")
+DELTA_FIELDS = ("change",) + LISTING_FIELDS + ("previous_price",)
+
+NEW = "new"
+PRICE_CHANGE = "price_change"
+UPDATE = "update"
+DELISTED = "delisted"
+
+
+def csv_cell(value):
+    """A value as the csv module writes it, so hashes match CSV round trips."""
+    return "" if value is None else str(value)
+
+
+def content_hash(listing):
+    content = "\x1f".join(
+        csv_cell(getattr(listing, field)) for field in CONTENT_FIELDS
+    ).encode()
+    return hashlib.blake2b(content, digest_size=8).hexdigest()
+
+
+class ListingIndex:
+    """
+    pid -> (price, acres, content hash) for every listing of a location in
+    one run.  Saved next to the run's output and loaded by the next run to
+    work out what changed.  Prices and acres are kept as CSV text, which is
+    how they compare across runs whether they came from a Listing or a CSV.
+    """
+
+    def __init__(self, entries=None):
+        self.entries = entries if entries is not None else {}
+
+    def add(self, listing):
+        self.entries[str(listing.pid)] = (
+            csv_cell(listing.price),
+            csv_cell(listing.acres),
+            content_hash(listing),
+        )
+
+    def __contains__(self, pid):
+        return str(pid) in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, pid):
+        return self.entries.get(str(pid))
+
+    def to_json(self):
+        return json.dumps(self.entries, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, index_json):
+        return cls({pid: tuple(entry) for pid, entry in json.loads(index_json).items()})
+
+    @classmethod
+    def from_csv(cls, csv_text):
+        """Build the index from a previous run's full output CSV."""
+        index = cls()
+        for row in csv.DictReader(io.StringIO(csv_text)):
+            index.add(Listing(**{field: row.get(field) for field in LISTING_FIELDS}))
+        return index
+
+
+class DeltaTracker:
+    """
+    Compares the listings of this run with the previous run's ListingIndex.
+    observe() returns a DELTA_FIELDS row for a new, repriced or otherwise
+    changed listing, or None when it is unchanged.  delisted() gives rows for
+    the previous listings this run never saw.  index is this run's
+    ListingIndex, to save for the next run.
+    """
+
+    def __init__(self, previous_index=None):
+        self.previous_index = previous_index if previous_index is not None else ListingIndex()
+        self.index = ListingIndex()
+
+    def observe(self, listing):
+        if listing.pid in self.index:
+            # Featured listings can show up on more than one page
+            return None
+        self.index.add(listing)
+
+        previous = self.previous_index.get(listing.pid)
+        if previous is None:
+            return (NEW,) + tuple(listing) + (None,)
+        previous_price, previous_acres, previous_hash = previous
+        if previous_price != csv_cell(listing.price):
+            return (PRICE_CHANGE,) + tuple(listing) + (previous_price,)
+        if previous_hash != self.index.get(listing.pid)[2]:
+            return (UPDATE,) + tuple(listing) + (previous_price,)
+        return None
+
+    def delisted(self):
+        for pid, (previous_price, _, _) in self.previous_index.entries.items():
+            if pid not in self.index:
+                row = dict.fromkeys(DELTA_FIELDS)
+                row.update(change=DELISTED, pid=pid, previous_price=previous_price)
+                yield tuple(row.values())
+
+
+def index_s3_key(location):
+    """The latest index of a location; each run replaces it."""
+    return f"index/{location['location']}.json"
+
+
+def load_previous_index(*, s3, bucket, location, previous_csv_key=None):
+    """
+    The index saved by the last run for location.  Without one, fall back
+    to building it from previous_csv_key, a previous run's full CSV, and
+    failing that to an empty index where every listing is new.
+    """
+    try:
+        resp = s3.get_object(Bucket=bucket, Key=index_s3_key(location))
+        return ListingIndex.from_json(resp["Body"].read())
+    except s3.exceptions.NoSuchKey:
+        pass
+    if previous_csv_key is not None:
+        try:
+            resp = s3.get_object(Bucket=bucket, Key=previous_csv_key)
+            return ListingIndex.from_csv(resp["Body"].read().decode())
+        except s3.exceptions.NoSuchKey:
+            pass
+    return ListingIndex()
+
+
+def save_index(*, s3, bucket, location, index):
+    s3.put_object(
+        Bucket=bucket,
+        Key=index_s3_key(location),
+        Body=index.to_json().encode(),
+        ContentType="application/json",
+    )
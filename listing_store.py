@@ -0,0 +1,191 @@
+"""
+SQLite store of scraped listings, one row per listing per scrape date, for
+questions across runs like the cheapest price per acre in a few counties
+over the last month without downloading and re-reading their CSVs.
+
+    with ListingStore("listings.sqlite") as store:
+        store.add_many(listings, scrape_date="2020-01-07")
+        store.cheapest_per_acre(locations=["Osage_County-OK"], since="2019-12-07")
+
+The handlers fill it as they scrape when event["store"] is a path.  On
+Lambda that path is under /tmp and goes with the container, so it is for
+runs on a box of our own, or for loading the CSVs of past runs with
+import_csv.
+"""
+# System libs
+import csv
+import sqlite3
+
+# 3rd party
+
+# Local
+from listings import LISTING_FIELDS, NUMERIC_COLUMNS, Listing, clean_listing
+
+
+# Rows per transaction, so a page or two of listings is one commit
+BATCH_SIZE = 500
+COLUMN_TYPES = {
+    "listing_url": "TEXT NOT NULL",
+    "pid": "INTEGER NOT NULL",
+    "acres": "REAL",
+    "price": "INTEGER",
+    "price_per_acre": "REAL",
+    # Part of the key, so a listing without one is stored under ""
+    "location": "TEXT NOT NULL",
+}
+COLUMNS = ("scrape_date",) + LISTING_FIELDS
+COLUMN_DEFINITIONS = ["scrape_date TEXT NOT NULL"] + [
+    f"{field} {COLUMN_TYPES.get(field, 'TEXT')}" for field in LISTING_FIELDS
+]
+SCHEMA = [
+    # A listing can turn up in overlapping locations, like a county and a
+    # city in it, on the same day, and belongs to each of them
+    f"CREATE TABLE IF NOT EXISTS listings ({', '.join(COLUMN_DEFINITIONS)}, "
+    "PRIMARY KEY (pid, location, scrape_date))",
+    # Lookups by pid use the primary key
+    "CREATE INDEX IF NOT EXISTS listings_location ON listings (location, scrape_date)",
+    "CREATE INDEX IF NOT EXISTS listings_scrape_date ON listings (scrape_date)",
+    "CREATE INDEX IF NOT EXISTS listings_price_per_acre ON listings (price_per_acre)",
+]
+INSERT = (
+    f"INSERT OR REPLACE INTO listings ({', '.join(COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(COLUMNS))})"
+)
+ORDER_BY = ("price_per_acre", "price", "acres", "scrape_date", "pid")
+
+
+def store_row(listing, scrape_date):
+    """
+    The listing as a row of the listings table, with placeholders like
+    "Error" and "CityNotPresent" stored as NULL.
+    """
+    if isinstance(listing, dict):
+        listing = Listing.from_dict(listing)
+    listing = clean_listing(listing)
+    if listing.location is None:
+        listing = listing._replace(location="")
+    return (scrape_date,) + tuple(listing)
+
+
+def listing_from_csv_row(csv_row):
+    """A Listing from a row of a run's CSV, where every value is a string."""
+    values = {field: csv_row.get(field) or None for field in LISTING_FIELDS}
+    for field, (_, python_type) in NUMERIC_COLUMNS.items():
+        try:
+            values[field] = python_type(values[field])
+        except (TypeError, ValueError):
+            pass
+    return Listing(**values)
+
+
+class ListingStore:
+    """
+    Listings in a SQLite database at path.  The database is in WAL mode so
+    queries can run while a scrape is writing.  add() buffers rows and
+    writes them BATCH_SIZE at a time in one transaction; call flush() or
+    close() to write the rest.  Scraping a listing again for the same
+    location on the same date replaces its row.
+    """
+
+    def __init__(self, path, *, batch_size=BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # Safe with WAL; a crash loses at most the last transactions
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+        self.pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, listing, scrape_date):
+        self.pending.append(store_row(listing, scrape_date))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def add_many(self, listings, scrape_date):
+        for listing in listings:
+            self.add(listing, scrape_date)
+        self.flush()
+
+    def flush(self):
+        if self.pending:
+            with self.connection:
+                self.connection.executemany(INSERT, self.pending)
+            self.pending = []
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def import_csv(self, csv_file, scrape_date):
+        """Load the listings of a run's CSV, an open text file, as of scrape_date."""
+        self.add_many(
+            (listing_from_csv_row(csv_row) for csv_row in csv.DictReader(csv_file)), scrape_date
+        )
+
+    def query(
+        self,
+        *,
+        locations=None,
+        since=None,
+        until=None,
+        min_acres=None,
+        max_price_per_acre=None,
+        order_by="price_per_acre",
+        limit=None,
+    ):
+        """
+        Listings as dicts with their scrape_date, filtered by location, an
+        inclusive range of scrape dates (ISO strings) and acreage and price
+        per acre bounds, in order_by order (one of ORDER_BY).
+        """
+        if order_by not in ORDER_BY:
+            raise ValueError(f"Can't order listings by {order_by}")
+        conditions = []
+        params = []
+        if locations is not None:
+            locations = list(locations)
+            conditions.append(f"location IN ({', '.join('?' * len(locations))})")
+            params.extend(locations)
+        for condition, value in (
+            ("scrape_date >= ?", since),
+            ("scrape_date <= ?", until),
+            ("acres >= ?", min_acres),
+            ("price_per_acre <= ?", max_price_per_acre),
+        ):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        if order_by in ("price_per_acre", "price", "acres"):
+            conditions.append(f"{order_by} IS NOT NULL")
+
+        sql = "SELECT * FROM listings"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY {order_by}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self.connection.execute(sql, params)]
+
+    def cheapest_per_acre(self, *, limit=10, **filters):
+        return self.query(order_by="price_per_acre", limit=limit, **filters)
+
+    def price_history(self, pid):
+        """Every scrape of one listing, oldest first."""
+        rows = self.connection.execute(
+            "SELECT * FROM listings WHERE pid = ? ORDER BY scrape_date", (pid,)
+        )
+        return [dict(row) for row in rows]
+
+    def count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
@@ -0,0 +1,229 @@
+# System libs
+from array import array
+import csv
+from typing import NamedTuple, Union
+
+# 3rd party
+
+# Local
+
+
+class Listing(NamedTuple):
+    """
+    One scraped listing, in the column order of the output CSV.  Fields a
+    failed parse never reached are None, which csv writes as an empty cell.
+    """
+
+    listing_url: str
+    pid: int
+    acres: Union[float, int, str, None] = None
+    price: Union[int, None] = None
+    price_per_acre: Union[float, None] = None
+    city: Union[str, None] = None
+    description: Union[str, None] = None
+    location: Union[str, None] = None
+    office_name: Union[str, None] = None
+    office_url: Union[str, None] = None
+    office_status: Union[str, None] = None
+
+    @classmethod
+    def from_dict(cls, listing_dict):
+        return cls(**listing_dict)
+
+
+LISTING_FIELDS = Listing._fields
+
+# Columns kept in typed arrays, with the Python type that fits the typecode
+NUMERIC_COLUMNS = {
+    "pid": ("q", int),
+    "acres": ("d", float),
+    "price": ("q", int),
+    "price_per_acre": ("d", float),
+}
+TEXT_COLUMNS = tuple(field for field in LISTING_FIELDS if field not in NUMERIC_COLUMNS)
+# Placeholders listing_parser writes for a value the listing didn't have
+MISSING_VALUES = frozenset(
+    {
+        "Error",
+        "NotPresent",
+        "CityNotPresent",
+        "DescNotPresent",
+        "OfficeNameNotPresent",
+        "OfficeURLNotPresent",
+        "OfficeStatusBlank",
+    }
+)
+# Listings per Parquet row group, about 2 MB of text before compression
+ROW_GROUP_SIZE = 10000
+
+
+def clean_listing(listing):
+    """
+    The listing with listing_parser's placeholder strings replaced by None,
+    for typed outputs where they'd otherwise land in numeric columns.  The
+    acres = 1 default for a listing without acreage is a real number and
+    can't be told apart from a one acre lot, so it's left as it is.
+    """
+    missing = {
+        field: None
+        for field, value in zip(LISTING_FIELDS, listing)
+        if isinstance(value, str) and value in MISSING_VALUES
+    }
+    return listing._replace(**missing) if missing else listing
+
+
+class ListingBatch:
+    """
+    Column-oriented container of listings.  Text fields are one list per
+    column and numeric fields one array per column, so a page of listings
+    costs a few arrays instead of a dict per listing.
+
+    Values that don't fit a numeric column's type (the acres = 1 default,
+    "Error", None) are kept as-is in a small per-column exceptions dict, so
+    iterating the batch gives back exactly the Listing records appended.
+    """
+
+    __slots__ = ("columns", "exceptions", "length")
+
+    def __init__(self, listings=()):
+        self.columns = {field: [] for field in TEXT_COLUMNS}
+        for field, (typecode, _) in NUMERIC_COLUMNS.items():
+            self.columns[field] = array(typecode)
+        self.exceptions = {field: {} for field in NUMERIC_COLUMNS}
+        self.length = 0
+        self.extend(listings)
+
+    def append(self, listing):
+        if isinstance(listing, dict):
+            listing = Listing.from_dict(listing)
+        for field, value in zip(LISTING_FIELDS, listing):
+            if field in NUMERIC_COLUMNS:
+                typecode, python_type = NUMERIC_COLUMNS[field]
+                if type(value) is not python_type:
+                    self.exceptions[field][self.length] = value
+                    value = 0 if typecode == "q" else float("nan")
+            self.columns[field].append(value)
+        self.length += 1
+
+    def extend(self, listings):
+        for listing in listings:
+            self.append(listing)
+
+    def __len__(self):
+        return self.length
+
+    def column(self, field):
+        """The column's values as Python objects, exceptions included."""
+        values = list(self.columns[field])
+        for index, value in self.exceptions.get(field, {}).items():
+            values[index] = value
+        return values
+
+    def __iter__(self):
+        columns = [self.column(field) for field in LISTING_FIELDS]
+        return (Listing._make(row) for row in zip(*columns))
+
+    def to_csv(self, output_buffer, write_header=True):
+        writer = csv.writer(output_buffer)
+        if write_header:
+            writer.writerow(LISTING_FIELDS)
+        writer.writerows(self)
+        return output_buffer
+
+    def to_numpy(self):
+        """
+        The numeric columns as NumPy arrays.  Exceptions that are numbers
+        (the acres = 1 default) keep their value, anything else is NaN, or
+        -1 in the integer pid column.
+        """
+        import numpy as np
+
+        arrays = {}
+        for field, (typecode, _) in NUMERIC_COLUMNS.items():
+            values = np.frombuffer(self.columns[field], dtype=np.dtype(typecode))
+            if field != "pid":
+                values = values.astype(np.float64)
+            else:
+                values = values.copy()
+            for index, value in self.exceptions[field].items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    values[index] = value
+                else:
+                    values[index] = np.nan if field != "pid" else -1
+            arrays[field] = values
+        return arrays
+
+    def to_arrow(self):
+        """
+        The batch as a pyarrow Table, integer columns as int64 and the others
+        as float64 or string.  Exceptions that aren't numbers are nulls.
+        """
+        import numpy as np
+        import pyarrow as pa
+
+        numeric = self.to_numpy()
+        arrow_columns = {}
+        for field in LISTING_FIELDS:
+            if field in NUMERIC_COLUMNS and NUMERIC_COLUMNS[field][0] == "q":
+                mask = np.zeros(self.length, dtype=bool)
+                for index, value in self.exceptions[field].items():
+                    mask[index] = type(value) is not int
+                values = np.frombuffer(self.columns[field], dtype=np.int64)
+                arrow_columns[field] = pa.array(values, type=pa.int64(), mask=mask)
+            elif field in NUMERIC_COLUMNS:
+                values = numeric[field]
+                arrow_columns[field] = pa.array(
+                    values, type=pa.float64(), mask=np.isnan(values)
+                )
+            else:
+                arrow_columns[field] = pa.array(self.columns[field], type=pa.string())
+        return pa.table(arrow_columns)
+
+    def to_parquet(self, where):
+        import pyarrow.parquet as pq
+
+        pq.write_table(self.to_arrow(), where)
+        return where
+
+
+class ParquetListingWriter:
+    """
+    Writes listings to a Parquet file as they arrive, one row group of
+    row_group_size listings at a time, so memory holds a row group rather
+    than the whole run.  Placeholder strings are written as nulls (see
+    clean_listing) and numeric columns keep their types.  Needs pyarrow.
+    """
+
+    def __init__(self, sink, *, row_group_size=ROW_GROUP_SIZE, compression="zstd"):
+        self.sink = sink
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.batch = ListingBatch()
+        self.writer = None
+        self.rows_written = 0
+
+    def writerow(self, listing):
+        if isinstance(listing, dict):
+            listing = Listing.from_dict(listing)
+        self.batch.append(clean_listing(listing))
+        self.rows_written += 1
+        if len(self.batch) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if self.writer is not None and not len(self.batch):
+            return
+        import pyarrow.parquet as pq
+
+        table = self.batch.to_arrow()
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(
+                self.sink, table.schema, compression=self.compression
+            )
+        self.writer.write_table(table)
+        self.batch = ListingBatch()
+
+    def close(self):
+        # A run without listings still leaves a valid, empty file
+        self.flush()
+        self.writer.close()
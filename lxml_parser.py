@@ -0,0 +1,189 @@
+"""
+lxml implementation of the LandWatch page parsing in scrape_landwatch.
+
+Same functions and the same listing dict schema as the BeautifulSoup ones,
+but documents are built by libxml2 and every field of a result row is pulled
+out by a single precompiled XPath evaluation instead of repeated find calls.
+"""
+# System libs
+import logging
+import math
+import re
+
+# 3rd party
+from lxml import etree, html
+
+# Local
+
+
+BASE_URL = "https://www.landwatch.com"
+REGION_HEADING = "Narrow By State Region"
+
+
+def _has_class(class_name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+FIND_H1 = etree.XPath("(//h1)[1]")
+FIND_H2 = etree.XPath("(//h2)[1]")
+FIND_RESULTSCOUNT = etree.XPath(f"(//span[{_has_class('resultscount')}])[1]")
+FIND_NEXT_LINK = etree.XPath("(//link[@rel='next'])[1]/@href")
+FIND_RESULT_ROWS = etree.XPath(f"//div[{_has_class('result')}]")
+# List headings and map links, in document order
+FIND_COUNTY_LINKS = etree.XPath(f"//span[{_has_class('refsubheading')}] | //a[@mapid]")
+
+# Every node listing_parser needs from a row, in document order, in one pass
+FIND_ROW_FIELDS = etree.XPath(
+    f".//div[{_has_class('propName')}]"
+    f" | .//div[{_has_class('description')}]"
+    f" | .//a[{_has_class('officename')}]"
+    f" | .//div[{_has_class('propertyAgent')}]"
+    " | .//text()[contains(., 'Acre')]"
+)
+FIND_LINK_HREF = etree.XPath("(.//a)[1]/@href")
+CITY_PATTERN = re.compile(r",?[a-zA-Z][a-zA-Z0-9]*,")
+ROW_FIELD_CLASSES = ("propName", "description", "officename", "propertyAgent")
+
+
+def parse_html(page_html):
+    return html.document_fromstring(page_html)
+
+
+def get_location(first_page_doc):
+    """
+    Parse location whatever the input.  Three expected cases are
+    1) County, State 2) Zipcode 3) City, State
+    """
+    location_title = FIND_H1(first_page_doc)[0].text_content()
+    location_clean = location_title.replace(" Land for sale :", "")
+    location_formatted = location_clean.replace(", ", "-").replace(" ", "_")
+
+    breadcrumb_text = FIND_H2(first_page_doc)[0].text_content()
+
+    # libxml2 keeps the indentation between breadcrumb links, so compare the
+    # stripped crumbs.  The zipcode, when present, is the one before "Land".
+    breadcrumbs = [crumb.strip() for crumb in breadcrumb_text.split("\n")]
+    breadcrumbs = [crumb for crumb in breadcrumbs if crumb]
+    zipcode_present = breadcrumbs[-2].isnumeric()
+
+    if zipcode_present:
+        zipcode = breadcrumbs[-2]
+        location_formatted = "-".join((location_formatted, zipcode))
+
+    return location_formatted
+
+
+def get_num_of_results(first_page_doc):
+    resultscount = FIND_RESULTSCOUNT(first_page_doc)
+    if resultscount:
+        resultscount_list = resultscount[0].text_content().split("\xa0")
+        return int(resultscount_list[5].replace(",", ""))
+    else:
+        return 1
+
+
+def gen_paginated_urls(first_page_doc, num_of_results):
+    paginated_urls = []
+    if num_of_results > 15:
+        num_of_pages = math.ceil(num_of_results / 15)
+        pagination_base_url = FIND_NEXT_LINK(first_page_doc)[0][:-1]
+        for i in range(2, num_of_pages + 1):
+            paginated_urls.append(f"{pagination_base_url}{i}")
+    return paginated_urls
+
+
+def get_county_urls(state_page_doc):
+    county_urls = []
+    section = None
+    for node in FIND_COUNTY_LINKS(state_page_doc):
+        if node.tag == "span":
+            section = node.text_content().strip()
+        elif section != REGION_HEADING:
+            county_url = BASE_URL + node.get("href")
+            if county_url not in county_urls:
+                county_urls.append(county_url)
+    return county_urls
+
+
+def result_rows(page_doc):
+    return FIND_RESULT_ROWS(page_doc)
+
+
+def _row_fields(listing_row):
+    """
+    First node of each kind listing_parser reads, keyed by class name, plus
+    the first text node mentioning Acre under "acre_text".
+    """
+    fields = {}
+    for node in FIND_ROW_FIELDS(listing_row):
+        if isinstance(node, str):
+            fields.setdefault("acre_text", node)
+            continue
+        node_classes = node.get("class", "").split()
+        for class_name in ROW_FIELD_CLASSES:
+            if class_name in node_classes:
+                fields.setdefault(class_name, node)
+    return fields
+
+
+def listing_parser(listing_row, location):
+    """
+    lxml counterpart of scrape_landwatch.listing_parser, producing the same
+    dict, including the sentinel values for missing fields.
+    """
+    fields = _row_fields(listing_row)
+    prop_name = fields.get("propName")
+    prop_name_text = prop_name.text_content() if prop_name is not None else None
+
+    listing_dict = {}
+    listing_dict["listing_url"] = BASE_URL + FIND_LINK_HREF(prop_name)[0]
+    listing_dict["pid"] = int(listing_dict["listing_url"].split("/")[-1])
+    try:
+        acre_text = fields.get("acre_text")
+        if acre_text:
+            listing_dict["acres"] = float(acre_text.split("Acre")[0])
+        else:
+            listing_dict["acres"] = 1
+        if prop_name_text is not None:
+            listing_dict["price"] = int(
+                prop_name_text.split("$")[-1].strip().replace(",", "")
+            )
+        else:
+            listing_dict["price"] = 1
+        listing_dict["price_per_acre"] = listing_dict["price"] / listing_dict["acres"]
+
+        if prop_name_text is not None:
+            title_string = prop_name_text.split("$")[0].strip()
+            city = CITY_PATTERN.findall(title_string)
+            listing_dict["city"] = (
+                city[0].replace(",", "") if len(city) == 2 else "CityNotPresent"
+            )
+        else:
+            listing_dict["city"] = "NotPresent"
+        description = fields.get("description")
+        listing_dict["description"] = (
+            description.text_content().strip()
+            if description is not None
+            else "DescNotPresent"
+        )
+
+        listing_dict["location"] = location["location"]
+
+        office_name = fields.get("officename")
+        if office_name is not None:
+            listing_dict["office_name"] = office_name.text_content()
+            listing_dict["office_url"] = BASE_URL + office_name.get("href")
+        else:
+            listing_dict["office_name"] = "OfficeNameNotPresent"
+            listing_dict["office_url"] = "OfficeURLNotPresent"
+
+        office_status = fields.get("propertyAgent")
+        listing_dict["office_status"] = (
+            office_status.text_content().strip().split("\n")[1].strip()
+            if office_status is not None
+            else "OfficeStatusBlank"
+        )
+    except Exception as e:
+        logging.error(f"Error is {e}")
+        listing_dict["acres"] = "Error"
+    return listing_dict
@@ -0,0 +1,199 @@
+"""
+Per-location market summary of a scrape: price, acreage and price per acre
+quantiles, a price per acre histogram, outliers, and per-city and
+per-office aggregates.  Listings are collected into flat arrays as they are
+scraped and the whole summary is computed in one vectorized pass with
+NumPy at the end, so it's written next to the CSV as a JSON sidecar instead
+of by a separate job re-reading it.  Needs numpy.
+"""
+# System libs
+from array import array
+
+# 3rd party
+
+# Local
+from listings import MISSING_VALUES, Listing
+
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+# Price per acre histogram buckets per power of ten
+BUCKETS_PER_DECADE = 4
+# Tukey fences on log price per acre
+OUTLIER_IQRS = 1.5
+MAX_OUTLIERS = 50
+# Largest cities and offices to list aggregates for
+MAX_GROUPS = 25
+
+
+def _present(value):
+    return value is not None and not (isinstance(value, str) and value in MISSING_VALUES)
+
+
+def _round(value):
+    return round(float(value), 2)
+
+
+def _stats(values, np):
+    if not len(values):
+        return {"count": 0}
+    stats = {
+        "count": int(len(values)),
+        "mean": _round(values.mean()),
+        "min": _round(values.min()),
+        "max": _round(values.max()),
+    }
+    for quantile, value in zip(QUANTILES, np.quantile(values, QUANTILES)):
+        stats[f"p{round(quantile * 100)}"] = _round(value)
+    return stats
+
+
+class MarketSummary:
+    """
+    Collects price, acres and price per acre of each listing as it is
+    scraped, then summarizes them with summary().
+
+    listing_parser's placeholders are kept out of the numbers: acres of
+    "Error" (a failed parse) counts under parse_errors, and a listing
+    without acreage, which listing_parser gives the int acres 1 and so a
+    price per acre equal to its price, counts under acres_defaulted and is
+    left out of the acres and price per acre figures.  Parsed acreages are
+    always floats, so a real one acre lot is still counted.  A price of 1,
+    the old default for a missing price, counts under price_missing.
+    """
+
+    def __init__(self):
+        self.pids = array("q")
+        self.prices = array("d")
+        self.acres = array("d")
+        self.prices_per_acre = array("d")
+        self.cities = []
+        self.offices = []
+        self.parse_errors = 0
+        self.acres_defaulted = 0
+        self.price_missing = 0
+
+    def __len__(self):
+        return len(self.pids)
+
+    def add(self, listing):
+        if isinstance(listing, dict):
+            listing = Listing.from_dict(listing)
+        nan = float("nan")
+        price = listing.price
+        acres = listing.acres
+        if not isinstance(acres, (int, float)):
+            self.parse_errors += 1
+            acres = None
+        elif not isinstance(acres, float) and acres == 1 and listing.price_per_acre == price:
+            self.acres_defaulted += 1
+            acres = None
+        if not isinstance(price, int) or price <= 1:
+            self.price_missing += 1
+            price = None
+
+        self.pids.append(listing.pid if isinstance(listing.pid, int) else 0)
+        self.prices.append(nan if price is None else price)
+        self.acres.append(nan if acres is None or acres <= 0 else acres)
+        self.prices_per_acre.append(
+            nan if price is None or acres is None or acres <= 0 else price / acres
+        )
+        self.cities.append(listing.city if _present(listing.city) else None)
+        self.offices.append(listing.office_name if _present(listing.office_name) else None)
+
+    def summary(self):
+        import numpy as np
+
+        pids = np.frombuffer(self.pids, dtype=np.int64)
+        prices = np.frombuffer(self.prices, dtype=np.float64)
+        acres = np.frombuffer(self.acres, dtype=np.float64)
+        prices_per_acre = np.frombuffer(self.prices_per_acre, dtype=np.float64)
+        priced = ~np.isnan(prices_per_acre)
+
+        return {
+            "listings": len(self),
+            "parse_errors": self.parse_errors,
+            "acres_defaulted": self.acres_defaulted,
+            "price_missing": self.price_missing,
+            "price": _stats(prices[~np.isnan(prices)], np),
+            "acres": _stats(acres[~np.isnan(acres)], np),
+            "price_per_acre": _stats(prices_per_acre[priced], np),
+            "price_per_acre_histogram": self._histogram(prices_per_acre[priced], np),
+            "outliers": self._outliers(pids[priced], prices_per_acre[priced], np),
+            "by_city": self._by_group(self.cities, prices_per_acre, np),
+            "by_office": self._by_group(self.offices, prices_per_acre, np),
+        }
+
+    def _histogram(self, prices_per_acre, np):
+        """Counts in log-spaced buckets, as [low, high) edges in dollars."""
+        prices_per_acre = prices_per_acre[prices_per_acre > 0]
+        if not len(prices_per_acre):
+            return []
+        log_values = np.log10(prices_per_acre)
+        low = np.floor(log_values.min() * BUCKETS_PER_DECADE)
+        high = np.floor(log_values.max() * BUCKETS_PER_DECADE) + 1
+        edges = np.arange(low, high + 1) / BUCKETS_PER_DECADE
+        counts, _ = np.histogram(log_values, bins=edges)
+        return [
+            {"low": _round(10 ** low_edge), "high": _round(10 ** high_edge), "count": int(count)}
+            for low_edge, high_edge, count in zip(edges[:-1], edges[1:], counts)
+            if count
+        ]
+
+    def _outliers(self, pids, prices_per_acre, np):
+        """
+        Listings whose price per acre is outside the Tukey fences of its log,
+        since prices per acre spread over orders of magnitude.
+        """
+        positive = prices_per_acre > 0
+        pids, prices_per_acre = pids[positive], prices_per_acre[positive]
+        if len(prices_per_acre) < 4:
+            return []
+        log_values = np.log10(prices_per_acre)
+        q1, q3 = np.quantile(log_values, (0.25, 0.75))
+        fence = OUTLIER_IQRS * (q3 - q1)
+        low = log_values < q1 - fence
+        high = log_values > q3 + fence
+        outside = np.flatnonzero(low | high)
+        # Furthest from the median first
+        outside = outside[np.argsort(-np.abs(log_values[outside] - np.median(log_values)))]
+        return [
+            {
+                "pid": int(pids[index]),
+                "price_per_acre": _round(prices_per_acre[index]),
+                "side": "high" if high[index] else "low",
+            }
+            for index in outside[:MAX_OUTLIERS]
+        ]
+
+    def _by_group(self, names, prices_per_acre, np):
+        """
+        Listing count and mean and median price per acre per name, largest
+        groups first, from one sort of the listings by group and price per
+        acre.  Listings without a name or a price per acre are left out.
+        """
+        names = np.array(["" if name is None else name for name in names], dtype=str)
+        keep = (names != "") & ~np.isnan(prices_per_acre)
+        if not keep.any():
+            return {}
+        group_names, groups = np.unique(names[keep], return_inverse=True)
+        values = prices_per_acre[keep]
+        counts = np.bincount(groups)
+        means = np.bincount(groups, weights=values) / counts
+
+        # Sorted by group then value, each group's median is at its middle
+        order = np.lexsort((values, groups))
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sorted_values = values[order]
+        medians = (
+            sorted_values[starts + (counts - 1) // 2] + sorted_values[starts + counts // 2]
+        ) / 2
+
+        largest = np.argsort(-counts, kind="stable")[:MAX_GROUPS]
+        return {
+            str(group_names[group]): {
+                "listings": int(counts[group]),
+                "price_per_acre_mean": _round(means[group]),
+                "price_per_acre_median": _round(medians[group]),
+            }
+            for group in largest
+        }
@@ -0,0 +1,113 @@
+# System libs
+from collections import defaultdict
+from contextlib import contextmanager
+import json
+import math
+import time
+
+# 3rd party
+
+# Local
+
+
+DEFAULT_NAMESPACE = "landtoolsai"
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of unsorted samples."""
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def metric_unit(name):
+    if name.endswith("_seconds"):
+        return "Seconds"
+    if name.startswith("bytes_"):
+        return "Bytes"
+    return "Count"
+
+
+class ScrapeMetrics:
+    """
+    Counters and per-event samples for one scrape run, filled in by each
+    stage of the pipeline as it goes.  Counters are running totals (fetch
+    attempts, bytes fetched, seconds spent writing CSV rows); samples keep
+    every observation (a page's fetch latency, parse time, rows) so the
+    summary can give percentiles.
+
+        metrics = ScrapeMetrics()
+        with metrics.timer("parse_seconds"):
+            page_batch = parse_page_listings(html, location)
+        metrics.observe("rows_per_page", len(page_batch))
+        metrics.summary()
+    """
+
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.samples = defaultdict(list)
+
+    def add(self, name, amount=1):
+        self.counters[name] += amount
+
+    def observe(self, name, value):
+        self.samples[name].append(value)
+
+    @contextmanager
+    def timer(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def summary(self):
+        """Counters as they are and count/sum/p50/p99/max of every sample."""
+        summary = dict(self.counters)
+        # Every failed attempt was retried or ended the page's fetch
+        summary["retries"] = self.counters["fetch_attempts"] - self.counters["pages_fetched"]
+        for name, values in self.samples.items():
+            summary[name] = {
+                "count": len(values),
+                "sum": round(sum(values), 6),
+                "p50": round(percentile(values, 50), 6),
+                "p99": round(percentile(values, 99), 6),
+                "max": round(max(values), 6),
+            }
+        return summary
+
+    def to_emf(self, *, dimensions=None, properties=None, namespace=DEFAULT_NAMESPACE):
+        """
+        The summary as one CloudWatch Embedded Metric Format log line.
+        Printed from a Lambda, CloudWatch turns it into metrics without any
+        PutMetricData calls.  Samples become name_sum, name_p50, name_p99
+        and name_max metrics.  Keep dimensions low-cardinality, since every
+        combination is billed as its own metrics; properties are logged with
+        the line for Logs Insights without becoming dimensions.
+        """
+        dimensions = dimensions or {}
+        values = {}
+        units = {}
+        for name, value in self.summary().items():
+            if isinstance(value, dict):
+                for stat in ("sum", "p50", "p99", "max"):
+                    values[f"{name}_{stat}"] = value[stat]
+                    units[f"{name}_{stat}"] = metric_unit(name)
+            else:
+                values[name] = value
+                units[name] = metric_unit(name)
+        record = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": namespace,
+                        "Dimensions": [list(dimensions)],
+                        "Metrics": [{"Name": name, "Unit": unit} for name, unit in units.items()],
+                    }
+                ],
+            },
+            **(properties or {}),
+            **dimensions,
+            **values,
+        }
+        return json.dumps(record, separators=(",", ":"))
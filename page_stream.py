@@ -0,0 +1,111 @@
+"""
+Streaming reads of LandWatch results pages that stop once the results
+block has been read.  Everything the scrape needs from a results page, the
+h1/h2 location, the resultscount span and the result rows, comes before
+the end of the div.resultssect block holding the rows, and the footer,
+agent templates and scripts after it are a sixth or more of every page.
+"""
+# System libs
+import codecs
+from html.parser import HTMLParser
+
+# 3rd party
+
+# Local
+
+
+RESULTS_CONTAINER_CLASS = "resultssect"
+
+
+class ResultsEndParser(HTMLParser):
+    """
+    Incremental parser fed a page from the start tag of the results block
+    on.  Counts div depth from there and sets complete when the block's own
+    closing tag arrives.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.div_depth = 0
+        self.complete = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "div":
+            self.div_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag == "div":
+            self.div_depth -= 1
+            if self.div_depth == 0:
+                self.complete = True
+
+
+class ResultsPageReader:
+    """
+    Collects a results page's body chunk by chunk.  feed() returns True once
+    the results block has been closed, after which the rest of the body
+    isn't needed.  Bytes before the results block are only searched for its
+    class name, not parsed, so the HTMLParser runs over the rows alone.
+    """
+
+    def __init__(self, encoding="utf-8"):
+        self.content = bytearray()
+        self.encoding = encoding
+        self.marker = RESULTS_CONTAINER_CLASS.encode()
+        self.parser = None
+        self.decoder = None
+        self.complete = False
+
+    def feed(self, chunk):
+        searched = len(self.content)
+        self.content += chunk
+        if self.complete:
+            return True
+        if self.parser is None:
+            marker_at = self.content.find(self.marker, max(searched - len(self.marker), 0))
+            if marker_at == -1:
+                return False
+            div_at = self.content.rfind(b"<div", 0, marker_at)
+            if div_at == -1:
+                return False
+            self.parser = ResultsEndParser()
+            self.decoder = codecs.getincrementaldecoder(self.encoding)(errors="replace")
+            chunk = bytes(self.content[div_at:])
+        self.parser.feed(self.decoder.decode(chunk))
+        self.complete = self.parser.complete
+        return self.complete
+
+
+class StreamedPage:
+    """
+    What page_fetcher needs of a response, for a body that may end just
+    after the results block.  results_complete is whether the end of the
+    results block was seen.
+    """
+
+    def __init__(self, status_code, content, encoding, results_complete):
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding
+        self.results_complete = results_complete
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors="replace")
+
+
+async def read_results_page(provider, client, url):
+    """
+    Fetch url through provider, reading the body only until the results
+    block has closed.  Leaving the stream early closes the connection
+    rather than returning it to the pool, as the rest of the body is still
+    on its way.  Pages without a results block, like captchas and error
+    pages, are read in full.
+    """
+    async with provider.stream(client, url) as resp:
+        encoding = resp.charset_encoding or "utf-8"
+        reader = ResultsPageReader(encoding)
+        async for chunk in resp.aiter_bytes():
+            if reader.feed(chunk):
+                break
+    return StreamedPage(resp.status_code, bytes(reader.content), encoding, reader.complete)
@@ -0,0 +1,36 @@
+# System libs
+import math
+
+# 3rd party
+
+# Local
+
+
+# What LandWatch shows per results page, for when the first page can't tell
+RESULTS_PER_PAGE = 15
+# Pages after the first to fetch alongside it, before the count is known
+SPECULATIVE_PAGES = 3
+
+
+def page_url(starting_url, page):
+    """
+    URL of results page `page` (counting from 1) of the location whose
+    first page is starting_url.  LandWatch pages a search by appending
+    /page-N, so later pages don't need anything from the first one.
+    """
+    if page == 1:
+        return starting_url
+    return f"{starting_url.rstrip('/')}/page-{page}"
+
+
+def count_pages(num_of_results, first_page_rows=None):
+    """
+    Number of results pages for num_of_results.  The page size is read off
+    the first page when it is full, that is when it holds fewer rows than
+    there are results, and is RESULTS_PER_PAGE otherwise.
+    """
+    if first_page_rows and first_page_rows < num_of_results:
+        results_per_page = first_page_rows
+    else:
+        results_per_page = RESULTS_PER_PAGE
+    return max(math.ceil(num_of_results / results_per_page), 1)
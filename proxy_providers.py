@@ -0,0 +1,266 @@
+# System libs
+import os
+import random
+import time
+
+# 3rd party
+
+# Local
+
+
+SCRAPERAPI_URL = "https://api.scraperapi.com"
+LUMINATI_SUPERPROXY = "zproxy.lum-superproxy.io:22225"
+LUMINATI_HEADERS = {
+    "Origin": "https://www.bing.com",
+    "Referer": "https://www.bing.com",
+    "Accept": "test/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",  # noqa:E501
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": "gzip, deflate, br",
+}
+
+
+class ProxyProvider:
+    """
+    How pages are fetched through one proxy backend.  client_kwargs() is
+    the httpx.AsyncClient settings for the backend and get() fetches a page
+    with a client built from them, or stream() for a streamed response to
+    read as it arrives.  Credentials are read once, when the
+    provider is made, rather than on every request.
+    """
+
+    name = "direct"
+
+    def client_kwargs(self):
+        return {}
+
+    async def get(self, client, url):
+        return await client.get(url)
+
+    def stream(self, client, url):
+        return client.stream("GET", url)
+
+
+class HTTPProxyProvider(ProxyProvider):
+    """A forward proxy at proxy_url, for both http and https pages."""
+
+    def __init__(self, name, proxy_url, *, headers=None, verify=True):
+        self.name = name
+        self.proxy_url = proxy_url
+        self.headers = headers or {}
+        self.verify = verify
+
+    def client_kwargs(self):
+        return {
+            "headers": self.headers,
+            "proxies": {"http": self.proxy_url, "https": self.proxy_url},
+            "verify": self.verify,
+        }
+
+
+class ScraperAPIProvider(ProxyProvider):
+    """scraperapi is an API rather than a forward proxy; the page URL is a parameter."""
+
+    name = "scraperapi"
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key if api_key is not None else os.environ.get("SCRAPER_API_KEY", "")
+
+    async def get(self, client, url):
+        return await client.get(SCRAPERAPI_URL, params=self.params(url))
+
+    def stream(self, client, url):
+        return client.stream("GET", SCRAPERAPI_URL, params=self.params(url))
+
+    def params(self, url):
+        return {"api_key": self.api_key, "url": url}
+
+
+def crawlera_provider(api_key=None):
+    api_key = api_key if api_key is not None else os.environ.get("crawleraAPIKey", "")
+    return HTTPProxyProvider(
+        "crawlera",
+        f"http://{api_key}:@proxy.crawlera.com:8010/",
+        headers={"X-Crawlera-Profile": "desktop"},
+        verify=False,
+    )
+
+
+def luminati_provider(*, customer_id=None, zone=None, password=None, name="luminati"):
+    """
+    A Luminati zone.  Each zone has its own rate limit, so a run can spread
+    across several by giving each a name and its own zone.
+    """
+    customer_id = customer_id or os.environ.get("LUMINATI_CUSTOMER_ID", "")
+    zone = zone or os.environ.get("LUMINATI_DEFAULT_ZONE", "")
+    password = password or os.environ.get("LUMINATI_PASSWORD", "")
+    return HTTPProxyProvider(
+        name,
+        f"http://lum-customer-{customer_id}-zone-{zone}-country-us:{password}@{LUMINATI_SUPERPROXY}",  # noqa:E501
+        headers=LUMINATI_HEADERS,
+        verify=False,
+    )
+
+
+PROVIDERS = {
+    "direct": ProxyProvider,
+    "scraperapi": ScraperAPIProvider,
+    "crawlera": crawlera_provider,
+    "luminati": luminati_provider,
+}
+
+
+def get_provider(proxies):
+    """
+    :param proxies: A ProxyProvider, the name of one (luminati, crawlera,
+        scraperapi, or direct for no proxy), or a dict of a name and settings:
+        {"name": "luminati", "zone": "zone2"} or
+        {"name": "local", "proxy_url": "http://127.0.0.1:8080"}.
+    """
+    if isinstance(proxies, ProxyProvider):
+        return proxies
+    if isinstance(proxies, dict):
+        settings = {key: value for key, value in proxies.items() if key != "weight"}
+        name = settings.pop("name")
+        if "proxy_url" in settings:
+            return HTTPProxyProvider(name, settings.pop("proxy_url"), **settings)
+        if name.startswith("luminati"):
+            return luminati_provider(name=name, **settings)
+        return PROVIDERS[name](**settings)
+    if proxies not in PROVIDERS:
+        raise ValueError(f"Unknown proxies option {proxies}")
+    return PROVIDERS[proxies]()
+
+
+class ProviderHealth:
+    """
+    Recent health of one provider: exponentially weighted failure rate and
+    latency over its last few dozen requests, plus running totals.
+    """
+
+    def __init__(self, decay):
+        self.decay = decay
+        self.failure_rate = 0.0
+        self.latency = None
+        self.requests = 0
+        self.failures = 0
+        self.soup_check_failures = 0
+        self.benched_until = 0.0
+
+    def record(self, *, ok, latency=None, soup_check_failed=False):
+        self.requests += 1
+        self.failures += not ok
+        self.soup_check_failures += soup_check_failed
+        self.failure_rate += self.decay * ((not ok) - self.failure_rate)
+        if latency is not None:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += self.decay * (latency - self.latency)
+
+    def summary(self):
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "soup_check_failures": self.soup_check_failures,
+            "failure_rate": round(self.failure_rate, 3),
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+        }
+
+
+class ProxyBalancer:
+    """
+    Spreads page fetches across providers at random in proportion to their
+    weight, scaled down by each one's recent failure rate.  A provider whose
+    failure rate (errors, 429/5xx, failed soup checks) passes
+    failure_threshold after at least min_requests is benched for cooldown
+    seconds and its share goes to the others.  If every provider is
+    benched the least failing one is still used, so a run never stalls.
+    Health, like ClientSessions' clients, is kept by provider name, so
+    every provider needs its own name, e.g. one per Luminati zone.
+
+        balancer = ProxyBalancer([get_provider("luminati"), get_provider("crawlera")])
+        provider = balancer.choose()
+        ...
+        balancer.record(provider, ok=True, latency=0.8)
+    """
+
+    def __init__(
+        self,
+        providers,
+        *,
+        weights=None,
+        failure_threshold=0.5,
+        min_requests=10,
+        cooldown=30.0,
+        decay=0.1,
+        seed=None,
+    ):
+        self.providers = list(providers)
+        names = [provider.name for provider in self.providers]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"Proxy providers need distinct names: {', '.join(duplicates)}")
+        self.weights = list(weights) if weights is not None else [1.0] * len(self.providers)
+        self.failure_threshold = failure_threshold
+        self.min_requests = min_requests
+        self.cooldown = cooldown
+        self.decay = decay
+        self.health = {provider.name: ProviderHealth(decay) for provider in self.providers}
+        self.random = random.Random(seed)
+
+    @property
+    def name(self):
+        return "+".join(provider.name for provider in self.providers)
+
+    def choose(self):
+        if len(self.providers) == 1:
+            return self.providers[0]
+        now = time.monotonic()
+        candidates = [
+            (provider, weight * (1 - self.health[provider.name].failure_rate))
+            for provider, weight in zip(self.providers, self.weights)
+            if self.health[provider.name].benched_until <= now
+        ]
+        if not candidates:
+            return min(self.providers, key=lambda provider: self.health[provider.name].failure_rate)
+        total = sum(weight for _, weight in candidates)
+        if total <= 0:
+            return self.random.choice(candidates)[0]
+        pick = self.random.uniform(0, total)
+        for provider, weight in candidates:
+            pick -= weight
+            if pick <= 0:
+                return provider
+        return candidates[-1][0]
+
+    def record(self, provider, *, ok, latency=None, soup_check_failed=False):
+        health = self.health[provider.name]
+        health.record(ok=ok, latency=latency, soup_check_failed=soup_check_failed)
+        failing = (
+            health.requests >= self.min_requests and health.failure_rate > self.failure_threshold
+        )
+        if len(self.providers) > 1 and failing and health.benched_until <= time.monotonic():
+            health.benched_until = time.monotonic() + self.cooldown
+            # Back on probation after the cooldown rather than straight benched again
+            health.failure_rate = self.failure_threshold / 2
+
+    def stats(self):
+        return {name: health.summary() for name, health in self.health.items()}
+
+
+def get_proxy_balancer(proxies, **balancer_kwargs):
+    """
+    :param proxies: A ProxyBalancer, which is returned as it is, or one
+        provider or a list of them, as get_provider takes.  Dicts in the list
+        can carry a "weight".
+    """
+    if isinstance(proxies, ProxyBalancer):
+        return proxies
+    if not isinstance(proxies, (list, tuple)):
+        proxies = [proxies]
+    weights = [
+        provider.get("weight", 1.0) if isinstance(provider, dict) else 1.0 for provider in proxies
+    ]
+    return ProxyBalancer(
+        [get_provider(provider) for provider in proxies], weights=weights, **balancer_kwargs
+    )
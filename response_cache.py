@@ -0,0 +1,165 @@
+# System libs
+import gzip
+import hashlib
+import os
+from pathlib import Path
+import shutil
+import tempfile
+import time
+
+# 3rd party
+
+# Local
+
+
+# A day, so a rerun or a parser change the same day re-parses saved pages
+DEFAULT_TTL = 24 * 60 * 60
+# Half of the 512 MB Lambda gives /tmp
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Evicting down to this share of max_bytes leaves room for many puts before
+# the next directory scan
+EVICT_TO = 0.9
+
+
+def cache_key(url):
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+class LocalResponseCache:
+    """
+    Fetched page html gzipped on local disk, one file per URL named by the
+    hash of the URL.  A file's mtime is when the page was stored, which the
+    TTL counts from, and its atime is set whenever the page is read, so once
+    the files add up to more than max_bytes the least recently used go first.
+    """
+
+    def __init__(self, directory, *, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._size = None
+
+    def _path(self, url):
+        return self.directory / f"{cache_key(url)}.html.gz"
+
+    def get(self, url):
+        """The cached html for url, or None when missing or expired."""
+        path = self._path(url)
+        now = time.time()
+        try:
+            stored_at = path.stat().st_mtime
+            if now - stored_at > self.ttl:
+                path.unlink()
+                return None
+            os.utime(path, (now, stored_at))
+            return gzip.decompress(path.read_bytes()).decode()
+        except FileNotFoundError:
+            # Never stored, or evicted by another thread since the stat
+            return None
+
+    def put(self, url, html):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        body = gzip.compress(html.encode())
+        tmp_fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(tmp_fd, "wb") as tmp_file:
+            tmp_file.write(body)
+        os.replace(tmp_path, self._path(url))
+
+        if self._size is None:
+            self._size = sum(size for _, _, size in self._entries())
+        else:
+            self._size += len(body)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        for path in self.directory.glob("*.html.gz"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            yield path, stat, stat.st_size
+
+    def evict(self):
+        """Drop expired pages, then least recently used ones down to EVICT_TO."""
+        now = time.time()
+        entries = []
+        for path, stat, size in self._entries():
+            if now - stat.st_mtime > self.ttl:
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((stat.st_atime, size, path))
+
+        entries.sort()
+        size = sum(size for _, size, _ in entries)
+        for _, entry_size, path in entries:
+            if size <= self.max_bytes * EVICT_TO:
+                break
+            path.unlink(missing_ok=True)
+            size -= entry_size
+        self._size = size
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self._size = None
+
+
+class S3ResponseCache:
+    """
+    Fetched page html gzipped in S3 under prefix/, one object per URL named
+    by the hash of the URL, so every invocation shares it.  The TTL is
+    checked against LastModified on read.  S3 keeps no access times to evict
+    by, so bound its size with a lifecycle rule expiring prefix/ after ttl.
+    """
+
+    def __init__(self, *, s3, bucket, prefix="cache", ttl=DEFAULT_TTL):
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _key(self, url):
+        return f"{self.prefix}/{cache_key(url)}.html.gz"
+
+    def get(self, url):
+        """The cached html for url, or None when missing or expired."""
+        try:
+            resp = self.s3.get_object(Bucket=self.bucket, Key=self._key(url))
+        except self.s3.exceptions.NoSuchKey:
+            return None
+        if time.time() - resp["LastModified"].timestamp() > self.ttl:
+            return None
+        return gzip.decompress(resp["Body"].read()).decode()
+
+    def put(self, url, html):
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=self._key(url),
+            Body=gzip.compress(html.encode()),
+            ContentType="text/html",
+            Metadata={"url": url},
+        )
+
+
+class ChainedResponseCache:
+    """
+    Looks pages up in each cache in turn, copying a hit into the caches
+    before it, and stores new pages in all of them.  Used to keep a local
+    cache in front of S3 so a warm Lambda skips the S3 round trip.
+    """
+
+    def __init__(self, *caches):
+        self.caches = caches
+
+    def get(self, url):
+        for i, cache in enumerate(self.caches):
+            html = cache.get(url)
+            if html is not None:
+                for earlier_cache in self.caches[:i]:
+                    earlier_cache.put(url, html)
+                return html
+        return None
+
+    def put(self, url, html):
+        for cache in self.caches:
+            cache.put(url, html)
@@ -0,0 +1,241 @@
+# System libs
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import io
+
+# 3rd party
+
+# Local
+
+
+# S3 rejects multipart parts under 5 MiB, except the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_MAX_CONCURRENCY = 2
+
+
+class S3MultipartWriter(io.RawIOBase):
+    """
+    Binary file-like object that uploads what is written to it as an S3
+    multipart upload, one part_size part at a time, on background threads.
+    At most max_concurrency parts are in flight, so memory stays around
+    (max_concurrency + 1) * part_size however much is written.
+
+    With blocking=False, write() never waits on S3, so it can be called from
+    the event loop: parts past the limit queue up until the caller awaits
+    drain().  Starting the multipart upload happens on the threads too.
+
+    Nothing is published until complete(), which uploads what's left and
+    completes the upload; output smaller than one part never starts a
+    multipart upload and goes up with a single put_object.  close() without
+    complete(), as when the writer is dropped after a failure and collected,
+    is abort(), so a partial file is never published.
+    """
+
+    def __init__(
+        self,
+        *,
+        s3,
+        bucket,
+        key,
+        part_size=MIN_PART_SIZE,
+        max_concurrency=DEFAULT_MAX_CONCURRENCY,
+        blocking=True,
+        **object_kwargs,
+    ):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.max_concurrency = max_concurrency
+        self.blocking = blocking
+        self.object_kwargs = object_kwargs
+        self.buffer = bytearray()
+        self.bytes_written = 0
+        self.upload_id = None
+        self.upload_started = None
+        self.part_uploads = []
+        self.executor = None
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("write to closed S3MultipartWriter")
+        self.buffer += data
+        self.bytes_written += len(data)
+        while len(self.buffer) >= self.part_size:
+            part = bytes(self.buffer[: self.part_size])
+            del self.buffer[: self.part_size]
+            self._upload_part(part)
+        return len(data)
+
+    def _start_upload(self):
+        resp = self.s3.create_multipart_upload(
+            Bucket=self.bucket, Key=self.key, **self.object_kwargs
+        )
+        self.upload_id = resp["UploadId"]
+        return self.upload_id
+
+    def _send_part(self, part_number, part):
+        return self.s3.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_started.result(),
+            PartNumber=part_number,
+            Body=part,
+        )
+
+    def _in_flight(self):
+        return [upload for upload in self.part_uploads if not upload.done()]
+
+    def _upload_part(self, part):
+        if self.upload_started is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+            # Queued first, so it's running before any part waits on it
+            self.upload_started = self.executor.submit(self._start_upload)
+
+        if self.blocking:
+            # Wait for the oldest part before queueing another past the limit
+            in_flight = self._in_flight()
+            if len(in_flight) >= self.max_concurrency:
+                in_flight[0].result()
+
+        part_number = len(self.part_uploads) + 1
+        self.part_uploads.append(self.executor.submit(self._send_part, part_number, part))
+
+    async def drain(self):
+        """
+        Wait, without blocking the event loop, until at most max_concurrency
+        parts are queued or in flight.  Raises if one of them failed.
+        """
+        in_flight = self._in_flight()
+        while len(in_flight) > self.max_concurrency:
+            await asyncio.wrap_future(in_flight[0])
+            in_flight = self._in_flight()
+
+    def complete(self):
+        if self.closed:
+            raise ValueError("complete on closed S3MultipartWriter")
+        try:
+            if self.upload_started is None:
+                self.s3.put_object(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    Body=bytes(self.buffer),
+                    **self.object_kwargs,
+                )
+            else:
+                if self.buffer:
+                    self._upload_part(bytes(self.buffer))
+                parts = [
+                    {"ETag": upload.result()["ETag"], "PartNumber": part_number}
+                    for part_number, upload in enumerate(self.part_uploads, start=1)
+                ]
+                self.s3.complete_multipart_upload(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    UploadId=self.upload_started.result(),
+                    MultipartUpload={"Parts": parts},
+                )
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self.buffer = bytearray()
+            if self.executor is not None:
+                self.executor.shutdown()
+            super().close()
+
+    def close(self):
+        self.abort()
+
+    def abort(self):
+        if self.closed:
+            # Completed, or already thrown away
+            return
+        if self.upload_started is not None:
+            for upload in self.part_uploads:
+                upload.cancel()
+            self.executor.shutdown()
+            # Nothing to abort if the upload never started
+            if self.upload_id is not None:
+                self.s3.abort_multipart_upload(
+                    Bucket=self.bucket, Key=self.key, UploadId=self.upload_id
+                )
+            self.upload_started = None
+            self.upload_id = None
+        self.buffer = bytearray()
+        super().close()
+
+
+class StreamingCSVUpload:
+    """
+    Text stream for a csv writer that encodes rows to UTF-8, optionally
+    gzips them, and multipart-uploads the result to S3 while rows are still
+    being written.  Use text as the csv writer's file.
+    """
+
+    def __init__(
+        self,
+        *,
+        s3,
+        bucket,
+        key,
+        compress=False,
+        part_size=MIN_PART_SIZE,
+        max_concurrency=DEFAULT_MAX_CONCURRENCY,
+        blocking=True,
+        **object_kwargs,
+    ):
+        if compress:
+            object_kwargs["ContentEncoding"] = "gzip"
+        self.parts = S3MultipartWriter(
+            s3=s3,
+            bucket=bucket,
+            key=key,
+            part_size=part_size,
+            max_concurrency=max_concurrency,
+            blocking=blocking,
+            **object_kwargs,
+        )
+        self.binary = (
+            gzip.GzipFile(fileobj=self.parts, mode="wb") if compress else self.parts
+        )
+        self.text = io.TextIOWrapper(self.binary, encoding="utf-8", newline="")
+
+    async def drain(self):
+        await self.parts.drain()
+
+    def close(self):
+        # Closing text would close the multipart writer, which throws the
+        # upload away, so the layers are flushed and the upload completed
+        # first.  GzipFile writes its trailer on close without closing the
+        # file object it wraps.
+        try:
+            self.text.flush()
+            if self.binary is not self.parts:
+                self.binary.close()
+        except Exception:
+            self.parts.abort()
+            raise
+        self.parts.complete()
+        self.text.close()
+
+    def abort(self):
+        self.parts.abort()
+        try:
+            self.text.close()
+        except ValueError:
+            # Flushing into the aborted writer; there's nothing left to keep
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -1,26 +1,74 @@
 # System libs
 import asyncio
+from collections import namedtuple
 import csv
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+import gzip
+import importlib.util
 import io
+import json
 import logging
 import math
 import os
 import re
+import time
+import uuid
 
 # 3rd party
-from asyncio_pool import AioPool
-import boto3
-from bs4 import BeautifulSoup
-import httpx
-from tenacity import retry, stop_after_attempt
+from tenacity import retry, stop_after_attempt, wait_random_exponential
 
 # Local
+from aws_clients import lambda_client, s3_client
+from checkpoints import LocalCheckpointStore, S3CheckpointStore
+from client_sessions import ClientSessions
+from concurrency import AdaptiveLimiter
+from delta import DELTA_FIELDS, DeltaTracker, load_previous_index, save_index
+from listing_store import ListingStore
+from listings import (
+    LISTING_FIELDS,
+    Listing,
+    ListingBatch,
+    ParquetListingWriter,
+    clean_listing,
+)
+from market_summary import MarketSummary
+from metrics import ScrapeMetrics
+from page_stream import read_results_page
+from pagination import SPECULATIVE_PAGES, count_pages, page_url
+from proxy_providers import get_proxy_balancer
+from response_cache import (
+    DEFAULT_MAX_BYTES,
+    DEFAULT_TTL,
+    ChainedResponseCache,
+    LocalResponseCache,
+    S3ResponseCache,
+)
+from s3_streaming import S3MultipartWriter, StreamingCSVUpload
+from sharding import (
+    SHARD_PAGES,
+    LambdaShardQueue,
+    LocalShardQueue,
+    all_shards_written,
+    merge_shards,
+    plan_shards,
+    shard_key,
+)
 
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 MAX_RETRIES_COUNT = 10
+# Full-jitter exponential backoff between retries of a page, capped at 30s
+RETRY_WAIT = wait_random_exponential(multiplier=0.5, max=30)
+# Concurrent page fetches to start a run with, and the most it may grow to
+CON_LIMIT = 10
+MAX_CON_LIMIT = 50
+# Locations a batch invocation scrapes at the same time
+LOCATION_CONCURRENCY = 4
+# Fetched pages allowed to wait for the parser before fetchers pause
+PAGE_QUEUE_SIZE = 20
+# Heading of a state page's region list, the other list of map links
+REGION_HEADING = "Narrow By State Region"
 
 
 def get_location(first_page_soup):
@@ -71,197 +119,870 @@ def gen_paginated_urls(first_page_soup, num_of_results):
     return paginated_urls
 
 
-async def fetch_urls(*, urls, con_limit, tag_check, dict_check, proxies):
+def marker_check_pattern(tag_check, dict_check):
     """
-    :param proxies: Options are luminati, crawlera, scraperapi
+    Compile a byte-level pattern matching an opening tag_check tag that
+    carries every attribute value in dict_check, e.g. <div class="resultstitle">.
+    It answers the same question as soup.find(tag_check, dict_check) without
+    building a tree, so a page is only ever parsed once, by the caller.
     """
+    attr_lookaheads = b"".join(
+        rb"(?=[^>]*\s%s\s*=\s*[\"']?(?:[^\"'>]*\s)?%s[\s\"'>])"
+        % (re.escape(attr.encode()), re.escape(value.encode()))
+        for attr, value in dict_check.items()
+    )
+    return re.compile(
+        rb"<" + re.escape(tag_check.encode()) + rb"\b" + attr_lookaheads, re.IGNORECASE
+    )
 
-    @retry(stop=stop_after_attempt(MAX_RETRIES_COUNT))
-    async def fetch_url(url, retries=MAX_RETRIES_COUNT):
-        if proxies == "scraperapi":
-            SCRAPER_API_KEY = os.environ.get("SCRAPER_API_KEY", "")
-            SCRAPERAPI_URL = "https://api.scraperapi.com"
-            params = {
-                "api_key": SCRAPER_API_KEY,
-                "url": url,
-            }
-            logging.info(f"Start page fetch for {url}")
-            async with httpx.AsyncClient() as client:
-                resp = await client.get(SCRAPERAPI_URL, timeout=60, params=params)
-        elif proxies == "crawlera":
-            CRAWLERA_API_KEY = os.environ.get("crawleraAPIKey", "")
-
-            proxy = {
-                "http": f"http://{CRAWLERA_API_KEY}:@proxy.crawlera.com:8010/",
-                "https": f"http://{CRAWLERA_API_KEY}:@proxy.crawlera.com:8010/",
-            }
 
-            headers = {"X-Crawlera-Profile": "desktop"}
-            logging.info(f"Start page fetch for {url}")
-
-            async with httpx.AsyncClient(
-                headers=headers, proxies=proxy, verify=False
-            ) as client:
-                resp = await client.get(url, timeout=60)
-        elif proxies == "luminati":
-            LUMINATI_CUSTOMER_ID = os.environ.get("LUMINATI_CUSTOMER_ID", "")
-            LUMINATI_DEFAULT_ZONE = os.environ.get("LUMINATI_DEFAULT_ZONE", "")
-            LUMINATI_PASSWORD = os.environ.get("LUMINATI_PASSWORD", "")
-
-            proxy = {
-                "http": f"http://lum-customer-{LUMINATI_CUSTOMER_ID}-zone-{LUMINATI_DEFAULT_ZONE}-country-us:{LUMINATI_PASSWORD}@zproxy.lum-superproxy.io:22225",  # noqa:E501
-                "https": f"http://lum-customer-{LUMINATI_CUSTOMER_ID}-zone-{LUMINATI_DEFAULT_ZONE}-country-us:{LUMINATI_PASSWORD}@zproxy.lum-superproxy.io:22225",  # noqa:E501
-            }
+def page_fetcher(
+    *,
+    urls,
+    tag_check,
+    dict_check,
+    proxies,
+    sessions,
+    limiter,
+    cache=None,
+    metrics=None,
+    stream_reads=False,
+):
+    """
+    Build the retrying coroutine that fetches one results page and checks
+    it has the expected tag before returning it.  Each attempt goes through
+    the provider the proxies balancer picks (see proxy_providers.py), with
+    that provider's client from sessions, and its outcome is reported back
+    to the balancer.  Every attempt holds a limiter slot and reports how it
+    went back to the limiter; failed attempts are retried after a jittered
+    exponential wait.  With a response cache, pages are looked up there
+    first and pages that pass the check are stored there.  Attempts, their
+    latency and outcome and the bytes fetched are counted in metrics.
+    With stream_reads, results pages are read only up to the end of their
+    results block (see page_stream.py), which is all the parsers use.
+    """
+    marker_check = marker_check_pattern(tag_check, dict_check)
+    balancer = get_proxy_balancer(proxies)
+    if metrics is None:
+        metrics = ScrapeMetrics()
+    # Page numbers for the log lines, without a scan of urls per request
+    url_nums = {url: url_num for url_num, url in enumerate(urls)}
 
-            headers = {
-                "Origin": "https://www.bing.com",
-                "Referer": "https://www.bing.com",
-                "Accept": "test/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",  # noqa:E501
-                "Accept-Language": "en-US,en;q=0.9",
-                "Accept-Encoding": "gzip, deflate, br",
-            }
-            logging.info(f"Start page fetch for #{urls.index(url)} {url}")
-            async with httpx.AsyncClient(
-                headers=headers, proxies=proxy, verify=False
-            ) as client:
-                resp = await client.get(url, timeout=60)
-                logging.info(f"Response received for #{urls.index(url)} {url}")
-        test_soup = BeautifulSoup(resp.text, "html.parser")
-        if test_soup.find(tag_check, dict_check):
+    @retry(stop=stop_after_attempt(MAX_RETRIES_COUNT), wait=RETRY_WAIT)
+    async def fetch_url(url):
+        metrics.add("fetch_attempts")
+        async with limiter.slot():
+            provider = balancer.choose()
+            logging.info(f"Start page fetch for #{url_nums.get(url)} {url} via {provider.name}")
+            started = time.monotonic()
+            try:
+                if stream_reads:
+                    resp = await read_results_page(provider, sessions.client(provider), url)
+                else:
+                    resp = await provider.get(sessions.client(provider), url)
+            except Exception:
+                limiter.record_failure()
+                balancer.record(provider, ok=False)
+                metrics.add("request_errors")
+                raise
+        latency = time.monotonic() - started
+        logging.info(f"Response received for #{url_nums.get(url)} {url}")
+        metrics.observe("fetch_seconds", latency)
+        metrics.add("bytes_fetched", len(resp.content))
+        if stream_reads and resp.results_complete:
+            metrics.add("reads_stopped_early")
+
+        if resp.status_code == 429 or resp.status_code >= 500:
+            limiter.record_failure()
+            balancer.record(provider, ok=False, latency=latency)
+            metrics.add("http_errors")
+            raise ValueError(f"Got {resp.status_code} for {url}")
+        if marker_check.search(resp.content):
+            limiter.record_success(latency)
+            balancer.record(provider, ok=True, latency=latency)
+            metrics.add("pages_fetched")
             return resp.text
         else:
-            print(
-                f"Soup test failed for #{urls.index(url)} {url}. {retries} retries remaining"
+            limiter.record_failure()
+            balancer.record(provider, ok=False, latency=latency, soup_check_failed=True)
+            metrics.add("soup_check_failures")
+            print(f"Soup test failed for #{url_nums.get(url)} {url} via {provider.name}")
+            raise ValueError("Soup test failed")
+
+    if cache is None:
+        return fetch_url
+
+    async def fetch_cached_url(url):
+        loop = asyncio.get_running_loop()
+        html = await loop.run_in_executor(None, cache.get, url)
+        metrics.add("cache_hits" if html is not None else "cache_misses")
+        if html is None:
+            html = await fetch_url(url)
+            await loop.run_in_executor(None, cache.put, url, html)
+        return html
+
+    return fetch_cached_url
+
+
+def default_limiter(con_limit):
+    return AdaptiveLimiter(initial=min(CON_LIMIT, con_limit), maximum=con_limit)
+
+
+async def fetch_urls(
+    *, urls, con_limit, tag_check, dict_check, proxies, sessions=None, limiter=None, cache=None
+):
+    """
+    :param proxies: Options are luminati, crawlera, scraperapi, and direct
+        for no proxy at all, or anything get_proxy_balancer takes to spread
+        fetches across several
+    :param con_limit: Most fetches in flight at once
+    :param sessions: ClientSessions to reuse across calls.  A private one is
+        opened and closed around this call when not given.
+    :param limiter: AdaptiveLimiter to share across calls.  Defaults to one
+        starting at CON_LIMIT and growing to con_limit.
+    :param cache: Response cache (see response_cache.py) to serve pages from
+        and save fetched pages to.
+    """
+    if sessions is None:
+        async with ClientSessions(max_connections=con_limit) as sessions:
+            return await fetch_urls(
+                urls=urls,
+                con_limit=con_limit,
+                tag_check=tag_check,
+                dict_check=dict_check,
+                proxies=proxies,
+                sessions=sessions,
+                limiter=limiter,
+                cache=cache,
             )
-            if retries > 0:
-                retries -= 1
-                raise ValueError(f"Soup test failed.  {retries} retries remaining")
 
-    pool = AioPool(size=con_limit)
-    page_htmls = await pool.map(fetch_url, urls)
+    fetch_url = page_fetcher(
+        urls=urls,
+        tag_check=tag_check,
+        dict_check=dict_check,
+        proxies=proxies,
+        sessions=sessions,
+        limiter=limiter or default_limiter(con_limit),
+        cache=cache,
+    )
+    page_htmls = await asyncio.gather(*(fetch_url(url) for url in urls))
     return page_htmls
 
 
+async def stream_pages(
+    *,
+    urls,
+    tag_check,
+    dict_check,
+    proxies,
+    sessions,
+    limiter,
+    on_page,
+    queue_size,
+    cache=None,
+    metrics=None,
+    prefetched=None,
+    stream_reads=False,
+):
+    """
+    Fetch urls, as many at once as limiter allows, and await
+    on_page(page_num, html) for each page as soon as it arrives, in arrival
+    order.  Pages
+    wait in a queue of at most queue_size, so when on_page falls behind the
+    fetchers stop pulling new urls instead of piling up html in memory.
+    page_num is the position of the url in urls.  prefetched maps page_nums
+    to fetches already under way, whose html is used instead of a new fetch.
+    stream_reads is passed on to page_fetcher.
+    """
+    prefetched = prefetched if prefetched is not None else {}
+    fetch_url = page_fetcher(
+        urls=urls,
+        tag_check=tag_check,
+        dict_check=dict_check,
+        proxies=proxies,
+        sessions=sessions,
+        limiter=limiter,
+        cache=cache,
+        metrics=metrics,
+        stream_reads=stream_reads,
+    )
+    pending_urls = iter(enumerate(urls))
+    page_queue = asyncio.Queue(maxsize=queue_size)
+
+    async def fetch_worker():
+        for page_num, url in pending_urls:
+            if page_num in prefetched:
+                html = await prefetched.pop(page_num)
+            else:
+                html = await fetch_url(url)
+            await page_queue.put((page_num, html))
+
+    async def page_consumer():
+        while True:
+            page = await page_queue.get()
+            if page is None:
+                return
+            await on_page(*page)
+
+    async def fetch_all():
+        await asyncio.gather(*fetchers)
+        await page_queue.put(None)
+
+    consumer = asyncio.ensure_future(page_consumer())
+    fetchers = [
+        asyncio.ensure_future(fetch_worker())
+        for _ in range(min(limiter.maximum, len(urls)))
+    ]
+    producer = asyncio.ensure_future(fetch_all())
+    try:
+        # Wait on both sides: if on_page raises, the consumer is gone and the
+        # fetchers would block on a full queue for good
+        done, _ = await asyncio.wait([producer, consumer], return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            task.result()
+    finally:
+        for task in fetchers + [producer, consumer]:
+            task.cancel()
+
+
+def discard_fetch(fetch):
+    """Cancel a fetch task whose page isn't wanted, and drop any error it had."""
+    fetch.cancel()
+    fetch.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+
+def checkpoint_key(location):
+    """A run is identified by its date and location, like its CSV output."""
+    today_str = str(date.today())
+    return f"{today_str}-{location['location']}"
+
+
+def get_checkpoint_store(event):
+    """
+    :param event: event["checkpoint"] is "s3" to keep checkpoints in the
+        output bucket or "local" to keep them in event["checkpoint_dir"].
+        Anything else means no checkpoints.
+    """
+    if event.get("checkpoint") == "s3":
+        return S3CheckpointStore(s3=s3_client(), bucket=event["bucket"])
+    elif event.get("checkpoint") == "local":
+        return LocalCheckpointStore(
+            event.get("checkpoint_dir", "/tmp/landwatch-checkpoints")
+        )
+    return None
+
+
+def get_response_cache(event):
+    """
+    :param event: event["cache"] is "local" to keep fetched pages in
+        event["cache_dir"], or "s3" to keep them in the output bucket with the
+        local cache in front.  Anything else means no cache.  Pages live for
+        event["cache_ttl"] seconds and the local cache holds at most
+        event["cache_max_bytes"].
+    """
+    if event.get("cache") not in ("local", "s3"):
+        return None
+    ttl = event.get("cache_ttl", DEFAULT_TTL)
+    cache = LocalResponseCache(
+        event.get("cache_dir", "/tmp/landwatch-cache"),
+        ttl=ttl,
+        max_bytes=event.get("cache_max_bytes", DEFAULT_MAX_BYTES),
+    )
+    if event["cache"] == "s3":
+        cache = ChainedResponseCache(
+            cache, S3ResponseCache(s3=s3_client(), bucket=event["bucket"], ttl=ttl)
+        )
+    return cache
+
+
+def get_listing_store(event):
+    """
+    :param event: event["store"] is the path of a SQLite ListingStore (see
+        listing_store.py) to add every listing to as well as the output.
+    """
+    if event.get("store"):
+        return ListingStore(event["store"])
+    return None
+
+
+def get_parse_executor(event):
+    """
+    :param event: event["parse_workers"] is the number of processes to parse
+        pages in, in one pool for every location of the invocation.  The
+        caller shuts it down.
+    """
+    if event.get("parse_workers"):
+        # Deferred, as only batch boxes parse in processes
+        from concurrent.futures import ProcessPoolExecutor
+
+        return ProcessPoolExecutor(max_workers=event["parse_workers"])
+    return None
+
+
+def parse_page_listings(page_html, location, parser="soup"):
+    """
+    Parse one results page straight to a ListingBatch.  A module-level
+    function of plain arguments so it can be shipped to a process pool, and
+    the columnar batch is also what comes back over the pipe.
+    """
+    backend = get_parser_backend(parser)
+    return ListingBatch(
+        backend.listing_parser(listing_row, location)
+        for listing_row in backend.result_rows(backend.parse(page_html))
+    )
+
+
+async def stream_location_listings(
+    location,
+    *,
+    con_limit,
+    proxies,
+    sessions,
+    on_listing,
+    queue_size=PAGE_QUEUE_SIZE,
+    parser="soup",
+    parse_workers=None,
+    parse_executor=None,
+    checkpoints=None,
+    limiter=None,
+    cache=None,
+    metrics=None,
+    speculative_pages=SPECULATIVE_PAGES,
+    stream_reads=False,
+    drain=None,
+    on_location=None,
+):
+    """
+    Scrape every results page for a location and pass each Listing to
+    on_listing, page by page in page order, as pages are fetched and parsed.
+    Fills in location["location"] from the first page.  Returns the number
+    of listings emitted.
+
+    Page URLs come from the starting URL (see pagination.py), so the first
+    speculative_pages pages after the first are fetched at the same time as
+    it.  Once the first page gives the result count, the rest are fetched
+    and speculative fetches past the last page are cancelled.
+
+    :param con_limit: Most page fetches in flight at once
+    :param limiter: AdaptiveLimiter for the page fetches, by default
+        default_limiter(con_limit)
+    :param parser: Parser backend name, see get_parser_backend
+    :param parse_workers: When set, pages are parsed in a ProcessPoolExecutor
+        of this many processes instead of on the event loop.  Meant for
+        multi-core batch boxes; Lambda has no /dev/shm for the pool's queues.
+    :param parse_executor: A pool of parse_workers processes to parse in,
+        shared with other locations, instead of one made for this location
+    :param checkpoints: Checkpoint store (see checkpoints.py).  Every parsed
+        page is saved to it under checkpoint_key(location), and pages already
+        saved there by an earlier, unfinished run are not fetched again.
+    :param cache: Response cache for the page fetches, see page_fetcher
+    :param metrics: ScrapeMetrics to record fetch, parse and checkpoint
+        timings and page and listing counts in
+    :param stream_reads: Read pages only up to the end of their results
+        block, see page_fetcher
+    :param drain: Coroutine function awaited after each page's listings have
+        gone to on_listing, so a consumer that falls behind, like a streaming
+        upload, holds back the fetches without blocking the event loop
+    :param on_location: Coroutine function awaited once location["location"]
+        is known, before any listing goes to on_listing
+    """
+    backend = get_parser_backend(parser)
+    # One balancer for the speculative and remaining fetches, so both see
+    # the same provider health
+    proxies = get_proxy_balancer(proxies)
+    if limiter is None:
+        limiter = default_limiter(con_limit)
+    if metrics is None:
+        metrics = ScrapeMetrics()
+    starting_url = location["landwatchurl"]
+    speculative_urls = [page_url(starting_url, page) for page in range(2, speculative_pages + 2)]
+    fetch_page = page_fetcher(
+        urls=[starting_url] + speculative_urls,
+        tag_check="div",
+        dict_check={"class": "resultstitle"},
+        proxies=proxies,
+        sessions=sessions,
+        limiter=limiter,
+        cache=cache,
+        metrics=metrics,
+        stream_reads=stream_reads,
+    )
+    # Keyed by page number, where the first page is page 0
+    speculative_fetches = {
+        page_num: asyncio.ensure_future(fetch_page(url))
+        for page_num, url in enumerate(speculative_urls, start=1)
+    }
+    executor = owned_executor = None
+    parsing = set()
+
+    try:
+        selected_resp = await fetch_page(starting_url)
+        parse_started = time.perf_counter()
+        first_page_soup = backend.parse(selected_resp)
+        location["location"] = backend.get_location(first_page_soup)
+
+        # Expect location to be something like:
+        # location = {
+        #     "landwatchurl": "https://www.landwatch.com/Oklahoma_land_for_sale/Osage_County/Land",
+        #     "location": "Osage_County-OK",
+        # }
+
+        if on_location is not None:
+            await on_location()
+
+        num_of_results = backend.get_num_of_results(first_page_soup)
+        first_page_rows = backend.result_rows(first_page_soup)
+        num_of_pages = count_pages(num_of_results, len(first_page_rows))
+
+        print(f"{location['location']} Start - {num_of_results} listings")
+        for page_num in [page_num for page_num in speculative_fetches if page_num >= num_of_pages]:
+            discard_fetch(speculative_fetches.pop(page_num))
+            metrics.add("speculative_pages_wasted")
+
+        loop = asyncio.get_running_loop()
+        run_key = checkpoint_key(location)
+        if checkpoints is not None:
+            saved_pages = await loop.run_in_executor(None, checkpoints.load, run_key)
+            # The location may have shrunk since the pages were saved, and a
+            # page already being fetched speculatively is taken fresh
+            checkpointed_pages = {
+                page_num: page_batch
+                for page_num, page_batch in saved_pages.items()
+                if 0 < page_num < num_of_pages and page_num not in speculative_fetches
+            }
+            if checkpointed_pages:
+                print(f"{location['location']} Resuming - {len(checkpointed_pages)} pages saved")
+        else:
+            checkpointed_pages = {}
+
+        counter = 0
+        next_page_num = 0
+        # Parsed pages that arrived ahead of next_page_num, keyed by page number
+        parsed_pages = checkpointed_pages.copy()
+
+        def emit_parsed_pages():
+            nonlocal counter, next_page_num
+            while next_page_num in parsed_pages:
+                page_batch = parsed_pages.pop(next_page_num)
+                for listing in page_batch:
+                    on_listing(listing)
+                counter += len(page_batch)
+                metrics.add("pages")
+                metrics.add("listings", len(page_batch))
+
+                print(
+                    f"{location['location']} Part {next_page_num} complete\nTotal listings: {counter}"
+                )
+                next_page_num += 1
+
+        async def page_parsed(page_num, page_batch):
+            metrics.observe("rows_per_page", len(page_batch))
+            if checkpoints is not None:
+                with metrics.timer("checkpoint_seconds"):
+                    await loop.run_in_executor(
+                        None, checkpoints.save_page, run_key, page_num, page_batch
+                    )
+            parsed_pages[page_num] = page_batch
+            emit_parsed_pages()
+            if drain is not None:
+                await drain()
+
+        parsed_pages[0] = ListingBatch(
+            backend.listing_parser(listing_soup, location) for listing_soup in first_page_rows
+        )
+        metrics.observe("parse_seconds", time.perf_counter() - parse_started)
+        metrics.observe("rows_per_page", len(parsed_pages[0]))
+        del first_page_soup, first_page_rows
+        emit_parsed_pages()
+
+        # Page numbers and urls still to fetch
+        pending_pages = [
+            (page_num, page_url(starting_url, page_num + 1))
+            for page_num in range(1, num_of_pages)
+            if page_num not in checkpointed_pages
+        ]
+        prefetched = {
+            pending_index: speculative_fetches.pop(page_num)
+            for pending_index, (page_num, _) in enumerate(pending_pages)
+            if page_num in speculative_fetches
+        }
+        if parse_executor is not None:
+            executor = parse_executor
+        elif parse_workers:
+            # Deferred, as only batch boxes parse in processes
+            from concurrent.futures import ProcessPoolExecutor
+
+            executor = owned_executor = ProcessPoolExecutor(max_workers=parse_workers)
+
+        async def parse_in_worker(page_num, html):
+            # Includes any wait for a free worker
+            with metrics.timer("parse_seconds"):
+                page_batch = await loop.run_in_executor(
+                    executor, parse_page_listings, html, location, parser
+                )
+            await page_parsed(page_num, page_batch)
+
+        async def parse_page(pending_index, html):
+            nonlocal parsing
+            page_num = pending_pages[pending_index][0]
+            if executor is None:
+                with metrics.timer("parse_seconds"):
+                    page_batch = parse_page_listings(html, location, parser)
+                await page_parsed(page_num, page_batch)
+                return
+
+            # Hold at most two pages per worker so the fetchers still feel
+            # backpressure when the pool falls behind.
+            while len(parsing) >= 2 * parse_workers:
+                done, parsing = await asyncio.wait(
+                    parsing, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    task.result()
+            parsing.add(asyncio.ensure_future(parse_in_worker(page_num, html)))
+
+        await stream_pages(
+            urls=[url for _, url in pending_pages],
+            tag_check="div",
+            dict_check={"class": "resultstitle"},
+            proxies=proxies,
+            sessions=sessions,
+            limiter=limiter,
+            on_page=parse_page,
+            queue_size=queue_size,
+            cache=cache,
+            metrics=metrics,
+            prefetched=prefetched,
+            stream_reads=stream_reads,
+        )
+        if parsing:
+            await asyncio.gather(*parsing)
+    finally:
+        for fetch in speculative_fetches.values():
+            discard_fetch(fetch)
+        for task in parsing:
+            task.cancel()
+        if owned_executor is not None:
+            owned_executor.shutdown(wait=False)
+    return counter
+
+
+async def stream_page_range(
+    location,
+    *,
+    page_nums,
+    con_limit,
+    proxies,
+    sessions,
+    on_listing,
+    queue_size=PAGE_QUEUE_SIZE,
+    parser="soup",
+    limiter=None,
+    cache=None,
+    metrics=None,
+    stream_reads=False,
+):
+    """
+    Scrape results pages page_nums (the first page being 0) of a location
+    whose location["location"] is already known, and pass each Listing to
+    on_listing in page order.  This is a shard worker's part of
+    stream_location_listings.  Returns the number of listings emitted.
+    """
+    if limiter is None:
+        limiter = default_limiter(con_limit)
+    if metrics is None:
+        metrics = ScrapeMetrics()
+    page_nums = list(page_nums)
+    counter = 0
+    next_index = 0
+    # Parsed pages that arrived ahead of next_index, keyed by index in page_nums
+    parsed_pages = {}
+
+    async def parse_page(index, html):
+        nonlocal counter, next_index
+        with metrics.timer("parse_seconds"):
+            parsed_pages[index] = parse_page_listings(html, location, parser)
+        metrics.observe("rows_per_page", len(parsed_pages[index]))
+        while next_index in parsed_pages:
+            page_batch = parsed_pages.pop(next_index)
+            for listing in page_batch:
+                on_listing(listing)
+            counter += len(page_batch)
+            metrics.add("pages")
+            metrics.add("listings", len(page_batch))
+            next_index += 1
+
+    await stream_pages(
+        urls=[page_url(location["landwatchurl"], page_num + 1) for page_num in page_nums],
+        tag_check="div",
+        dict_check={"class": "resultstitle"},
+        proxies=get_proxy_balancer(proxies),
+        sessions=sessions,
+        limiter=limiter,
+        on_page=parse_page,
+        queue_size=queue_size,
+        cache=cache,
+        metrics=metrics,
+        stream_reads=stream_reads,
+    )
+    return counter
+
+
 def convert_resps_to_soups(htmls):
     soups = []
     for html in htmls:
-        soups.extend([BeautifulSoup(html, "html.parser")])
+        soups.extend([parse_soup(html)])
 
     return soups
 
 
+def get_county_urls(state_page_soup):
+    """
+    Starting URLs of the counties in a state page's county list, the links
+    carrying a mapId outside the state region list, in page order without
+    repeats.  The list is told by its place on the page rather than the
+    URLs, which also name parishes and boroughs, and link independent
+    cities by search id.
+    """
+    base_url = "https://www.landwatch.com"
+    county_urls = []
+    section = None
+    for node in state_page_soup.find_all(["span", "a"]):
+        if node.name == "span" and "refsubheading" in node.get("class", []):
+            section = node.get_text(strip=True)
+        elif node.name == "a" and node.has_attr("mapid") and section != REGION_HEADING:
+            county_url = base_url + node["href"]
+            if county_url not in county_urls:
+                county_urls.append(county_url)
+    return county_urls
+
+
+def parse_soup(page_html):
+    # Deferred so runs on the lxml backend never import bs4
+    from bs4 import BeautifulSoup
+
+    return BeautifulSoup(page_html, "html.parser")
+
+
+def soup_result_rows(page_soup):
+    return page_soup.select("div.result")
+
+
+ParserBackend = namedtuple(
+    "ParserBackend",
+    [
+        "parse",
+        "get_location",
+        "get_num_of_results",
+        "gen_paginated_urls",
+        "result_rows",
+        "listing_parser",
+        "get_county_urls",
+    ],
+)
+
+
+def get_parser_backend(name):
+    """
+    :param name: Options are soup (BeautifulSoup with html.parser, the
+        default) and lxml (needs the lxml package).  Both produce the same
+        listing dicts.
+    """
+    if name == "soup":
+        return ParserBackend(
+            parse=parse_soup,
+            get_location=get_location,
+            get_num_of_results=get_num_of_results,
+            gen_paginated_urls=gen_paginated_urls,
+            result_rows=soup_result_rows,
+            listing_parser=listing_parser,
+            get_county_urls=get_county_urls,
+        )
+    elif name == "lxml":
+        import lxml_parser
+
+        return ParserBackend(
+            parse=lxml_parser.parse_html,
+            get_location=lxml_parser.get_location,
+            get_num_of_results=lxml_parser.get_num_of_results,
+            gen_paginated_urls=lxml_parser.gen_paginated_urls,
+            result_rows=lxml_parser.result_rows,
+            listing_parser=lxml_parser.listing_parser,
+            get_county_urls=lxml_parser.get_county_urls,
+        )
+    else:
+        raise ValueError(f"Unknown parser backend {name}")
+
+
+BASE_URL = "https://www.landwatch.com"
+CITY_PATTERN = re.compile(r",?[a-zA-Z][a-zA-Z0-9]*,")
+# Classes of the row nodes listing_parser reads, by tag name
+ROW_FIELD_CLASSES = {
+    "div": ("propName", "description", "propertyAgent"),
+    "a": ("officename",),
+}
+NUM_OF_ROW_FIELDS = 5
+
+
+def soup_row_fields(listing_soup):
+    """
+    First node of each kind listing_parser reads, keyed by class name, plus
+    the first text node mentioning Acre under "acre_text", from one walk of
+    the row that stops once all of them are found.
+    """
+    fields = {}
+    for node in listing_soup.descendants:
+        if isinstance(node, str):
+            if "Acre" in node and "acre_text" not in fields:
+                fields["acre_text"] = node
+        else:
+            for class_name in ROW_FIELD_CLASSES.get(node.name, ()):
+                if class_name not in fields and class_name in node.get("class", ()):
+                    fields[class_name] = node
+        if len(fields) == NUM_OF_ROW_FIELDS:
+            break
+    return fields
+
+
 def listing_parser(listing_soup, location):
     """This takes the soup for an individual property listing and transforms
-    it into the following schema
-    """
-    example_dict = {  # noqa: F841
+    it into the following schema, e.g.
+
+        "listing_url": "https://www.landwatch.com/Coconino-County-Arizona-Land-for-sale/pid/25009439",
         "pid": 25009439,
-        "listing_url": "https://www.landwatch.com/Coconino-County-Arizona-Land-for-sale/pid/25009439",  # noqa: E501
-        "city": "Flagstaff",
-        "state": "AZ",
-        "price": 2800000,
         "acres": 160.00,
-        "description": "JUST REDUCED $310,000! Absolutely beautiful 160 acre parcel completely surrounded by the Coconino National Forest within 2 miles of Flagstaff city limits. ... ",  # noqa: E501
+        "price": 2800000,
+        "price_per_acre": 17500.00,  # this field is calculated
+        "city": "Flagstaff",
+        "description": "JUST REDUCED $310,000! Absolutely beautiful 160 acre parcel ...",
+        "location": "Coconino_County-AZ",
         "office_name": "First United Realty, Inc.",
-        "office_url": "https://www.landwatch.com/default.aspx?ct=r&type=146,157956",  # noqa: E501
+        "office_url": "https://www.landwatch.com/default.aspx?ct=r&type=146,157956",
         "office_status": "Signature Partner",
-        "price_per_acre": 17500.00,  # this field is calculated
-    }
+    """
+    fields = soup_row_fields(listing_soup)
+    prop_name = fields.get("propName")
 
     listing_dict = {}
-    base_url = "https://www.landwatch.com"
-    listing_dict["listing_url"] = (
-        base_url + listing_soup.find("div", {"class": "propName"}).find("a")["href"]
-    )
+    listing_dict["listing_url"] = BASE_URL + prop_name.find("a")["href"]
     listing_dict["pid"] = int(listing_dict["listing_url"].split("/")[-1])
     try:
-        # import pdb; pdb.set_trace()
-        acre_soup = listing_soup.find(text=re.compile(r"Acre"))
-        if acre_soup:
-            acres = float(acre_soup.split("Acre")[0])
-            listing_dict["acres"] = acres
+        acre_text = fields.get("acre_text")
+        if acre_text:
+            listing_dict["acres"] = float(acre_text.split("Acre")[0])
         else:
             listing_dict["acres"] = 1
-        price_soup = listing_soup.find("div", {"class": "propName"})
-        if price_soup:
-            price = int(price_soup.text.split("$")[-1].strip().replace(",", ""))
-            listing_dict["price"] = price
-        else:
-            listing_dict["price"] = 1
+        # The title, city and price all come from the propName text
+        prop_name_parts = prop_name.text.split("$")
+        listing_dict["price"] = int(prop_name_parts[-1].strip().replace(",", ""))
         listing_dict["price_per_acre"] = listing_dict["price"] / listing_dict["acres"]
 
-        title_soup = listing_soup.find("div", {"class": "propName"})
-        if title_soup:
-            title_string = title_soup.text.split("$")[0].strip()
-            city = re.findall(r",?[a-zA-Z][a-zA-Z0-9]*,", title_string)
-            listing_dict["city"] = (
-                city[0].replace(",", "") if len(city) == 2 else "CityNotPresent"
-            )
-        else:
-            listing_dict["city"] = "NotPresent"
-        description = listing_soup.find("div", {"class": "description"})
+        city = CITY_PATTERN.findall(prop_name_parts[0].strip())
+        listing_dict["city"] = city[0].replace(",", "") if len(city) == 2 else "CityNotPresent"
+        description = fields.get("description")
         listing_dict["description"] = (
             description.text.strip() if description else "DescNotPresent"
         )
 
         listing_dict["location"] = location["location"]
 
-        office_name = listing_soup.find("a", {"class": "officename"})
-        listing_dict["office_name"] = (
-            office_name.text if office_name else "OfficeNameNotPresent"
-        )  # noqa: E501
-
-        office_rel_url_bs = listing_soup.find("a", {"class": "officename"})
-        if office_rel_url_bs:
-            office_url = base_url + office_rel_url_bs["href"]
-            listing_dict["office_url"] = office_url
+        office_name = fields.get("officename")
+        if office_name:
+            listing_dict["office_name"] = office_name.text
+            listing_dict["office_url"] = BASE_URL + office_name["href"]
         else:
+            listing_dict["office_name"] = "OfficeNameNotPresent"
             listing_dict["office_url"] = "OfficeURLNotPresent"
 
-        office_status = listing_soup.find("div", {"class": "propertyAgent"})
+        office_status = fields.get("propertyAgent")
         listing_dict["office_status"] = (
             office_status.text.strip().split("\n")[1].strip()
             if office_status
             else "OfficeStatusBlank"
         )
     except Exception as e:
-        logging.ERROR(f"Error is {e}")
+        logging.error(f"Error is {e}")
         listing_dict["acres"] = "Error"
     return listing_dict
 
 
+class ListingCSVWriter:
+    """
+    Writes listings (Listing records or listing dicts) to an in-memory CSV
+    one at a time as they are parsed, under a LISTING_FIELDS header.  Other
+    row tuples, like delta rows, can be written under their own fieldnames.
+    """
+
+    def __init__(self, output_buffer=None, fieldnames=LISTING_FIELDS):
+        self.output_buffer = output_buffer if output_buffer is not None else io.StringIO()
+        self.writer = csv.writer(self.output_buffer)
+        self.fieldnames = fieldnames
+        self.rows_written = 0
+
+    def writerow(self, listing):
+        if self.rows_written == 0:
+            self.writer.writerow(self.fieldnames)
+        if isinstance(listing, dict):
+            listing = Listing.from_dict(listing)
+        self.writer.writerow(listing)
+        self.rows_written += 1
+
+
 def write_to_csv_in_buffer(dicts):
-    fieldnames = list(dicts[0].keys())
-    output_buffer = io.StringIO()
-    writer = csv.DictWriter(output_buffer, fieldnames=fieldnames)
-    writer.writeheader()
-    writer.writerows(dicts)
+    csv_writer = ListingCSVWriter()
+    for listing_dict in dicts:
+        csv_writer.writerow(listing_dict)
 
-    return output_buffer
+    return csv_writer.output_buffer
 
 
-def upload_csv_to_s3(*, in_mem_csv, location, BUCKET):
-    # Used this StackOverflow answer
-    # https://stackoverflow.com/questions/45699905/csv-file-upload-from-buffer-to-s3
+def csv_s3_key(location, compress=False, suffix=""):
+    s3_csv_key = f"{checkpoint_key(location)}{suffix}.csv"
+    return f"{s3_csv_key}.gz" if compress else s3_csv_key
 
-    today_str = str(date.today())
-    s3_csv_key = f"{today_str}-{location['location']}.csv"
-    csv_as_bytes = io.BytesIO(in_mem_csv.getvalue().encode())
 
-    # AWS_ACCESS_KEY_ID = os.environ.get("AWS_ACCESS_KEY_ID", "")
-    # AWS_SECRET_ACCESS_KEY = os.environ.get("AWS_SECRET_ACCESS_KEY", "")
+def parquet_s3_key(location):
+    return f"{checkpoint_key(location)}.parquet"
 
-    s3 = boto3.client(
-        "s3"  # ,
-        # aws_access_key_id=AWS_ACCESS_KEY_ID,
-        # aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+
+def summary_s3_key(location):
+    return f"{checkpoint_key(location)}-summary.json"
+
+
+def summary_s3_url(location, BUCKET):
+    return f"https://{BUCKET}.s3.amazonaws.com/{summary_s3_key(location)}"
+
+
+def upload_summary_to_s3(*, summary, location, BUCKET):
+    """Put a location's market summary next to its output and return its URL."""
+    s3_client().put_object(
+        Bucket=BUCKET,
+        Key=summary_s3_key(location),
+        Body=json.dumps(summary, indent=2).encode(),
+        ContentType="application/json",
+        ACL="public-read",
     )
+    return summary_s3_url(location, BUCKET)
+
+
+def upload_csv_to_s3(*, in_mem_csv, location, BUCKET, compress=False, suffix=""):
+    # Used this StackOverflow answer
+    # https://stackoverflow.com/questions/45699905/csv-file-upload-from-buffer-to-s3
+
+    s3_csv_key = csv_s3_key(location, compress, suffix)
+    csv_as_bytes = in_mem_csv.getvalue().encode()
+    content_kwargs = {"ContentType": "text/csv"}
+    if compress:
+        csv_as_bytes = gzip.compress(csv_as_bytes)
+        content_kwargs["ContentEncoding"] = "gzip"
+
+    s3 = s3_client()
     s3.put_object(
         Bucket=BUCKET,
         Key=s3_csv_key,
-        Body=csv_as_bytes,
-        ContentType="text/csv",
+        Body=io.BytesIO(csv_as_bytes),
         ACL="public-read",
+        **content_kwargs,
     )
 
     # Example finished AWS S3 URL
@@ -271,70 +992,725 @@ def upload_csv_to_s3(*, in_mem_csv, location, BUCKET):
     return aws_url
 
 
+class S3CSVOutput:
+    """
+    Where the handler writes listings.  By default the CSV is built in memory
+    and put to S3 in one go by upload_csv_to_s3.  With stream=True it is
+    multipart-uploaded in parts while the scrape is still running, so memory
+    stays bounded whatever the listing count.  The S3 key needs
+    location["location"], so nothing is opened until the first listing.
+    suffix and fieldnames are for outputs other than the full listing CSV.
+    """
+
+    def __init__(
+        self,
+        *,
+        location,
+        BUCKET,
+        stream=False,
+        compress=False,
+        s3=None,
+        suffix="",
+        fieldnames=LISTING_FIELDS,
+    ):
+        self.location = location
+        self.BUCKET = BUCKET
+        self.stream = stream
+        self.compress = compress
+        self.s3 = s3
+        self.suffix = suffix
+        self.fieldnames = fieldnames
+        self.upload = None
+        self.csv_writer = None
+
+    def open(self):
+        if self.stream:
+            self.upload = StreamingCSVUpload(
+                s3=self.s3 or s3_client(),
+                bucket=self.BUCKET,
+                key=csv_s3_key(self.location, self.compress, self.suffix),
+                compress=self.compress,
+                # Written to from the event loop, which drain() holds back
+                blocking=False,
+                ContentType="text/csv",
+                ACL="public-read",
+            )
+            self.csv_writer = ListingCSVWriter(self.upload.text, self.fieldnames)
+        else:
+            self.csv_writer = ListingCSVWriter(fieldnames=self.fieldnames)
+
+    def writerow(self, listing):
+        if self.csv_writer is None:
+            self.open()
+        self.csv_writer.writerow(listing)
+
+    async def drain(self):
+        """Wait for the streaming upload to catch up, see S3MultipartWriter."""
+        if self.upload is not None:
+            await self.upload.drain()
+
+    def finish(self):
+        """Finish the upload and return the CSV's URL."""
+        if self.csv_writer is None:
+            self.open()
+        if not self.stream:
+            return upload_csv_to_s3(
+                in_mem_csv=self.csv_writer.output_buffer,
+                location=self.location,
+                BUCKET=self.BUCKET,
+                compress=self.compress,
+                suffix=self.suffix,
+            )
+        self.upload.close()
+        s3_csv_key = csv_s3_key(self.location, self.compress, self.suffix)
+        return f"https://{self.BUCKET}.s3.amazonaws.com/{s3_csv_key}"
+
+    def abort(self):
+        if self.upload is not None:
+            self.upload.abort()
+
+
+class S3ParquetOutput:
+    """
+    Typed Parquet output for the handler, with the same interface as
+    S3CSVOutput.  Listings go out a row group at a time through a multipart
+    upload as the scrape runs, with nulls for missing values.
+    """
+
+    def __init__(self, *, location, BUCKET, s3=None):
+        self.location = location
+        self.BUCKET = BUCKET
+        self.s3 = s3
+        self.upload = None
+        self.parquet_writer = None
+
+    def open(self):
+        self.upload = S3MultipartWriter(
+            s3=self.s3 or s3_client(),
+            bucket=self.BUCKET,
+            key=parquet_s3_key(self.location),
+            blocking=False,
+            ContentType="application/vnd.apache.parquet",
+            ACL="public-read",
+        )
+        self.parquet_writer = ParquetListingWriter(self.upload)
+
+    def writerow(self, listing):
+        if self.parquet_writer is None:
+            self.open()
+        self.parquet_writer.writerow(listing)
+
+    async def drain(self):
+        if self.upload is not None:
+            await self.upload.drain()
+
+    def finish(self):
+        """Finish the upload and return the Parquet file's URL."""
+        if self.parquet_writer is None:
+            self.open()
+        try:
+            self.parquet_writer.close()
+        except Exception:
+            self.abort()
+            raise
+        self.upload.complete()
+        return f"https://{self.BUCKET}.s3.amazonaws.com/{parquet_s3_key(self.location)}"
+
+    def abort(self):
+        if self.upload is not None:
+            self.upload.abort()
+
+
+def get_listing_output(event, location):
+    """
+    :param event: event["format"] is csv (the default), csv.gz, or parquet
+        for a typed file with nulls for missing values.  event["gzip"] also
+        selects csv.gz.  Delta mode writes delta rows, which are CSV only.
+    """
+    output_format = event.get("format", "csv")
+    delta_mode = event.get("delta", False)
+    if output_format == "parquet":
+        if delta_mode:
+            raise ValueError("Delta output is CSV only")
+        return S3ParquetOutput(location=location, BUCKET=event["bucket"])
+    elif output_format in ("csv", "csv.gz"):
+        return S3CSVOutput(
+            location=location,
+            BUCKET=event["bucket"],
+            stream=event.get("stream_upload", False),
+            compress=output_format == "csv.gz" or event.get("gzip", False),
+            suffix="-delta" if delta_mode else "",
+            fieldnames=DELTA_FIELDS if delta_mode else LISTING_FIELDS,
+        )
+    else:
+        raise ValueError(f"Unknown output format {output_format}")
+
+
+def event_dependencies(event):
+    """Optional modules the event's options need."""
+    modules = []
+    if event.get("format", "csv") == "parquet":
+        # pyarrow is left out of requirements.txt, too big for the Lambda package
+        modules.extend(["numpy", "pyarrow"])
+    if event.get("summary", False):
+        modules.append("numpy")
+    return sorted(set(modules))
+
+
+def check_event_dependencies(event):
+    """
+    Raise ImportError for any module the event's options need that isn't
+    installed, before scraping, rather than once the output is already up.
+    """
+    missing = [
+        module for module in event_dependencies(event) if importlib.util.find_spec(module) is None
+    ]
+    if missing:
+        raise ImportError(f"{', '.join(missing)} needed for this event is not installed")
+
+
+class DeltaListingFilter:
+    """
+    Delta mode for the handler: passes on only listings that are new or
+    changed since the location's previous run, then the previous run's
+    listings that have gone.  save() stores this run's index for the next
+    one, and is only called once the delta output is safely uploaded, or
+    the next run would take the changes it missed as already seen.  The
+    previous index is loaded with aload() once location["location"] is
+    known, before the first listing.
+    """
+
+    def __init__(self, *, location, BUCKET, s3=None):
+        self.location = location
+        self.BUCKET = BUCKET
+        self.s3 = s3 or s3_client()
+        self.tracker = None
+
+    def load(self):
+        yesterday = date.today() - timedelta(days=1)
+        previous_csv_key = f"{yesterday}-{self.location['location']}.csv"
+        self.tracker = DeltaTracker(
+            load_previous_index(
+                s3=self.s3,
+                bucket=self.BUCKET,
+                location=self.location,
+                previous_csv_key=previous_csv_key,
+            )
+        )
+
+    async def aload(self):
+        # Reads from S3, maybe a whole CSV, so off the loop
+        await asyncio.get_running_loop().run_in_executor(None, self.load)
+
+    def filter(self, writerow):
+        def write_changed(listing):
+            change = self.tracker.observe(listing)
+            if change is not None:
+                writerow(change)
+
+        return write_changed
+
+    def finish(self, writerow):
+        if self.tracker is None:
+            self.load()
+        for change in self.tracker.delisted():
+            writerow(change)
+
+    def save(self):
+        save_index(
+            s3=self.s3, bucket=self.BUCKET, location=self.location, index=self.tracker.index
+        )
+
+
+def event_limiter(event):
+    return AdaptiveLimiter(
+        initial=event.get("con_limit", CON_LIMIT),
+        maximum=event.get("max_con_limit", MAX_CON_LIMIT),
+    )
+
+
+def event_proxies(event):
+    """
+    The ProxyBalancer for event["proxies"]: a provider name, or a list of
+    names or of dicts with settings and a weight to spread fetches across,
+    e.g. [{"name": "luminati", "weight": 3}, {"name": "luminati2", "zone": "zone2"}].
+    """
+    return get_proxy_balancer(
+        event.get("proxies", "luminati"),
+        failure_threshold=event.get("proxy_failure_threshold", 0.5),
+        cooldown=event.get("proxy_cooldown", 30.0),
+    )
+
+
+def event_sessions(event, limiter):
+    # One set of pooled clients for every page of every location in the
+    # invocation, so the proxy connections stay warm for the whole run.
+    return ClientSessions(
+        max_connections=event.get("max_connections", limiter.maximum),
+        max_keepalive=event.get("max_keepalive", CON_LIMIT),
+        http2=event.get("http2", False),
+    )
+
+
+async def scrape_location_to_s3(
+    location,
+    event,
+    *,
+    proxies,
+    sessions,
+    limiter,
+    checkpoints,
+    cache,
+    metrics,
+    store=None,
+    parse_executor=None,
+):
+    """
+    Scrape one location with the output options in event and return the
+    URL of its output file.  Shared by the single location and batch
+    handlers.  Time spent writing rows and finishing the upload goes in
+    metrics.  event["null_sentinels"] writes missing values in CSV output as
+    empty cells rather than placeholders like "CityNotPresent", and
+    event["stream_reads"] stops reading each page after its results block.
+    Listings also go to store, when given, as of the run's date, and pages
+    are parsed in parse_executor, see get_parse_executor.  With
+    event["summary"], a MarketSummary of the listings (see
+    market_summary.py) is uploaded next to the output as JSON.
+    """
+    delta_mode = event.get("delta", False)
+    csv_output = get_listing_output(event, location)
+    write_listing = csv_output.writerow
+    if delta_mode:
+        delta = DeltaListingFilter(location=location, BUCKET=event["bucket"])
+        write_listing = delta.filter(csv_output.writerow)
+    null_sentinels = event.get("null_sentinels", False)
+    scrape_date = str(date.today())
+    market_summary = MarketSummary() if event.get("summary", False) else None
+
+    def on_listing(listing):
+        # A running total, as a sample per row would cost more than the row
+        started = time.perf_counter()
+        if store is not None:
+            store.add(listing, scrape_date)
+        if market_summary is not None:
+            # Before clean_listing, which hides the defaults it counts
+            market_summary.add(listing)
+        if null_sentinels:
+            listing = clean_listing(listing)
+        write_listing(listing)
+        metrics.add("csv_write_seconds", time.perf_counter() - started)
+
+    try:
+        await stream_location_listings(
+            location,
+            con_limit=limiter.maximum,
+            limiter=limiter,
+            proxies=proxies,
+            sessions=sessions,
+            on_listing=on_listing,
+            parser=event.get("parser", "soup"),
+            parse_workers=event.get("parse_workers"),
+            parse_executor=parse_executor,
+            checkpoints=checkpoints,
+            cache=cache,
+            metrics=metrics,
+            speculative_pages=event.get("speculative_pages", SPECULATIVE_PAGES),
+            stream_reads=event.get("stream_reads", False),
+            drain=csv_output.drain,
+            on_location=delta.aload if delta_mode else None,
+        )
+    except Exception:
+        # Waits for parts in flight, so off the loop like the uploads
+        await asyncio.get_running_loop().run_in_executor(None, csv_output.abort)
+        raise
+    finally:
+        if store is not None:
+            store.flush()
+
+    def finish():
+        try:
+            if delta_mode:
+                delta.finish(csv_output.writerow)
+            with metrics.timer("upload_seconds"):
+                csv_url = csv_output.finish()
+        except Exception:
+            # Never leave a partial upload for the writer to be completed
+            csv_output.abort()
+            raise
+        if delta_mode:
+            delta.save()
+        if market_summary is not None:
+            with metrics.timer("summary_seconds"):
+                upload_summary_to_s3(
+                    summary=market_summary.summary(), location=location, BUCKET=event["bucket"]
+                )
+        if checkpoints is not None:
+            # The run is complete, so a later run today starts from scratch
+            checkpoints.clear(checkpoint_key(location))
+        return csv_url
+
+    # Uploads block, so keep them off the loop other locations may be using
+    return await asyncio.get_running_loop().run_in_executor(None, finish)
+
+
+def emit_metrics(event, location, metrics, proxies):
+    """
+    Print metrics as a CloudWatch EMF line, unless event["emit_metrics"] is
+    false.  The proxy backends are the only dimension; the location goes
+    along as a property so per-county runs don't each add a set of metrics.
+    """
+    if event.get("emit_metrics", True):
+        print(
+            metrics.to_emf(
+                dimensions={"proxies": proxies.name},
+                properties={
+                    "landwatchurl": location["landwatchurl"],
+                    "location": location.get("location"),
+                },
+            )
+        )
+
+
 def scrape_landwatch(event, context):
     # Expect event to be something like:
     # {
     #     "landwatch_url": "https://www.landwatch.com/Oklahoma_land_for_sale/Osage_County/Land"
     # }
 
-    counter = 0
-    CON_LIMIT = 10
-
+    check_event_dependencies(event)
     location = {"landwatchurl": event["starting_url"]}
-    resp_texts = asyncio.run(
-        fetch_urls(
-            urls=[location["landwatchurl"]],
-            con_limit=CON_LIMIT,
-            tag_check="div",
-            dict_check={"class": "resultstitle"},
-            proxies="luminati",
-        )
+    checkpoints = get_checkpoint_store(event)
+    cache = get_response_cache(event)
+    limiter = event_limiter(event)
+    proxies = event_proxies(event)
+    metrics = ScrapeMetrics()
+    store = get_listing_store(event)
+    parse_executor = get_parse_executor(event)
+
+    async def scrape():
+        async with event_sessions(event, limiter) as sessions:
+            return await scrape_location_to_s3(
+                location,
+                event,
+                proxies=proxies,
+                sessions=sessions,
+                limiter=limiter,
+                checkpoints=checkpoints,
+                cache=cache,
+                metrics=metrics,
+                store=store,
+                parse_executor=parse_executor,
+            )
+
+    started = time.perf_counter()
+    try:
+        csv_url = asyncio.run(scrape())
+    finally:
+        metrics.add("run_seconds", time.perf_counter() - started)
+        emit_metrics(event, location, metrics, proxies)
+        if store is not None:
+            store.close()
+        if parse_executor is not None:
+            parse_executor.shutdown(wait=False)
+
+    result = {
+        "csv_url": csv_url,
+        "location": location["location"],
+        "metrics": metrics.summary(),
+        "proxies": proxies.stats(),
+    }
+    if event.get("summary", False):
+        result["summary_url"] = summary_s3_url(location, event["bucket"])
+    return result
+
+
+async def discover_county_urls(
+    state_url, *, proxies, sessions, limiter, parser="soup", cache=None
+):
+    """The starting URLs of every county linked from a state results page."""
+    backend = get_parser_backend(parser)
+    fetch_state_page = page_fetcher(
+        urls=[state_url],
+        tag_check="div",
+        dict_check={"class": "resultstitle"},
+        proxies=proxies,
+        sessions=sessions,
+        limiter=limiter,
+        cache=cache,
     )
-    selected_resp = resp_texts[0]
-    first_page_soup = BeautifulSoup(selected_resp, "html.parser")
-    location["location"] = get_location(first_page_soup)
-
-    # Expect location to be something like:
-    # location = {
-    #     "landwatchurl": "https://www.landwatch.com/Oklahoma_land_for_sale/Osage_County/Land",
-    #     "location": "Osage_County-OK",
+    state_page = backend.parse(await fetch_state_page(state_url))
+    return backend.get_county_urls(state_page)
+
+
+async def plan_location_pages(
+    location, *, proxies, sessions, limiter, parser="soup", cache=None
+):
+    """
+    Fetch a location's first page, fill in location["location"] from it and
+    return its number of results pages.
+    """
+    backend = get_parser_backend(parser)
+    starting_url = location["landwatchurl"]
+    fetch_first_page = page_fetcher(
+        urls=[starting_url],
+        tag_check="div",
+        dict_check={"class": "resultstitle"},
+        proxies=proxies,
+        sessions=sessions,
+        limiter=limiter,
+        cache=cache,
+    )
+    first_page = backend.parse(await fetch_first_page(starting_url))
+    location["location"] = backend.get_location(first_page)
+    num_of_results = backend.get_num_of_results(first_page)
+    return count_pages(num_of_results, len(backend.result_rows(first_page)))
+
+
+def scrape_landwatch_batch(event, context):
+    # Expect event to be something like:
+    # {
+    #     "starting_urls": [
+    #         "https://www.landwatch.com/Oklahoma_land_for_sale/Osage_County/Land",
+    #         "https://www.landwatch.com/Oklahoma_land_for_sale/Pawnee_County/Land",
+    #     ],
+    #     "bucket": "landtoolsai",
     # }
+    # or "state_url": "https://www.landwatch.com/Oklahoma_land_for_sale/Land"
+    # in place of starting_urls to scrape every county in the state.
+    #
+    # All locations share one set of client sessions and one concurrency
+    # limiter and proxy balancer, and each gets its own output, as
+    # scrape_landwatch would write.
 
-    num_of_results = get_num_of_results(first_page_soup)
+    check_event_dependencies(event)
+    checkpoints = get_checkpoint_store(event)
+    cache = get_response_cache(event)
+    limiter = event_limiter(event)
+    proxies = event_proxies(event)
+    store = get_listing_store(event)
+    # One pool for every location, rather than parse_workers processes each
+    parse_executor = get_parse_executor(event)
+    location_slots = event.get("location_concurrency", LOCATION_CONCURRENCY)
 
-    print(f"{location['location']} Start - {num_of_results} listings")
-    paginated_urls = gen_paginated_urls(first_page_soup, num_of_results)
+    async def scrape():
+        async with event_sessions(event, limiter) as sessions:
+            starting_urls = event.get("starting_urls")
+            if not starting_urls:
+                starting_urls = await discover_county_urls(
+                    event["state_url"],
+                    proxies=proxies,
+                    sessions=sessions,
+                    limiter=limiter,
+                    parser=event.get("parser", "soup"),
+                    cache=cache,
+                )
+                print(f"{event['state_url']} - {len(starting_urls)} counties")
 
-    page_htmls = asyncio.run(
-        fetch_urls(
-            urls=paginated_urls,
-            con_limit=CON_LIMIT,
-            tag_check="div",
-            dict_check={"class": "resultstitle"},
-            proxies="luminati",
-        )
+            # Bound the locations in flight so their pages share the limiter
+            # instead of every location's first page racing at once.
+            location_semaphore = asyncio.Semaphore(location_slots)
+
+            async def scrape_one(starting_url):
+                location = {"landwatchurl": starting_url}
+                result = {"starting_url": starting_url}
+                metrics = ScrapeMetrics()
+                async with location_semaphore:
+                    started = time.perf_counter()
+                    try:
+                        result["csv_url"] = await scrape_location_to_s3(
+                            location,
+                            event,
+                            proxies=proxies,
+                            sessions=sessions,
+                            limiter=limiter,
+                            checkpoints=checkpoints,
+                            cache=cache,
+                            metrics=metrics,
+                            store=store,
+                            parse_executor=parse_executor,
+                        )
+                        if event.get("summary", False):
+                            result["summary_url"] = summary_s3_url(location, event["bucket"])
+                    except Exception as e:
+                        logging.error(f"{starting_url} failed: {e!r}")
+                        result["error"] = repr(e)
+                    metrics.add("run_seconds", time.perf_counter() - started)
+                emit_metrics(event, location, metrics, proxies)
+                result["location"] = location.get("location")
+                result["metrics"] = metrics.summary()
+                return result
+
+            return await asyncio.gather(*(scrape_one(url) for url in starting_urls))
+
+    try:
+        results = asyncio.run(scrape())
+    finally:
+        if store is not None:
+            store.close()
+        if parse_executor is not None:
+            parse_executor.shutdown(wait=False)
+    return {"results": results, "proxies": proxies.stats()}
+
+
+# Handler options a sharded run doesn't honour, refused rather than ignored
+SHARD_UNSUPPORTED_OPTIONS = ("delta", "gzip", "summary", "store", "checkpoint", "stream_upload")
+
+
+def get_shard_queue(event):
+    """
+    :param event: event["shard_queue"] is "lambda" (the default) to invoke
+        the worker function event["shard_function"], or the SHARD_FUNCTION
+        environment variable, once per shard, or "local" to run the shards
+        in this process once they are all planned.
+    """
+    if event.get("shard_queue", "lambda") == "local":
+        return LocalShardQueue(scrape_landwatch_shard)
+    return LambdaShardQueue(
+        event.get("shard_function") or os.environ["SHARD_FUNCTION"],
+        lambda_client=lambda_client(),
     )
-    soups = [first_page_soup]
-    soups.extend(convert_resps_to_soups(page_htmls))
 
-    listings = []
-    for soup in soups:
-        listings_soup_list = soup.select("div.result")
-        for listing_soup in listings_soup_list:
-            listing_dict = listing_parser(listing_soup, location)
-            listings.append(listing_dict)
-            counter += 1
 
-        print(
-            f"{location['location']} Part {soups.index(soup)} complete\nTotal listings: {counter}"
+def scrape_landwatch_coordinator(event, context):
+    # Expect event to be like scrape_landwatch's, plus optionally:
+    # {
+    #     "shard_pages": 50,
+    #     "shard_queue": "lambda",
+    #     "shard_function": "landtoolsai-dev-scrape_landwatch_shard",
+    # }
+    #
+    # Reads the first page for the page count, splits the pages into shards
+    # of shard_pages and sends one worker event per shard.  Each worker
+    # writes its shard to S3 and the one that finds every shard written
+    # merges them into the CSV scrape_landwatch would have written.
+
+    unsupported = [option for option in SHARD_UNSUPPORTED_OPTIONS if event.get(option)]
+    if event.get("format", "csv") != "csv" or unsupported:
+        raise ValueError("Sharded runs write plain CSV only")
+    check_event_dependencies(event)
+    location = {"landwatchurl": event["starting_url"]}
+    limiter = event_limiter(event)
+    proxies = event_proxies(event)
+
+    async def plan():
+        async with event_sessions(event, limiter) as sessions:
+            return await plan_location_pages(
+                location,
+                proxies=proxies,
+                sessions=sessions,
+                limiter=limiter,
+                parser=event.get("parser", "soup"),
+                cache=get_response_cache(event),
+            )
+
+    num_of_pages = asyncio.run(plan())
+    shards = plan_shards(num_of_pages, event.get("shard_pages", SHARD_PAGES))
+    run_key = checkpoint_key(location)
+    run_id = uuid.uuid4().hex
+    print(f"{location['location']} Start - {num_of_pages} pages in {len(shards)} shards")
+
+    shard_queue = get_shard_queue(event)
+    for shard_num, pages in enumerate(shards):
+        shard_queue.send(
+            dict(
+                event,
+                location=location,
+                run_key=run_key,
+                run_id=run_id,
+                shard=shard_num,
+                num_of_shards=len(shards),
+                pages=pages,
+            )
         )
 
-    csv_in_buffer = write_to_csv_in_buffer(listings)
-    csv_url = upload_csv_to_s3(
-        in_mem_csv=csv_in_buffer, location=location, BUCKET=event["bucket"]
-    )
+    return {
+        "csv_url": f"https://{event['bucket']}.s3.amazonaws.com/{run_key}.csv",
+        "location": location["location"],
+        "pages": num_of_pages,
+        "shards": len(shards),
+        "results": shard_queue.drain(),
+    }
+
+
+def scrape_landwatch_shard(event, context):
+    # Expect event to be a coordinator event with the shard filled in:
+    # {
+    #     "location": {"landwatchurl": "...", "location": "Osage_County-OK"},
+    #     "run_key": "2020-01-07-Osage_County-OK",
+    #     "run_id": "5f0c2e8a9d1b4c7e8f3a6b2d1e0c9a8b",
+    #     "shard": 3,
+    #     "num_of_shards": 8,
+    #     "pages": [150, 200],
+    #     "bucket": "landtoolsai",
+    # }
+
+    location = event["location"]
+    run_key = event["run_key"]
+    run_id = event["run_id"]
+    bucket = event["bucket"]
+    limiter = event_limiter(event)
+    proxies = event_proxies(event)
+    metrics = ScrapeMetrics()
+    csv_writer = ListingCSVWriter()
+    null_sentinels = event.get("null_sentinels", False)
+
+    def on_listing(listing):
+        csv_writer.writerow(clean_listing(listing) if null_sentinels else listing)
+
+    async def scrape():
+        async with event_sessions(event, limiter) as sessions:
+            await stream_page_range(
+                location,
+                page_nums=range(*event["pages"]),
+                con_limit=limiter.maximum,
+                limiter=limiter,
+                proxies=proxies,
+                sessions=sessions,
+                on_listing=on_listing,
+                parser=event.get("parser", "soup"),
+                cache=get_response_cache(event),
+                metrics=metrics,
+                stream_reads=event.get("stream_reads", False),
+            )
 
-    return csv_url
+    s3 = s3_client()
+    started = time.perf_counter()
+    try:
+        asyncio.run(scrape())
+        with metrics.timer("upload_seconds"):
+            s3.put_object(
+                Bucket=bucket,
+                Key=shard_key(run_key, run_id, event["shard"]),
+                Body=csv_writer.output_buffer.getvalue().encode(),
+                ContentType="text/csv",
+            )
+    finally:
+        metrics.add("run_seconds", time.perf_counter() - started)
+        emit_metrics(event, location, metrics, proxies)
+
+    result = {"location": location["location"], "shard": event["shard"]}
+    if all_shards_written(
+        s3=s3,
+        bucket=bucket,
+        run_key=run_key,
+        run_id=run_id,
+        num_of_shards=event["num_of_shards"],
+    ):
+        header = io.StringIO()
+        csv.writer(header).writerow(LISTING_FIELDS)
+        csv_key = merge_shards(
+            s3=s3,
+            bucket=bucket,
+            run_key=run_key,
+            run_id=run_id,
+            num_of_shards=event["num_of_shards"],
+            key=f"{run_key}.csv",
+            header=header.getvalue().encode(),
+        )
+        print(f"{location['location']} Merged {event['num_of_shards']} shards")
+        result["csv_url"] = f"https://{bucket}.s3.amazonaws.com/{csv_key}"
+    result["metrics"] = metrics.summary()
+    return result
 
 
 if __name__ == "__main__":
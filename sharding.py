@@ -0,0 +1,122 @@
+# System libs
+import json
+
+# 3rd party
+
+# Local
+from s3_streaming import S3MultipartWriter
+
+
+# Pages per shard, about 750 listings, which a worker fetches in a minute
+# or two at the usual concurrency, well inside the 900s Lambda timeout
+SHARD_PAGES = 50
+SHARD_PREFIX = "shards"
+
+
+def plan_shards(num_of_pages, shard_pages=SHARD_PAGES):
+    """
+    Split a location's pages, numbered from 0 for the first page, into
+    [start, stop) ranges of at most shard_pages pages each.
+    """
+    return [
+        [start, min(start + shard_pages, num_of_pages)]
+        for start in range(0, num_of_pages, shard_pages)
+    ]
+
+
+def shard_prefix(run_key, run_id):
+    """
+    Shards are kept under the coordinator's run_id as well as run_key, so a
+    rerun of a location on the same day never sees the shards of an
+    earlier run.
+    """
+    return f"{SHARD_PREFIX}/{run_key}/{run_id}/"
+
+
+def shard_key(run_key, run_id, shard_num):
+    return f"{shard_prefix(run_key, run_id)}{shard_num:05d}.csv"
+
+
+def completed_shards(*, s3, bucket, run_key, run_id):
+    """Shard numbers of the run with their output already in S3."""
+    shard_nums = set()
+    paginator = s3.get_paginator("list_objects_v2")
+    for resp in paginator.paginate(Bucket=bucket, Prefix=shard_prefix(run_key, run_id)):
+        for s3_object in resp.get("Contents", []):
+            shard_nums.add(int(s3_object["Key"].rsplit("/", 1)[-1].split(".")[0]))
+    return shard_nums
+
+
+def all_shards_written(*, s3, bucket, run_key, run_id, num_of_shards):
+    return set(range(num_of_shards)) <= completed_shards(
+        s3=s3, bucket=bucket, run_key=run_key, run_id=run_id
+    )
+
+
+def merge_shards(*, s3, bucket, run_key, run_id, num_of_shards, key, header):
+    """
+    Concatenate the shard CSVs of the run, in shard order, into one CSV at
+    key under a single header line.  Shards are read one at a time and the
+    output is multipart-uploaded as it goes, so memory stays around a shard
+    and a part whatever the location's size.  Shard objects are left for a
+    lifecycle rule on SHARD_PREFIX/ to expire, since a worker finishing at
+    the same moment may be merging them too.
+    """
+    output = S3MultipartWriter(
+        s3=s3, bucket=bucket, key=key, ContentType="text/csv", ACL="public-read"
+    )
+    try:
+        output.write(header)
+        for shard_num in range(num_of_shards):
+            resp = s3.get_object(Bucket=bucket, Key=shard_key(run_key, run_id, shard_num))
+            # Each shard has its own header line, or nothing if it had no listings
+            output.write(resp["Body"].read().partition(b"\n")[2])
+    except Exception:
+        output.abort()
+        raise
+    output.complete()
+    return key
+
+
+class LocalShardQueue:
+    """
+    In-process stand-in for the worker queue.  Messages are kept until
+    drain(), which runs handler(message, None) on each in turn, the way
+    Lambda would call the worker, and returns their results.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.messages = []
+
+    def send(self, message):
+        self.messages.append(message)
+
+    def drain(self):
+        results = []
+        while self.messages:
+            results.append(self.handler(self.messages.pop(0), None))
+        return results
+
+
+class LambdaShardQueue:
+    """
+    Sends each message to the worker Lambda function_name as an
+    asynchronous invocation, so every shard runs in its own invocation and
+    Lambda retries failed ones.
+    """
+
+    def __init__(self, function_name, *, lambda_client):
+        self.function_name = function_name
+        self.lambda_client = lambda_client
+
+    def send(self, message):
+        self.lambda_client.invoke(
+            FunctionName=self.function_name,
+            InvocationType="Event",
+            Payload=json.dumps(message).encode(),
+        )
+
+    def drain(self):
+        # The workers report through S3, not back to the sender
+        return []
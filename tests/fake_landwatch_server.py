@@ -0,0 +1,112 @@
+"""
+A small local HTTP server standing in for LandWatch (or a proxy in front of
+it) in tests and benchmarks.  It serves a saved results page for any path
+and can be told to add latency, answer 429 when more than capacity requests
+are in flight, fail a share of requests with 503, serve a captcha page
+that fails the soup check, or send bodies in chunk_size pieces like a slow
+upstream would.  Run it on the test's event loop:
+
+    async with FakeLandwatchServer(html, latency=0.01, capacity=8) as server:
+        await fetch_urls(urls=[server.url("/Land/page-2")], proxies="direct", ...)
+"""
+# Built-in
+import asyncio
+import random
+
+
+CAPTCHA_HTML = b"<html><body><div class='captcha'>Are you a robot?</div></body></html>"
+REASONS = {200: b"OK", 429: b"Too Many Requests", 503: b"Service Unavailable"}
+
+
+class FakeLandwatchServer:
+    def __init__(
+        self,
+        html,
+        *,
+        latency=0.0,
+        capacity=None,
+        error_rate=0.0,
+        captcha_rate=0.0,
+        chunk_size=None,
+        seed=0,
+        host="127.0.0.1",
+    ):
+        self.html = html.encode() if isinstance(html, str) else html
+        self.latency = latency
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.captcha_rate = captcha_rate
+        self.chunk_size = chunk_size
+        self.random = random.Random(seed)
+        self.host = host
+        self.port = None
+        self.server = None
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.status_counts = {}
+        self.paths = []
+        self.bytes_sent = 0
+
+    def url(self, path):
+        return f"http://{self.host}:{self.port}{path}"
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, self.host, 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                path = request_line.split(b" ")[1].decode()
+                status, body = await self.respond(path)
+                writer.write(
+                    b"HTTP/1.1 %d %s\r\nContent-Type: text/html; charset=utf-8\r\n"
+                    b"Content-Length: %d\r\n\r\n" % (status, REASONS[status], len(body))
+                )
+                chunk_size = self.chunk_size or len(body) or 1
+                for start in range(0, len(body), chunk_size):
+                    writer.write(body[start : start + chunk_size])
+                    self.bytes_sent += len(body[start : start + chunk_size])
+                    await writer.drain()
+                    if self.chunk_size:
+                        # Let the client read, and hang up, between chunks
+                        await asyncio.sleep(0.001)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, path):
+        self.paths.append(path)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.capacity is not None and self.in_flight > self.capacity:
+                status, body = 429, b"slow down"
+            else:
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                if self.random.random() < self.error_rate:
+                    status, body = 503, b"upstream error"
+                elif self.random.random() < self.captcha_rate:
+                    status, body = 200, CAPTCHA_HTML
+                else:
+                    status, body = 200, self.page_body(path)
+        finally:
+            self.in_flight -= 1
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+        return status, body
+
+    def page_body(self, path):
+        return self.html
@@ -0,0 +1,41 @@
+# Built-in
+import os
+import unittest
+
+# Local imports
+from aws_clients import s3_client
+
+# Third party lib
+import boto3
+
+try:
+    from moto import mock_aws
+except ImportError:
+    try:
+        from moto import mock_s3 as mock_aws
+    except ImportError:
+        mock_aws = None
+
+
+BUCKET = "landtoolsai-test"
+
+
+@unittest.skipIf(mock_aws is None, "moto not installed")
+class S3TestCase(unittest.TestCase):
+    """
+    Base for tests against S3: each test runs in a fresh moto mock with
+    BUCKET already made, and self.s3 is a client for it.  The handlers'
+    cached client is cleared around each test so it's made inside the mock.
+    """
+
+    def setUp(self):
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+        os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+        s3_client.cache_clear()
+        self.addCleanup(s3_client.cache_clear)
+        self.mock = mock_aws()
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+        self.s3 = boto3.client("s3", region_name="us-east-1")
+        self.s3.create_bucket(Bucket=BUCKET)
@@ -0,0 +1,76 @@
+# Built-in
+import unittest
+
+# Local imports
+import benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_percentile(self):
+        samples = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(samples, 50), 50)
+        self.assertEqual(benchmark.percentile(samples, 99), 99)
+        self.assertEqual(benchmark.percentile([0.5], 99), 0.5)
+
+    def test_bench_parse_fixtures(self):
+        pages = benchmark.load_corpus("tests")
+        self.assertEqual(
+            [name for name, _ in pages], ["city.html", "county.html", "state.html", "zipcode.html"]
+        )
+
+        results = benchmark.bench_parse(pages, repeat=1)
+
+        self.assertGreater(results["pages_per_second"], 0)
+        self.assertGreater(results["listings_per_second"], results["pages_per_second"])
+        self.assertEqual(set(results["stages"]), set(benchmark.PAGE_STAGES))
+        # city.html is a last page, with no next link to paginate from
+        self.assertEqual(results["stages"]["gen_paginated_urls"]["failures"], 1)
+        self.assertEqual(results["stages"]["listing_parser"]["failures"], 0)
+
+    def test_bench_listing_parser(self):
+        pages = benchmark.load_corpus("tests")
+        results = benchmark.bench_listing_parser(pages, repeat=1)
+
+        self.assertGreater(results["listings_per_second"], 0)
+        self.assertLessEqual(results["p50_us"], results["p99_us"])
+
+    def test_bench_fetch(self):
+        with open("tests/county.html") as county_html:
+            results = benchmark.bench_fetch(county_html.read(), num_of_pages=20, latency=0)
+
+        self.assertGreater(results["pages_per_second"], 0)
+        self.assertGreater(results["mb_per_second"], 0)
+        self.assertLessEqual(results["p50_ms"], results["p99_ms"])
+
+    def test_compare_flags_regressions(self):
+        baseline = {
+            "parse_soup": {
+                "pages_per_second": 100.0,
+                "stages": {"parse": {"p50_ms": 10.0}, "get_location": {"p50_ms": 0.1}},
+            }
+        }
+        steady = {
+            "parse_soup": {
+                "pages_per_second": 90.0,
+                "stages": {"parse": {"p50_ms": 11.0}, "get_location": {"p50_ms": 0.5}},
+            }
+        }
+        slower = {
+            "parse_soup": {
+                "pages_per_second": 70.0,
+                "stages": {"parse": {"p50_ms": 13.0}, "get_location": {"p50_ms": 0.1}},
+            }
+        }
+
+        self.assertEqual(benchmark.compare(steady, baseline), [])
+        self.assertEqual(
+            benchmark.compare(slower, baseline),
+            [
+                "parse_soup.pages_per_second: 70.0 vs 100.0",
+                "parse_soup.stages.parse.p50_ms: 13.0 vs 10.0",
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+# Built-in
+import tempfile
+import unittest
+
+# Local imports
+from checkpoints import LocalCheckpointStore, S3CheckpointStore
+from listings import Listing, ListingBatch
+from s3_test_case import BUCKET, S3TestCase
+
+
+PAGE = ListingBatch(
+    [
+        Listing("https://www.landwatch.com/x/pid/1", 1, 2.5, 1000, 400.0, "Ivor"),
+        Listing("https://www.landwatch.com/x/pid/2", 2, "Error"),
+        Listing("https://www.landwatch.com/x/pid/3", 3, 1, 1, 1.0, "CityNotPresent"),
+    ]
+)
+
+
+class CheckpointStoreTests:
+    def test_round_trip(self):
+        self.assertEqual(self.store.load("2020-06-01-Osage_County-OK"), {})
+
+        self.store.save_page("2020-06-01-Osage_County-OK", 3, PAGE)
+        self.store.save_page("2020-06-01-Osage_County-OK", 12, ListingBatch())
+        self.store.save_page("2020-06-01-Ivor-VA", 1, PAGE)
+
+        pages = self.store.load("2020-06-01-Osage_County-OK")
+        self.assertEqual(sorted(pages), [3, 12])
+        self.assertEqual(list(pages[3]), list(PAGE))
+        self.assertEqual(len(pages[12]), 0)
+
+        self.store.clear("2020-06-01-Osage_County-OK")
+        self.assertEqual(self.store.load("2020-06-01-Osage_County-OK"), {})
+        self.assertEqual(list(self.store.load("2020-06-01-Ivor-VA")), [1])
+
+
+class TestLocalCheckpointStore(CheckpointStoreTests, unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = LocalCheckpointStore(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+class TestS3CheckpointStore(CheckpointStoreTests, S3TestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = S3CheckpointStore(s3=self.s3, bucket=BUCKET)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,29 @@
+# Built-in
+import asyncio
+import unittest
+
+# Local imports
+from client_sessions import ClientSessions
+
+
+class TestClientSessions(unittest.TestCase):
+    def test_client_reused_per_backend(self):
+        async def run():
+            async with ClientSessions(max_connections=5) as sessions:
+                first = sessions.client("luminati")
+                second = sessions.client("luminati")
+                other = sessions.client("scraperapi")
+                return first is second, first is other
+
+        same, shared_across_backends = asyncio.run(run())
+        self.assertTrue(same)
+        self.assertFalse(shared_across_backends)
+
+    def test_unknown_backend(self):
+        sessions = ClientSessions()
+        with self.assertRaises(ValueError):
+            sessions.client("carrier_pigeon")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+# Built-in
+import asyncio
+from pathlib import Path
+import unittest
+from unittest import mock
+
+# Local imports
+from concurrency import AdaptiveLimiter
+from fake_landwatch_server import FakeLandwatchServer
+import scrape_landwatch
+
+# Third party lib
+from tenacity import wait_random_exponential
+
+
+FAST_RETRY_WAIT = wait_random_exponential(multiplier=0.005, max=0.05)
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+    def test_additive_increase(self):
+        limiter = AdaptiveLimiter(initial=4, maximum=6)
+        # About one slot per limit's worth of successes
+        for _ in range(5):
+            limiter.record_success(0.1)
+        self.assertEqual(limiter.slots, 5)
+        for _ in range(100):
+            limiter.record_success(0.1)
+        self.assertEqual(limiter.slots, 6)
+
+    def test_slow_success_holds_limit(self):
+        limiter = AdaptiveLimiter(initial=4, slow_latency=1.0)
+        limiter.record_success(5.0)
+        self.assertEqual(limiter.limit, 4)
+
+    def test_multiplicative_decrease_once_per_cooldown(self):
+        limiter = AdaptiveLimiter(initial=16, cooldown=60)
+        limiter.record_failure()
+        limiter.record_failure()
+        self.assertEqual(limiter.slots, 8)
+
+        limiter = AdaptiveLimiter(initial=16, cooldown=0)
+        for _ in range(10):
+            limiter.record_failure()
+        self.assertEqual(limiter.slots, 1)
+
+    def test_slots_bound_concurrency(self):
+        limiter = AdaptiveLimiter(initial=3, maximum=3)
+        peak = 0
+
+        async def task():
+            nonlocal peak
+            async with limiter.slot():
+                peak = max(peak, limiter.in_flight)
+                await asyncio.sleep(0.001)
+
+        async def run():
+            await asyncio.gather(*(task() for _ in range(20)))
+
+        asyncio.run(run())
+        self.assertEqual(peak, 3)
+        self.assertEqual(limiter.in_flight, 0)
+
+
+@mock.patch.object(scrape_landwatch, "RETRY_WAIT", FAST_RETRY_WAIT)
+class TestFetchAgainstFakeServer(unittest.TestCase):
+    def setUp(self):
+        with open(Path("tests/county.html"), "rb") as county_html:
+            self.html = county_html.read()
+
+    def fetch(self, server_kwargs, limiter, num_of_pages=60):
+        async def run():
+            async with FakeLandwatchServer(self.html, **server_kwargs) as server:
+                urls = [server.url(f"/Land/page-{i}") for i in range(num_of_pages)]
+                page_htmls = await scrape_landwatch.fetch_urls(
+                    urls=urls,
+                    con_limit=limiter.maximum,
+                    tag_check="div",
+                    dict_check={"class": "resultstitle"},
+                    proxies="direct",
+                    limiter=limiter,
+                )
+                return server, page_htmls
+
+        return asyncio.run(run())
+
+    def test_backs_off_to_proxy_capacity(self):
+        limiter = AdaptiveLimiter(initial=2, maximum=30, cooldown=0.05)
+        server, page_htmls = self.fetch({"latency": 0.02, "capacity": 6}, limiter, 120)
+
+        self.assertEqual(len(page_htmls), 120)
+        self.assertTrue(all("resultstitle" in html for html in page_htmls))
+        self.assertEqual(limiter.successes, 120)
+        # It grew past where it started, hit the 429s and cut back below max
+        self.assertGreater(server.max_in_flight, 2)
+        self.assertGreater(server.status_counts.get(429, 0), 0)
+        self.assertEqual(limiter.failures, server.status_counts[429])
+        self.assertLess(limiter.limit, 30)
+
+    def test_grows_when_healthy(self):
+        limiter = AdaptiveLimiter(initial=2, maximum=12)
+        server, page_htmls = self.fetch({"latency": 0.01}, limiter, 120)
+
+        self.assertEqual(len(page_htmls), 120)
+        self.assertEqual(limiter.failures, 0)
+        self.assertEqual(limiter.slots, 12)
+
+    def test_retries_errors_and_failed_soup_checks(self):
+        limiter = AdaptiveLimiter(initial=4, maximum=8, cooldown=0)
+        server, page_htmls = self.fetch(
+            {"latency": 0.005, "error_rate": 0.2, "captcha_rate": 0.2}, limiter
+        )
+
+        self.assertEqual(len(page_htmls), 60)
+        self.assertTrue(all("resultstitle" in html for html in page_htmls))
+        self.assertEqual(limiter.failures, len(server.paths) - 60)
+        self.assertGreater(limiter.failures, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
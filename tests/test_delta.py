@@ -0,0 +1,114 @@
+# Built-in
+import io
+import unittest
+
+# Local imports
+from delta import (
+    DELISTED,
+    DELTA_FIELDS,
+    NEW,
+    PRICE_CHANGE,
+    UPDATE,
+    DeltaTracker,
+    ListingIndex,
+    load_previous_index,
+    save_index,
+)
+from listings import Listing, ListingBatch
+from s3_test_case import S3TestCase
+
+
+def listing(pid, price, description="Quiet wooded lot"):
+    return Listing(
+        f"https://www.landwatch.com/x/pid/{pid}",
+        pid,
+        10.0,
+        price,
+        price / 10.0,
+        "Ivor",
+        description,
+        "Ivor-VA",
+        "Mossy Oak Properties",
+        "https://www.landwatch.com/default.aspx?ct=r&type=146,1",
+        "Signature Partner",
+    )
+
+
+YESTERDAY = [listing(1, 1000), listing(2, 2000), listing(3, 3000), listing(4, 4000)]
+TODAY = [
+    listing(1, 1000),
+    listing(2, 1800),
+    listing(3, 3000, description="Quiet wooded lot, new road"),
+    listing(5, 5000),
+    listing(5, 5000),
+]
+
+
+def build_index(listings):
+    index = ListingIndex()
+    for previous in listings:
+        index.add(previous)
+    return index
+
+
+class TestDeltaTracker(unittest.TestCase):
+    def test_changes(self):
+        tracker = DeltaTracker(build_index(YESTERDAY))
+        changes = [tracker.observe(current) for current in TODAY]
+        changes = [change for change in changes if change is not None]
+        changes.extend(tracker.delisted())
+
+        by_pid = {int(change[DELTA_FIELDS.index("pid")]): change for change in changes}
+        self.assertEqual(len(changes), 4)
+        self.assertEqual(by_pid[2][0], PRICE_CHANGE)
+        self.assertEqual(by_pid[2][-1], "2000")
+        self.assertEqual(by_pid[3][0], UPDATE)
+        self.assertEqual(by_pid[4][0], DELISTED)
+        self.assertEqual(by_pid[5][0], NEW)
+        self.assertEqual(len(tracker.index), 4)
+
+    def test_index_from_csv_matches_listings(self):
+        csv_text = ListingBatch(YESTERDAY).to_csv(io.StringIO()).getvalue()
+        self.assertEqual(ListingIndex.from_csv(csv_text).entries, build_index(YESTERDAY).entries)
+
+        tracker = DeltaTracker(ListingIndex.from_csv(csv_text))
+        self.assertIsNone(tracker.observe(YESTERDAY[0]))
+
+    def test_json_round_trip(self):
+        index = build_index(YESTERDAY)
+        self.assertEqual(ListingIndex.from_json(index.to_json()).entries, index.entries)
+
+
+class TestIndexStorage(S3TestCase):
+    def setUp(self):
+        super().setUp()
+        self.location = {"location": "Ivor-VA"}
+
+    def load(self, previous_csv_key=None):
+        return load_previous_index(
+            s3=self.s3,
+            bucket="landtoolsai-test",
+            location=self.location,
+            previous_csv_key=previous_csv_key,
+        )
+
+    def test_load_previous_index(self):
+        self.assertEqual(len(self.load("2020-06-01-Ivor-VA.csv")), 0)
+
+        csv_text = ListingBatch(YESTERDAY).to_csv(io.StringIO()).getvalue()
+        self.s3.put_object(
+            Bucket="landtoolsai-test", Key="2020-06-01-Ivor-VA.csv", Body=csv_text.encode()
+        )
+        self.assertEqual(len(self.load("2020-06-01-Ivor-VA.csv")), 4)
+
+        save_index(
+            s3=self.s3,
+            bucket="landtoolsai-test",
+            location=self.location,
+            index=build_index(TODAY),
+        )
+        self.assertEqual(self.load("2020-06-01-Ivor-VA.csv").entries, build_index(TODAY).entries)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+# Built-in
+import subprocess
+import sys
+import unittest
+
+
+# Well under the 370 ms the handler took to import with boto3, bs4 and
+# httpx loaded up front
+IMPORT_TIME_BUDGET_MS = 250
+DEFERRED_MODULES = ("boto3", "botocore", "bs4", "httpx", "lxml", "multiprocessing")
+
+
+def import_handler(*flags, code="import scrape_landwatch"):
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code], capture_output=True, text=True, check=True
+    )
+
+
+class TestImportTime(unittest.TestCase):
+    def test_heavy_modules_deferred(self):
+        code = (
+            "import sys, scrape_landwatch; "
+            f"print(sorted(set({DEFERRED_MODULES!r}) & set(sys.modules)))"
+        )
+        result = import_handler(code=code)
+        self.assertEqual(result.stdout.strip(), "[]")
+
+    def test_import_time_budget(self):
+        # Best of three, so one slow run on a busy machine doesn't fail it
+        import_times_ms = []
+        for _ in range(3):
+            result = import_handler("-X", "importtime")
+            # The last line is the handler module, with its cumulative time in us
+            last_line = result.stderr.strip().splitlines()[-1]
+            self.assertTrue(last_line.endswith("| scrape_landwatch"), last_line)
+            import_times_ms.append(int(last_line.split("|")[1]) / 1000)
+        self.assertLess(min(import_times_ms), IMPORT_TIME_BUDGET_MS)
+
+
+if __name__ == "__main__":
+    unittest.main()
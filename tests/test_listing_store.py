@@ -0,0 +1,105 @@
+# Built-in
+import io
+from pathlib import Path
+import tempfile
+import unittest
+
+# Local imports
+from listing_store import ListingStore
+from listings import Listing
+import scrape_landwatch
+
+
+def county_listings(location="Osage_County-OK"):
+    with open(Path("tests/county.html")) as county_html:
+        page_html = county_html.read()
+    return list(scrape_landwatch.parse_page_listings(page_html, {"location": location}))
+
+
+class TestListingStore(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.store = ListingStore(str(Path(tmp_dir.name) / "listings.sqlite"), batch_size=4)
+        self.addCleanup(self.store.close)
+
+    def test_wal_mode(self):
+        mode = self.store.connection.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+    def test_add_buffers_in_batches(self):
+        listings = county_listings()
+        for listing in listings[:5]:
+            self.store.add(listing, "2020-01-07")
+        self.assertEqual(self.store.count(), 4)
+        self.store.flush()
+        self.assertEqual(self.store.count(), 5)
+
+    def test_query(self):
+        osage = county_listings()
+        pawnee = [listing._replace(pid=listing.pid + 1) for listing in county_listings("Pawnee")]
+        self.store.add_many(osage, "2020-01-07")
+        self.store.add_many(pawnee, "2020-02-07")
+        # Scraped again the same day, so replaced rather than added
+        self.store.add_many(osage, "2020-01-07")
+        self.assertEqual(self.store.count(), len(osage) + len(pawnee))
+
+        cheapest = self.store.cheapest_per_acre(locations=["Osage_County-OK"], limit=3)
+        self.assertEqual(
+            [row["price_per_acre"] for row in cheapest],
+            sorted(listing.price_per_acre for listing in osage)[:3],
+        )
+        self.assertEqual({row["scrape_date"] for row in cheapest}, {"2020-01-07"})
+
+        recent = self.store.query(since="2020-02-01", order_by="pid")
+        self.assertEqual({row["location"] for row in recent}, {"Pawnee"})
+        big = self.store.query(min_acres=100, max_price_per_acre=5000)
+        self.assertTrue(all(row["acres"] >= 100 for row in big))
+        self.assertTrue(all(row["price_per_acre"] <= 5000 for row in big))
+        with self.assertRaises(ValueError):
+            self.store.query(order_by="price; DROP TABLE listings")
+
+    def test_overlapping_locations(self):
+        county = county_listings()
+        city = county_listings("Pawhuska")[:3]
+        self.store.add_many(county, "2020-01-07")
+        # The same listings, found by a city run the same day
+        self.store.add_many(city, "2020-01-07")
+
+        self.assertEqual(self.store.count(), len(county) + len(city))
+        self.assertEqual(len(self.store.query(locations=["Osage_County-OK"])), len(county))
+        self.assertEqual(
+            {row["pid"] for row in self.store.query(locations=["Pawhuska"])},
+            {listing.pid for listing in city},
+        )
+        self.assertEqual(len(self.store.price_history(city[0].pid)), 2)
+
+    def test_placeholders_stored_as_null(self):
+        listing = Listing(
+            "https://www.landwatch.com/pid/1", 1, "Error", 1000, None, "CityNotPresent"
+        )
+        self.store.add_many([listing], "2020-01-07")
+        self.store.add_many([listing._replace(acres=2.0, price_per_acre=500.0)], "2020-01-08")
+
+        history = self.store.price_history(1)
+        self.assertEqual([row["scrape_date"] for row in history], ["2020-01-07", "2020-01-08"])
+        self.assertIsNone(history[0]["acres"])
+        self.assertIsNone(history[0]["city"])
+        # Listings without a price per acre sort nowhere
+        self.assertEqual(len(self.store.cheapest_per_acre()), 1)
+
+    def test_import_csv(self):
+        listings = county_listings()
+        csv_text = scrape_landwatch.write_to_csv_in_buffer(listings).getvalue()
+
+        self.store.import_csv(io.StringIO(csv_text), "2020-01-07")
+
+        rows = self.store.query(order_by="pid")
+        self.assertEqual(len(rows), len(listings))
+        first = min(listings, key=lambda listing: listing.pid)
+        self.assertEqual(rows[0]["pid"], first.pid)
+        self.assertEqual(rows[0]["price_per_acre"], first.price_per_acre)
+
+
+if __name__ == "__main__":
+    unittest.main()
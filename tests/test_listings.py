@@ -0,0 +1,143 @@
+# Built-in
+import csv
+import io
+from pathlib import Path
+import pickle
+import unittest
+
+# Local imports
+from listings import (
+    LISTING_FIELDS,
+    Listing,
+    ListingBatch,
+    ParquetListingWriter,
+    clean_listing,
+)
+import scrape_landwatch
+
+# Third party lib
+from bs4 import BeautifulSoup
+
+
+def fixture_listing_dicts(name):
+    with open(Path(f"tests/{name}.html")) as page_html:
+        soup = BeautifulSoup(page_html, "html.parser")
+    location = {"location": name}
+    return [
+        scrape_landwatch.listing_parser(row, location) for row in soup.select("div.result")
+    ]
+
+
+class TestListingBatch(unittest.TestCase):
+    def setUp(self):
+        self.listing_dicts = fixture_listing_dicts("county")
+        self.listing_dicts.append(
+            {
+                "listing_url": "https://www.landwatch.com/x/pid/1",
+                "pid": 1,
+                "acres": "Error",
+            }
+        )
+        self.batch = ListingBatch(self.listing_dicts)
+
+    def test_round_trip(self):
+        self.assertEqual(len(self.batch), len(self.listing_dicts))
+        expected = [Listing.from_dict(listing) for listing in self.listing_dicts]
+        self.assertEqual(list(self.batch), expected)
+        self.assertEqual(list(pickle.loads(pickle.dumps(self.batch))), expected)
+
+    def test_to_csv_matches_dict_writer(self):
+        expected = io.StringIO()
+        writer = csv.DictWriter(expected, fieldnames=LISTING_FIELDS)
+        writer.writeheader()
+        writer.writerows(self.listing_dicts)
+
+        self.assertEqual(
+            self.batch.to_csv(io.StringIO()).getvalue(), expected.getvalue()
+        )
+
+    def test_to_numpy(self):
+        arrays = self.batch.to_numpy()
+        self.assertEqual(arrays["price"][0], self.listing_dicts[0]["price"])
+        self.assertEqual(arrays["acres"][0], self.listing_dicts[0]["acres"])
+        self.assertEqual(arrays["pid"][-1], 1)
+        self.assertNotEqual(arrays["acres"][-1], arrays["acres"][-1])  # NaN
+
+    def test_to_parquet(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest("pyarrow not installed")
+
+        buffer = self.batch.to_parquet(io.BytesIO())
+        buffer.seek(0)
+        table = pq.read_table(buffer)
+        self.assertEqual(table.num_rows, len(self.listing_dicts))
+        self.assertEqual(table.column("acres").null_count, 1)
+        self.assertEqual(table.column_names, list(LISTING_FIELDS))
+        self.assertEqual(str(table.schema.field("price").type), "int64")
+        self.assertEqual(table.column("price").null_count, 1)
+
+    def test_clean_listing(self):
+        listing = Listing(
+            "https://www.landwatch.com/x/pid/1",
+            1,
+            1,
+            5000,
+            5000.0,
+            "CityNotPresent",
+            "DescNotPresent",
+            "Osage_County-OK",
+            "OfficeNameNotPresent",
+            "OfficeURLNotPresent",
+            "OfficeStatusBlank",
+        )
+        self.assertEqual(
+            clean_listing(listing),
+            Listing(
+                "https://www.landwatch.com/x/pid/1", 1, 1, 5000, 5000.0, location="Osage_County-OK"
+            ),
+        )
+        failed = Listing("https://www.landwatch.com/x/pid/2", 2, "Error")
+        cleaned = clean_listing(failed)
+        self.assertEqual(cleaned.acres, None)
+        # Nothing left to replace gives back the same listing
+        self.assertIs(clean_listing(cleaned), cleaned)
+
+    def test_parquet_listing_writer(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest("pyarrow not installed")
+
+        buffer = io.BytesIO()
+        parquet_writer = ParquetListingWriter(buffer, row_group_size=6)
+        for listing in self.listing_dicts:
+            parquet_writer.writerow(listing)
+        parquet_writer.close()
+
+        buffer.seek(0)
+        parquet_file = pq.ParquetFile(buffer)
+        self.assertEqual(parquet_file.num_row_groups, 3)
+        table = parquet_file.read()
+        self.assertEqual(table.num_rows, 16)
+        self.assertEqual(table.column("pid").to_pylist()[-1], 1)
+        self.assertEqual(table.column("acres").to_pylist()[-1], None)
+        self.assertEqual(table.column("price").to_pylist()[0], self.listing_dicts[0]["price"])
+
+    def test_parquet_listing_writer_empty(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest("pyarrow not installed")
+
+        buffer = io.BytesIO()
+        ParquetListingWriter(buffer).close()
+        buffer.seek(0)
+        table = pq.read_table(buffer)
+        self.assertEqual(table.num_rows, 0)
+        self.assertEqual(table.column_names, list(LISTING_FIELDS))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+# Built-in
+from pathlib import Path
+import unittest
+
+# Local imports
+import scrape_landwatch
+
+# Third party lib
+from bs4 import BeautifulSoup
+
+try:
+    import lxml_parser
+except ImportError:
+    lxml_parser = None
+
+
+PAGES = ("city", "county", "state", "zipcode")
+
+
+@unittest.skipIf(lxml_parser is None, "lxml not installed")
+class TestLxmlParserMatchesSoup(unittest.TestCase):
+    def load(self, name):
+        with open(Path(f"tests/{name}.html")) as page_html:
+            raw = page_html.read()
+        return BeautifulSoup(raw, "html.parser"), lxml_parser.parse_html(raw)
+
+    def test_get_location(self):
+        for name in PAGES:
+            soup, doc = self.load(name)
+            self.assertEqual(
+                lxml_parser.get_location(doc), scrape_landwatch.get_location(soup), name
+            )
+
+    def test_get_num_of_results(self):
+        for name in PAGES:
+            soup, doc = self.load(name)
+            self.assertEqual(
+                lxml_parser.get_num_of_results(doc),
+                scrape_landwatch.get_num_of_results(soup),
+                name,
+            )
+
+    def test_gen_paginated_urls(self):
+        soup, doc = self.load("county")
+        num_of_results = scrape_landwatch.get_num_of_results(soup)
+        self.assertEqual(
+            lxml_parser.gen_paginated_urls(doc, num_of_results),
+            scrape_landwatch.gen_paginated_urls(soup, num_of_results),
+        )
+
+    def test_listing_parser(self):
+        location = {"location": "Osage_County-OK"}
+        for name in PAGES:
+            soup, doc = self.load(name)
+            soup_listings = [
+                scrape_landwatch.listing_parser(row, location)
+                for row in soup.select("div.result")
+            ]
+            lxml_listings = [
+                lxml_parser.listing_parser(row, location)
+                for row in lxml_parser.result_rows(doc)
+            ]
+            self.assertTrue(soup_listings, name)
+            self.assertEqual(lxml_listings, soup_listings, name)
+            for soup_listing, lxml_listing in zip(soup_listings, lxml_listings):
+                self.assertEqual(list(lxml_listing), list(soup_listing))
+
+    def test_get_parser_backend(self):
+        backend = scrape_landwatch.get_parser_backend("lxml")
+        self.assertIs(backend.listing_parser, lxml_parser.listing_parser)
+        with self.assertRaises(ValueError):
+            scrape_landwatch.get_parser_backend("regex")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+# Built-in
+from pathlib import Path
+import unittest
+
+# Local imports
+from listings import Listing
+from market_summary import MarketSummary
+import scrape_landwatch
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def listing(pid, price, acres, city="Pawhuska", office="Osage Land Co"):
+    price_per_acre = price / acres if isinstance(acres, (int, float)) else None
+    return Listing(
+        f"https://www.landwatch.com/pid/{pid}",
+        pid,
+        acres,
+        price,
+        price_per_acre,
+        city,
+        "A description",
+        "Osage_County-OK",
+        office,
+    )
+
+
+@unittest.skipIf(np is None, "numpy not installed")
+class TestMarketSummary(unittest.TestCase):
+    def test_placeholders_kept_out(self):
+        market_summary = MarketSummary()
+        market_summary.add(listing(1, 50000, 10.0))
+        # No acreage on the listing, so listing_parser's int 1 default
+        market_summary.add(listing(2, 80000, 1))
+        # A real one acre lot
+        market_summary.add(listing(3, 20000, 1.0))
+        market_summary.add(Listing("https://www.landwatch.com/pid/4", 4, "Error"))
+        market_summary.add(listing(5, 1, 5.0))
+
+        summary = market_summary.summary()
+
+        self.assertEqual(summary["listings"], 5)
+        self.assertEqual(summary["acres_defaulted"], 1)
+        self.assertEqual(summary["parse_errors"], 1)
+        self.assertEqual(summary["price_missing"], 2)
+        self.assertEqual(summary["price"]["count"], 3)
+        self.assertEqual(summary["acres"]["count"], 3)
+        self.assertEqual(summary["price_per_acre"]["count"], 2)
+        self.assertEqual(summary["price_per_acre"]["min"], 5000.0)
+        self.assertEqual(summary["price_per_acre"]["max"], 20000.0)
+
+    def test_fixture_pages(self):
+        market_summary = MarketSummary()
+        listings = []
+        for name in ("city", "county", "state", "zipcode"):
+            with open(Path(f"tests/{name}.html")) as page_html:
+                page_batch = scrape_landwatch.parse_page_listings(
+                    page_html.read(), {"location": name}
+                )
+            listings.extend(page_batch)
+            for page_listing in page_batch:
+                market_summary.add(page_listing)
+
+        summary = market_summary.summary()
+
+        priced = [
+            page_listing
+            for page_listing in listings
+            if isinstance(page_listing.acres, float) and page_listing.acres > 0
+        ]
+        prices_per_acre = [page_listing.price_per_acre for page_listing in priced]
+        self.assertEqual(summary["acres_defaulted"], len(listings) - len(priced))
+        self.assertEqual(summary["price_per_acre"]["count"], len(priced))
+        self.assertEqual(
+            summary["price_per_acre"]["p50"], round(float(np.median(prices_per_acre)), 2)
+        )
+        self.assertEqual(
+            sum(bucket["count"] for bucket in summary["price_per_acre_histogram"]), len(priced)
+        )
+        for city, aggregate in summary["by_city"].items():
+            city_prices = [
+                page_listing.price_per_acre
+                for page_listing in priced
+                if page_listing.city == city
+            ]
+            self.assertEqual(aggregate["listings"], len(city_prices), city)
+            self.assertEqual(
+                aggregate["price_per_acre_median"], round(float(np.median(city_prices)), 2), city
+            )
+        self.assertNotIn("CityNotPresent", summary["by_city"])
+
+    def test_outliers(self):
+        market_summary = MarketSummary()
+        for pid in range(20):
+            market_summary.add(listing(pid, 50000 + pid * 1000, 10.0))
+        market_summary.add(listing(100, 9000000, 10.0))
+        market_summary.add(listing(101, 500, 10.0))
+
+        outliers = market_summary.summary()["outliers"]
+
+        self.assertEqual(
+            {(outlier["pid"], outlier["side"]) for outlier in outliers},
+            {(100, "high"), (101, "low")},
+        )
+
+    def test_empty(self):
+        summary = MarketSummary().summary()
+        self.assertEqual(summary["listings"], 0)
+        self.assertEqual(summary["price_per_acre"], {"count": 0})
+        self.assertEqual(summary["by_office"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+# Built-in
+import json
+import unittest
+
+# Local imports
+from metrics import ScrapeMetrics
+
+
+class TestScrapeMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = ScrapeMetrics()
+        for latency in (0.5, 0.1, 0.2, 0.4, 0.3):
+            self.metrics.add("fetch_attempts")
+            self.metrics.observe("fetch_seconds", latency)
+        self.metrics.add("pages_fetched", 4)
+        self.metrics.add("bytes_fetched", 1024)
+
+    def test_summary(self):
+        summary = self.metrics.summary()
+
+        self.assertEqual(summary["fetch_attempts"], 5)
+        self.assertEqual(summary["retries"], 1)
+        self.assertEqual(summary["bytes_fetched"], 1024)
+        self.assertEqual(
+            summary["fetch_seconds"], {"count": 5, "sum": 1.5, "p50": 0.3, "p99": 0.5, "max": 0.5}
+        )
+
+    def test_timer(self):
+        with self.metrics.timer("parse_seconds"):
+            pass
+        with self.assertRaises(ValueError):
+            with self.metrics.timer("parse_seconds"):
+                raise ValueError
+        self.assertEqual(self.metrics.summary()["parse_seconds"]["count"], 2)
+
+    def test_to_emf(self):
+        record = json.loads(
+            self.metrics.to_emf(
+                dimensions={"proxies": "luminati"}, properties={"location": "Osage_County-OK"}
+            )
+        )
+
+        (directive,) = record["_aws"]["CloudWatchMetrics"]
+        self.assertEqual(directive["Dimensions"], [["proxies"]])
+        units = {metric["Name"]: metric["Unit"] for metric in directive["Metrics"]}
+        self.assertEqual(units["fetch_attempts"], "Count")
+        self.assertEqual(units["bytes_fetched"], "Bytes")
+        self.assertEqual(units["fetch_seconds_p99"], "Seconds")
+        # Every metric named in the directive has its value at the top level
+        for name in units:
+            self.assertIn(name, record)
+        self.assertEqual(record["proxies"], "luminati")
+        self.assertEqual(record["location"], "Osage_County-OK")
+        self.assertEqual(record["fetch_seconds_p50"], 0.3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+# Built-in
+import asyncio
+from pathlib import Path
+import unittest
+
+# Local imports
+from client_sessions import ClientSessions
+from fake_landwatch_server import CAPTCHA_HTML, FakeLandwatchServer
+from page_stream import ResultsPageReader
+import scrape_landwatch
+
+
+PAGES = ("city", "county", "state", "zipcode")
+
+
+class TestResultsPageReader(unittest.TestCase):
+    def read(self, body, chunk_size):
+        reader = ResultsPageReader()
+        for start in range(0, len(body), chunk_size):
+            if reader.feed(body[start : start + chunk_size]):
+                break
+        return reader
+
+    def test_stops_after_results_block(self):
+        for name in PAGES:
+            with open(Path(f"tests/{name}.html"), "rb") as page_html:
+                body = page_html.read()
+            # Small chunks split the class name and tags across feeds
+            reader = self.read(body, 1000)
+
+            self.assertTrue(reader.complete, name)
+            self.assertLess(len(reader.content), len(body), name)
+            page_html = bytes(reader.content).decode()
+            self.assertEqual(
+                list(scrape_landwatch.parse_page_listings(page_html, {"location": name})),
+                list(scrape_landwatch.parse_page_listings(body.decode(), {"location": name})),
+                name,
+            )
+
+    def test_reads_other_pages_in_full(self):
+        reader = self.read(CAPTCHA_HTML, 10)
+        self.assertFalse(reader.complete)
+        self.assertEqual(bytes(reader.content), CAPTCHA_HTML)
+
+
+class TestStreamedScrape(unittest.TestCase):
+    def scrape(self, html, stream_reads):
+        async def run():
+            async with FakeLandwatchServer(html, chunk_size=4096) as server:
+                location = {"landwatchurl": server.url("/Oklahoma_land_for_sale/Osage/Land")}
+                listings = []
+                metrics = scrape_landwatch.ScrapeMetrics()
+                async with ClientSessions(max_connections=4) as sessions:
+                    await scrape_landwatch.stream_location_listings(
+                        location,
+                        con_limit=4,
+                        proxies="direct",
+                        sessions=sessions,
+                        on_listing=listings.append,
+                        metrics=metrics,
+                        stream_reads=stream_reads,
+                    )
+            return listings, metrics.summary(), server.bytes_sent
+
+        return asyncio.run(run())
+
+    def test_same_listings_fewer_bytes(self):
+        with open(Path("tests/county.html"), "rb") as county_html:
+            html = county_html.read()
+
+        full_listings, full_metrics, full_bytes = self.scrape(html, stream_reads=False)
+        listings, metrics, bytes_sent = self.scrape(html, stream_reads=True)
+
+        self.assertEqual(len(listings), 13 * 15)
+        self.assertEqual(listings, full_listings)
+        self.assertEqual(metrics["reads_stopped_early"], metrics["pages_fetched"])
+        self.assertLess(metrics["bytes_fetched"], full_metrics["bytes_fetched"])
+        self.assertLess(bytes_sent, full_bytes)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+# Built-in
+import unittest
+
+# Local imports
+from pagination import count_pages, page_url
+
+
+class TestPagination(unittest.TestCase):
+    def test_page_url(self):
+        starting_url = "https://www.landwatch.com/Oklahoma_land_for_sale/Osage_County/Land"
+        self.assertEqual(page_url(starting_url, 1), starting_url)
+        self.assertEqual(page_url(starting_url, 13), f"{starting_url}/page-13")
+        self.assertEqual(page_url(starting_url + "/", 2), f"{starting_url}/page-2")
+
+    def test_count_pages(self):
+        self.assertEqual(count_pages(186, 15), 13)
+        self.assertEqual(count_pages(9, 9), 1)
+        self.assertEqual(count_pages(0, 0), 1)
+        # A full first page sets the page size
+        self.assertEqual(count_pages(100, 25), 4)
+        self.assertEqual(count_pages(31), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
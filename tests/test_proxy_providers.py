@@ -0,0 +1,127 @@
+# Built-in
+import asyncio
+from pathlib import Path
+import unittest
+from unittest import mock
+
+# Local imports
+from concurrency import AdaptiveLimiter
+from fake_landwatch_server import FakeLandwatchServer
+from proxy_providers import (
+    HTTPProxyProvider,
+    ProxyBalancer,
+    ProxyProvider,
+    ScraperAPIProvider,
+    get_provider,
+    get_proxy_balancer,
+)
+import scrape_landwatch
+
+# Third party lib
+from tenacity import wait_random_exponential
+
+
+class NamedProvider(ProxyProvider):
+    def __init__(self, name):
+        self.name = name
+
+
+class TestGetProvider(unittest.TestCase):
+    def test_by_name(self):
+        self.assertEqual(get_provider("direct").name, "direct")
+        self.assertEqual(get_provider("crawlera").name, "crawlera")
+        self.assertIsInstance(get_provider("scraperapi"), ScraperAPIProvider)
+        with self.assertRaises(ValueError):
+            get_provider("carrier_pigeon")
+
+    def test_luminati_zones(self):
+        with mock.patch.dict("os.environ", {"LUMINATI_CUSTOMER_ID": "cust"}):
+            provider = get_provider({"name": "luminati2", "zone": "zone2", "weight": 2})
+        self.assertEqual(provider.name, "luminati2")
+        self.assertIn("lum-customer-cust-zone-zone2-", provider.client_kwargs()["proxies"]["http"])
+
+    def test_proxy_url(self):
+        provider = get_provider({"name": "local", "proxy_url": "http://127.0.0.1:8080"})
+        self.assertIsInstance(provider, HTTPProxyProvider)
+        self.assertEqual(provider.client_kwargs()["proxies"]["https"], "http://127.0.0.1:8080")
+
+
+class TestProxyBalancer(unittest.TestCase):
+    def test_spreads_by_weight(self):
+        balancer = get_proxy_balancer(
+            [{"name": "luminati", "weight": 3}, {"name": "crawlera", "weight": 1}], seed=0
+        )
+        self.assertEqual(balancer.name, "luminati+crawlera")
+        picks = [balancer.choose().name for _ in range(4000)]
+        self.assertAlmostEqual(picks.count("luminati") / len(picks), 0.75, delta=0.03)
+
+    def test_rejects_duplicate_names(self):
+        with self.assertRaises(ValueError):
+            get_proxy_balancer(
+                [{"name": "luminati", "zone": "a"}, {"name": "luminati", "zone": "b"}]
+            )
+
+    def test_benches_failing_provider(self):
+        good, bad = NamedProvider("good"), NamedProvider("bad")
+        balancer = ProxyBalancer([good, bad], min_requests=5, cooldown=60, seed=0)
+        for _ in range(20):
+            balancer.record(good, ok=True, latency=0.1)
+            balancer.record(bad, ok=False, soup_check_failed=True)
+        self.assertTrue(all(balancer.choose() is good for _ in range(100)))
+        stats = balancer.stats()
+        self.assertEqual(stats["bad"]["soup_check_failures"], 20)
+        self.assertEqual(stats["good"]["failures"], 0)
+
+    def test_all_benched_still_chooses(self):
+        first, second = NamedProvider("first"), NamedProvider("second")
+        balancer = ProxyBalancer([first, second], min_requests=1, cooldown=60)
+        for _ in range(5):
+            balancer.record(first, ok=False)
+            balancer.record(second, ok=False)
+        self.assertIn(balancer.choose(), (first, second))
+
+
+@mock.patch.object(
+    scrape_landwatch, "RETRY_WAIT", wait_random_exponential(multiplier=0.005, max=0.05)
+)
+class TestFetchThroughProxies(unittest.TestCase):
+    def test_routes_around_captcha_proxy(self):
+        with open(Path("tests/county.html"), "rb") as county_html:
+            html = county_html.read()
+
+        async def run():
+            # Each fake server answers the proxied request for any URL
+            async with FakeLandwatchServer(html) as good_proxy, FakeLandwatchServer(
+                html, captcha_rate=1.0
+            ) as bad_proxy:
+                balancer = ProxyBalancer(
+                    [
+                        HTTPProxyProvider("good", good_proxy.url("")),
+                        HTTPProxyProvider("bad", bad_proxy.url("")),
+                    ],
+                    min_requests=5,
+                    cooldown=60,
+                    seed=0,
+                )
+                urls = [f"http://landwatch.test/Land/page-{i}" for i in range(60)]
+                page_htmls = await scrape_landwatch.fetch_urls(
+                    urls=urls,
+                    con_limit=4,
+                    tag_check="div",
+                    dict_check={"class": "resultstitle"},
+                    proxies=balancer,
+                    limiter=AdaptiveLimiter(initial=4, maximum=4),
+                )
+                return page_htmls, balancer, good_proxy.paths, bad_proxy.paths
+
+        page_htmls, balancer, good_paths, bad_paths = asyncio.run(run())
+        self.assertEqual(len(page_htmls), 60)
+        self.assertTrue(all("resultstitle" in page_html for page_html in page_htmls))
+        # Proxies are sent the whole page URL
+        self.assertTrue(all(path.startswith("http://landwatch.test") for path in good_paths))
+        self.assertLess(len(bad_paths), len(good_paths))
+        self.assertGreater(balancer.health["bad"].benched_until, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
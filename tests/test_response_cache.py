@@ -0,0 +1,86 @@
+# Built-in
+import os
+from pathlib import Path
+import tempfile
+import time
+import unittest
+
+# Local imports
+from response_cache import ChainedResponseCache, LocalResponseCache, S3ResponseCache
+from s3_test_case import BUCKET, S3TestCase
+
+
+PAGE_URL = "https://www.landwatch.com/Oklahoma_land_for_sale/Osage_County/Land/page-2"
+
+
+class ResponseCacheTests:
+    def test_round_trip(self):
+        with open(Path("tests/county.html")) as county_html:
+            html = county_html.read()
+
+        self.assertIsNone(self.cache.get(PAGE_URL))
+        self.cache.put(PAGE_URL, html)
+        self.assertEqual(self.cache.get(PAGE_URL), html)
+        self.assertIsNone(self.cache.get(PAGE_URL.replace("page-2", "page-3")))
+
+    def test_expired_pages_are_misses(self):
+        self.cache.put(PAGE_URL, "<html></html>")
+        self.cache.ttl = -1
+        self.assertIsNone(self.cache.get(PAGE_URL))
+
+
+class TestLocalResponseCache(ResponseCacheTests, unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = LocalResponseCache(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_stored_compressed(self):
+        with open(Path("tests/county.html")) as county_html:
+            html = county_html.read()
+        self.cache.put(PAGE_URL, html)
+        (cache_file,) = Path(self.tmp_dir.name).iterdir()
+        self.assertLess(cache_file.stat().st_size, len(html) / 3)
+
+    def test_least_recently_used_evicted(self):
+        pages = {f"{PAGE_URL}?n={n}": os.urandom(512).hex() for n in range(4)}
+        urls = list(pages)
+        for url in urls[:3]:
+            self.cache.put(url, pages[url])
+        # Room for the three pages stored so far but not a fourth
+        page_size = self.cache._path(urls[0]).stat().st_size
+        self.cache.max_bytes = 3 * page_size + page_size // 2
+        # The first page stored was read most recently, the second least
+        for seconds_ago, url in ((30, urls[1]), (20, urls[2]), (10, urls[0])):
+            path = self.cache._path(url)
+            os.utime(path, (time.time() - seconds_ago, path.stat().st_mtime))
+
+        self.cache.put(urls[3], pages[urls[3]])
+
+        self.assertIsNone(self.cache.get(urls[1]))
+        for url in (urls[0], urls[2], urls[3]):
+            self.assertEqual(self.cache.get(url), pages[url])
+
+
+class TestS3ResponseCache(ResponseCacheTests, S3TestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = S3ResponseCache(s3=self.s3, bucket=BUCKET)
+
+    def test_chained_hit_fills_local_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            local_cache = LocalResponseCache(cache_dir)
+            self.cache.put(PAGE_URL, "<html>page 2</html>")
+
+            cache = ChainedResponseCache(local_cache, self.cache)
+            self.assertEqual(cache.get(PAGE_URL), "<html>page 2</html>")
+            self.assertEqual(local_cache.get(PAGE_URL), "<html>page 2</html>")
+
+            cache.put(PAGE_URL + "?n=1", "<html>new</html>")
+            self.assertEqual(self.cache.get(PAGE_URL + "?n=1"), "<html>new</html>")
+
+
+if __name__ == "__main__":
+    unittest.main()
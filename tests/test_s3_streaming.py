@@ -0,0 +1,144 @@
+# Built-in
+import asyncio
+import csv
+import gc
+import gzip
+import io
+import threading
+import unittest
+
+# Local imports
+from s3_streaming import MIN_PART_SIZE, S3MultipartWriter, StreamingCSVUpload
+from s3_test_case import BUCKET, S3TestCase
+import scrape_landwatch
+
+
+class GatedS3:
+    """S3 client stand-in whose multipart calls wait until gate is set."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.completed_parts = None
+
+    def create_multipart_upload(self, **kwargs):
+        self.gate.wait()
+        return {"UploadId": "upload-1"}
+
+    def upload_part(self, **kwargs):
+        self.gate.wait()
+        return {"ETag": f"etag-{kwargs['PartNumber']}"}
+
+    def complete_multipart_upload(self, **kwargs):
+        self.completed_parts = kwargs["MultipartUpload"]["Parts"]
+
+
+class TestNonBlockingWrites(unittest.TestCase):
+    def test_writes_never_wait_on_s3(self):
+        s3 = GatedS3()
+        parts = S3MultipartWriter(
+            s3=s3, bucket=BUCKET, key="big.csv", max_concurrency=2, blocking=False
+        )
+
+        async def run():
+            # S3 hasn't answered yet, but the writes return and the loop runs
+            parts.write(b"x" * (4 * MIN_PART_SIZE))
+            drained = asyncio.ensure_future(parts.drain())
+            await asyncio.sleep(0.05)
+            self.assertFalse(drained.done())
+
+            s3.gate.set()
+            await asyncio.wait_for(drained, timeout=5)
+
+        asyncio.run(run())
+        parts.complete()
+
+        self.assertEqual(parts.upload_id, "upload-1")
+        self.assertEqual([part["PartNumber"] for part in s3.completed_parts], [1, 2, 3, 4])
+
+
+class TestStreamingUpload(S3TestCase):
+    def get_body(self, key):
+        return self.s3.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+
+    def write_rows(self, text, num_of_rows):
+        writer = csv.writer(text)
+        rows = [[i, f"listing {i}", "x" * 200] for i in range(num_of_rows)]
+        writer.writerows(rows)
+        expected = io.StringIO()
+        csv.writer(expected).writerows(rows)
+        return expected.getvalue().encode()
+
+    def test_multipart_upload(self):
+        with StreamingCSVUpload(s3=self.s3, bucket=BUCKET, key="big.csv") as upload:
+            expected = self.write_rows(upload.text, 60000)
+
+        self.assertGreater(len(expected), 2 * MIN_PART_SIZE)
+        self.assertGreater(len(upload.parts.part_uploads), 2)
+        self.assertEqual(self.get_body("big.csv"), expected)
+
+    def test_gzip_upload(self):
+        with StreamingCSVUpload(
+            s3=self.s3, bucket=BUCKET, key="big.csv.gz", compress=True
+        ) as upload:
+            expected = self.write_rows(upload.text, 60000)
+
+        self.assertEqual(gzip.decompress(self.get_body("big.csv.gz")), expected)
+        head = self.s3.head_object(Bucket=BUCKET, Key="big.csv.gz")
+        self.assertEqual(head["ContentEncoding"], "gzip")
+
+    def test_small_upload_is_single_put(self):
+        parts = S3MultipartWriter(s3=self.s3, bucket=BUCKET, key="small.csv")
+        parts.write(b"pid\n1\n")
+        parts.complete()
+
+        self.assertIsNone(parts.upload_id)
+        self.assertEqual(self.get_body("small.csv"), b"pid\n1\n")
+
+    def test_abort_discards_parts(self):
+        with self.assertRaises(RuntimeError):
+            with StreamingCSVUpload(s3=self.s3, bucket=BUCKET, key="failed.csv") as upload:
+                self.write_rows(upload.text, 30000)
+                raise RuntimeError("scrape failed")
+
+        uploads = self.s3.list_multipart_uploads(Bucket=BUCKET)
+        self.assertEqual(uploads.get("Uploads", []), [])
+        objects = self.s3.list_objects_v2(Bucket=BUCKET)
+        self.assertEqual(objects["KeyCount"], 0)
+
+    def test_dropped_upload_is_not_published(self):
+        for rows in (10, 30000):
+            upload = StreamingCSVUpload(s3=self.s3, bucket=BUCKET, key="partial.csv")
+            self.write_rows(upload.text, rows)
+            del upload
+            gc.collect()
+
+        uploads = self.s3.list_multipart_uploads(Bucket=BUCKET)
+        self.assertEqual(uploads.get("Uploads", []), [])
+        objects = self.s3.list_objects_v2(Bucket=BUCKET)
+        self.assertEqual(objects["KeyCount"], 0)
+
+    def test_s3_csv_output_streams_listings(self):
+        location = {"location": "Osage_County-OK"}
+        listing = {
+            "listing_url": "https://www.landwatch.com/x/pid/1",
+            "pid": 1,
+            "acres": 2.0,
+            "price": 100,
+            "price_per_acre": 50.0,
+        }
+        for stream in (False, True):
+            csv_output = scrape_landwatch.S3CSVOutput(
+                location=location, BUCKET=BUCKET, stream=stream, compress=True, s3=self.s3
+            )
+            csv_output.writerow(listing)
+            csv_url = csv_output.finish()
+
+            key = scrape_landwatch.csv_s3_key(location, compress=True)
+            self.assertTrue(csv_url.endswith(key))
+            lines = gzip.decompress(self.get_body(key)).decode().splitlines()
+            self.assertEqual(lines[0].split(",")[:3], ["listing_url", "pid", "acres"])
+            self.assertEqual(lines[1].split(",")[1], "1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,23 @@
 # Built-in
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import io
+import json
 from pathlib import Path
+import tempfile
+import threading
 import unittest
+from unittest import mock
 
 # Local imports
+import delta
+from s3_test_case import BUCKET, S3TestCase
 import scrape_landwatch
 
 # Third party lib
 from bs4 import BeautifulSoup
+from tenacity import wait_none
 
 
 event = {
@@ -64,5 +75,768 @@ class TestLocationPrep(unittest.TestCase):
             self.assertIsInstance(paginated_url_blocks, list)
 
 
+class TestMarkerCheck(unittest.TestCase):
+    def test_matches_soup_find(self):
+        marker_check = scrape_landwatch.marker_check_pattern(
+            "div", {"class": "resultstitle"}
+        )
+        for name in ("city", "county", "state", "zipcode"):
+            with open(Path(f"tests/{name}.html"), "rb") as page_html:
+                html = page_html.read()
+            soup = BeautifulSoup(html, "html.parser")
+            found = soup.find("div", {"class": "resultstitle"}) is not None
+            self.assertEqual(bool(marker_check.search(html)), found, name)
+
+    def test_rejects_other_pages(self):
+        marker_check = scrape_landwatch.marker_check_pattern(
+            "div", {"class": "resultstitle"}
+        )
+        self.assertIsNone(marker_check.search(b'<div class="captcha">resultstitle</div>'))
+        self.assertIsNone(marker_check.search(b'<div class="resultstitles">'))
+        self.assertIsNotNone(marker_check.search(b"<DIV id=x class='left resultstitle'>"))
+
+
+class TestListingParser(unittest.TestCase):
+    def test_county_listing(self):
+        with open(Path("tests/county.html")) as county_html:
+            soup = BeautifulSoup(county_html, "html.parser")
+        listing = scrape_landwatch.listing_parser(
+            soup.select("div.result")[0], {"location": "Osage_County-OK"}
+        )
+        self.assertEqual(listing["pid"], int(listing["listing_url"].split("/")[-1]))
+        self.assertIsInstance(listing["acres"], float)
+        self.assertEqual(listing["price_per_acre"], listing["price"] / listing["acres"])
+        self.assertEqual(listing["location"], "Osage_County-OK")
+
+    def test_missing_fields(self):
+        row = BeautifulSoup(
+            '<div class="result"><div class="propName left">'
+            '<a href="/Land/pid/123">Pawhuska, Osage, OK $12,500</a></div></div>',
+            "html.parser",
+        ).div
+        listing = scrape_landwatch.listing_parser(row, {"location": "Osage_County-OK"})
+        self.assertEqual(
+            listing,
+            {
+                "listing_url": "https://www.landwatch.com/Land/pid/123",
+                "pid": 123,
+                "acres": 1,
+                "price": 12500,
+                "price_per_acre": 12500.0,
+                "city": "Pawhuska",
+                "description": "DescNotPresent",
+                "location": "Osage_County-OK",
+                "office_name": "OfficeNameNotPresent",
+                "office_url": "OfficeURLNotPresent",
+                "office_status": "OfficeStatusBlank",
+            },
+        )
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.status_code = 200
+        self.text = text
+        self.content = text.encode()
+
+
+class FakeClient:
+    """Serves the same saved results page for every url."""
+
+    def __init__(self, html):
+        self.html = html
+        self.requested = []
+
+    async def get(self, url, **kwargs):
+        self.requested.append(url)
+        await asyncio.sleep(0)
+        return FakeResponse(self.html)
+
+
+class ReversedPagesClient(FakeClient):
+    """
+    Serves later pages sooner, with the first listing of page N given pid
+    N so the order pages were emitted in can be read back from the rows.
+    """
+
+    async def get(self, url, **kwargs):
+        self.requested.append(url)
+        page_num = int(url.split("page-")[-1]) if "page-" in url else 1
+        await asyncio.sleep((20 - page_num) * 0.002)
+        return FakeResponse(self.html.replace("338036665", str(page_num)))
+
+
+class FailingPageClient(ReversedPagesClient):
+    """Like ReversedPagesClient, but every fetch of one page fails."""
+
+    def __init__(self, html, failing_page_num):
+        super().__init__(html)
+        self.failing_page_num = failing_page_num
+
+    async def get(self, url, **kwargs):
+        if url.endswith(f"page-{self.failing_page_num}"):
+            raise ConnectionError("proxy refused")
+        return await super().get(url, **kwargs)
+
+
+class CountyPagesClient(FakeClient):
+    """
+    Serves the saved county page as whichever county the url names, and
+    fails every fetch for the counties in failing_counties.
+    """
+
+    def __init__(self, html, failing_counties=()):
+        super().__init__(html)
+        self.failing_counties = failing_counties
+
+    async def get(self, url, **kwargs):
+        self.requested.append(url)
+        county = url.split("/")[4].replace("_County", "")
+        if county in self.failing_counties:
+            raise ConnectionError("proxy refused")
+        await asyncio.sleep(0)
+        return FakeResponse(self.html.replace("Osage", county))
+
+
+class FakeSessions:
+    def __init__(self, client):
+        self._client = client
+
+    def client(self, proxies):
+        return self._client
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+class TestStreamingPipeline(unittest.TestCase):
+    def test_stream_location_listings(self):
+        with open(Path("tests/county.html")) as county_html:
+            client = FakeClient(county_html.read())
+        location = {
+            "landwatchurl": "https://www.landwatch.com/Oklahoma_land_for_sale/Osage_County/Land"
+        }
+        csv_writer = scrape_landwatch.ListingCSVWriter()
+
+        num_of_listings = asyncio.run(
+            scrape_landwatch.stream_location_listings(
+                location,
+                con_limit=4,
+                proxies="luminati",
+                sessions=FakeSessions(client),
+                on_listing=csv_writer.writerow,
+                queue_size=2,
+            )
+        )
+
+        # 186 results at 15 a page is 13 pages, each served the 15 saved rows
+        self.assertEqual(len(client.requested), 13)
+        self.assertEqual(num_of_listings, 13 * 15)
+        self.assertEqual(csv_writer.rows_written, num_of_listings)
+        self.assertEqual(location["location"], "Osage_County-OK")
+        csv_lines = csv_writer.output_buffer.getvalue().splitlines()
+        self.assertTrue(csv_lines[0].startswith("listing_url,pid,acres,price"))
+
+    def test_stream_location_listings_metrics(self):
+        with open(Path("tests/county.html")) as county_html:
+            client = FakeClient(county_html.read())
+        location = {
+            "landwatchurl": "https://www.landwatch.com/Oklahoma_land_for_sale/Osage_County/Land"
+        }
+        metrics = scrape_landwatch.ScrapeMetrics()
+
+        asyncio.run(
+            scrape_landwatch.stream_location_listings(
+                location,
+                con_limit=4,
+                proxies="luminati",
+                sessions=FakeSessions(client),
+                on_listing=lambda listing: None,
+                metrics=metrics,
+            )
+        )
+
+        summary = metrics.summary()
+        self.assertEqual(summary["fetch_attempts"], 13)
+        self.assertEqual(summary["pages_fetched"], 13)
+        self.assertEqual(summary["retries"], 0)
+        self.assertEqual(summary["pages"], 13)
+        self.assertEqual(summary["listings"], 13 * 15)
+        self.assertEqual(summary["bytes_fetched"], 13 * len(client.html.encode()))
+        self.assertEqual(summary["fetch_seconds"]["count"], 13)
+        self.assertEqual(summary["parse_seconds"]["count"], 13)
+        self.assertEqual(summary["rows_per_page"]["p50"], 15)
+
+    def test_on_page_error_stops_run(self):
+        with open(Path("tests/county.html")) as county_html:
+            client = FakeClient(county_html.read())
+        urls = [f"https://www.landwatch.com/Osage_County/Land/page-{page}" for page in range(50)]
+
+        async def on_page(page_num, html):
+            raise OSError("checkpoint save failed")
+
+        async def run():
+            await asyncio.wait_for(
+                scrape_landwatch.stream_pages(
+                    urls=urls,
+                    tag_check="div",
+                    dict_check={"class": "resultstitle"},
+                    proxies="luminati",
+                    sessions=FakeSessions(client),
+                    limiter=scrape_landwatch.default_limiter(4),
+                    on_page=on_page,
+                    queue_size=3,
+                ),
+                timeout=10,
+            )
+
+        with self.assertRaises(OSError):
+            asyncio.run(run())
+        self.assertLess(len(client.requested), len(urls))
+
+    def test_speculative_pages_past_the_end(self):
+        # Nine results fit on the first page, so pages 2 to 4 are wasted
+        with open(Path("tests/zipcode.html")) as zipcode_html:
+            client = FakeClient(zipcode_html.read())
+        location = {"landwatchurl": "https://www.landwatch.com/Virginia_land_for_sale/Ivor/Land"}
+        listings = []
+        metrics = scrape_landwatch.ScrapeMetrics()
+
+        asyncio.run(
+            scrape_landwatch.stream_location_listings(
+                location,
+                con_limit=4,
+                proxies="luminati",
+                sessions=FakeSessions(client),
+                on_listing=listings.append,
+                metrics=metrics,
+            )
+        )
+
+        self.assertEqual(len(listings), 9)
+        self.assertEqual(metrics.summary()["speculative_pages_wasted"], 3)
+        self.assertEqual(metrics.summary()["pages"], 1)
+
+    def test_pages_planned_from_starting_url(self):
+        # city.html has no rel=next link to page from
+        with open(Path("tests/city.html")) as city_html:
+            client = FakeClient(city_html.read())
+        location = {"landwatchurl": "https://www.landwatch.com/Virginia_land_for_sale/Ivor/Land"}
+        listings = []
+
+        asyncio.run(
+            scrape_landwatch.stream_location_listings(
+                location,
+                con_limit=4,
+                proxies="luminati",
+                sessions=FakeSessions(client),
+                on_listing=listings.append,
+                speculative_pages=0,
+            )
+        )
+
+        # 154 results at 15 a page
+        starting_url = location["landwatchurl"]
+        self.assertEqual(
+            sorted(client.requested),
+            sorted([starting_url] + [f"{starting_url}/page-{page}" for page in range(2, 12)]),
+        )
+        self.assertEqual(len(listings), 11 * 15)
+
+    def test_stream_location_listings_lxml(self):
+        with open(Path("tests/county.html")) as county_html:
+            client = FakeClient(county_html.read())
+        location = {
+            "landwatchurl": "https://www.landwatch.com/Oklahoma_land_for_sale/Osage_County/Land"
+        }
+        listings = []
+
+        asyncio.run(
+            scrape_landwatch.stream_location_listings(
+                location,
+                con_limit=4,
+                proxies="luminati",
+                sessions=FakeSessions(client),
+                on_listing=listings.append,
+                parser="lxml",
+            )
+        )
+
+        self.assertEqual(len(listings), 13 * 15)
+        self.assertEqual(location["location"], "Osage_County-OK")
+
+    def test_pages_emitted_in_page_order(self):
+        location = {
+            "landwatchurl": "https://www.landwatch.com/Oklahoma_land_for_sale/Osage_County/Land"
+        }
+        for parse_workers in (None, 2):
+            with open(Path("tests/county.html")) as county_html:
+                client = ReversedPagesClient(county_html.read())
+            listings = []
+
+            asyncio.run(
+                scrape_landwatch.stream_location_listings(
+                    location,
+                    con_limit=13,
+                    proxies="luminati",
+                    sessions=FakeSessions(client),
+                    on_listing=listings.append,
+                    parser="lxml",
+                    parse_workers=parse_workers,
+                )
+            )
+
+            first_pids = [listing.pid for listing in listings[::15]]
+            self.assertEqual(first_pids, list(range(1, 14)), parse_workers)
+
+    @mock.patch.object(scrape_landwatch, "RETRY_WAIT", wait_none())
+    def test_resume_from_checkpoints(self):
+        location = {
+            "landwatchurl": "https://www.landwatch.com/Oklahoma_land_for_sale/Osage_County/Land"
+        }
+        with open(Path("tests/county.html")) as county_html:
+            html = county_html.read()
+
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            checkpoints = scrape_landwatch.LocalCheckpointStore(checkpoint_dir)
+            failing_client = FailingPageClient(html, failing_page_num=7)
+            with self.assertRaises(Exception):
+                asyncio.run(
+                    scrape_landwatch.stream_location_listings(
+                        location,
+                        con_limit=2,
+                        proxies="luminati",
+                        sessions=FakeSessions(failing_client),
+                        on_listing=lambda listing: None,
+                        parser="lxml",
+                        checkpoints=checkpoints,
+                    )
+                )
+            saved_pages = checkpoints.load(scrape_landwatch.checkpoint_key(location))
+            self.assertTrue(saved_pages)
+            self.assertNotIn(7, saved_pages)
+
+            client = ReversedPagesClient(html)
+            listings = []
+            asyncio.run(
+                scrape_landwatch.stream_location_listings(
+                    location,
+                    con_limit=4,
+                    proxies="luminati",
+                    sessions=FakeSessions(client),
+                    on_listing=listings.append,
+                    parser="lxml",
+                    checkpoints=checkpoints,
+                )
+            )
+
+        # Only the first page, the pages fetched alongside it before the
+        # checkpoint could be read, and the pages missing from the checkpoint
+        speculative_pages = set(range(1, scrape_landwatch.SPECULATIVE_PAGES + 1))
+        refetched_pages = set(range(1, 13)) - set(saved_pages) | speculative_pages
+        self.assertEqual(len(client.requested), 1 + len(refetched_pages))
+        first_pids = [listing.pid for listing in listings[::15]]
+        self.assertEqual(first_pids, list(range(1, 14)))
+
+    def test_resume_after_location_shrinks(self):
+        location = {
+            "landwatchurl": "https://www.landwatch.com/Oklahoma_land_for_sale/Osage_County/Land"
+        }
+        with open(Path("tests/county.html")) as county_html:
+            client = ReversedPagesClient(county_html.read())
+        run_key = scrape_landwatch.checkpoint_key({"location": "Osage_County-OK"})
+
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            checkpoints = scrape_landwatch.LocalCheckpointStore(checkpoint_dir)
+            # Saved when the location had 15 pages; it has 13 now
+            for page_num in range(1, 15):
+                page_listing = scrape_landwatch.Listing(
+                    f"https://www.landwatch.com/pid/{900000 + page_num}", 900000 + page_num
+                )
+                checkpoints.save_page(
+                    run_key, page_num, scrape_landwatch.ListingBatch([page_listing])
+                )
+            listings = []
+            asyncio.run(
+                scrape_landwatch.stream_location_listings(
+                    location,
+                    con_limit=4,
+                    proxies="luminati",
+                    sessions=FakeSessions(client),
+                    on_listing=listings.append,
+                    checkpoints=checkpoints,
+                )
+            )
+
+        # The speculative pages are used fresh, the rest up to page 12 come
+        # from the checkpoint, and the saved pages past the end are dropped
+        fresh_pages = 1 + scrape_landwatch.SPECULATIVE_PAGES
+        pids = [listing.pid for listing in listings]
+        self.assertEqual(len(pids), 15 * fresh_pages + 13 - fresh_pages)
+        self.assertEqual(pids[: 15 * fresh_pages : 15], list(range(1, fresh_pages + 1)))
+        self.assertEqual(
+            pids[15 * fresh_pages :],
+            [900000 + page_num for page_num in range(fresh_pages, 13)],
+        )
+
+    def test_response_cache_skips_refetch(self):
+        location = {
+            "landwatchurl": "https://www.landwatch.com/Oklahoma_land_for_sale/Osage_County/Land"
+        }
+        with open(Path("tests/county.html")) as county_html:
+            html = county_html.read()
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = scrape_landwatch.LocalResponseCache(cache_dir)
+            runs = []
+            for _ in range(2):
+                client = ReversedPagesClient(html)
+                listings = []
+                asyncio.run(
+                    scrape_landwatch.stream_location_listings(
+                        location,
+                        con_limit=4,
+                        proxies="luminati",
+                        sessions=FakeSessions(client),
+                        on_listing=listings.append,
+                        cache=cache,
+                    )
+                )
+                runs.append((client.requested, listings))
+
+        (first_requests, first_listings), (second_requests, second_listings) = runs
+        self.assertEqual(len(first_requests), 13)
+        self.assertEqual(second_requests, [])
+        self.assertEqual(second_listings, first_listings)
+
+
+class TestBatchMode(unittest.TestCase):
+    def test_discover_county_urls(self):
+        with open(Path("tests/state.html")) as state_html:
+            client = FakeClient(state_html.read())
+
+        for parser in ("soup", "lxml"):
+            county_urls = asyncio.run(
+                scrape_landwatch.discover_county_urls(
+                    "https://www.landwatch.com/Virginia_land_for_sale/Land",
+                    proxies="luminati",
+                    sessions=FakeSessions(client),
+                    limiter=scrape_landwatch.default_limiter(2),
+                    parser=parser,
+                )
+            )
+
+            # 127 counties by name and 12 independent cities and the like by search id
+            self.assertEqual(len(county_urls), 139, parser)
+            self.assertEqual(len(set(county_urls)), 139, parser)
+            self.assertEqual(
+                county_urls[0],
+                "https://www.landwatch.com/Virginia_land_for_sale/Franklin_County/Land",
+            )
+            # Emporia (City)
+            self.assertIn(
+                "https://www.landwatch.com/default.aspx?ct=R&type=5,77;6,1192;13,12;268,6843",
+                county_urls,
+                parser,
+            )
+            self.assertFalse(any("_Region/" in county_url for county_url in county_urls))
+
+    def test_parishes(self):
+        state_html = (
+            '<html><body><span class="refsubheading">Narrow By State Region</span><br />'
+            '<a href="/Louisiana_land_for_sale/North_Region/Land" mapId="North">North</a>'
+            '<span class="refsubheading">Narrow By Parish</span><br />'
+            '<a href="/Louisiana_land_for_sale/Caddo_Parish/Land" mapId="Caddo">Caddo</a>'
+            '<a href="/Louisiana_land_for_sale/Acadia_Parish/Land" mapId="Acadia">Acadia</a>'
+            '<span class="refsubheading">Narrow By City</span><br />'
+            '<a href="/Louisiana_land_for_sale/Shreveport/Land">Shreveport</a>'
+            "</body></html>"
+        )
+        for parser in ("soup", "lxml"):
+            backend = scrape_landwatch.get_parser_backend(parser)
+            self.assertEqual(
+                backend.get_county_urls(backend.parse(state_html)),
+                [
+                    "https://www.landwatch.com/Louisiana_land_for_sale/Caddo_Parish/Land",
+                    "https://www.landwatch.com/Louisiana_land_for_sale/Acadia_Parish/Land",
+                ],
+                parser,
+            )
+
+
+class TestBatchHandler(S3TestCase):
+    @mock.patch.object(scrape_landwatch, "RETRY_WAIT", wait_none())
+    def test_scrape_landwatch_batch(self):
+        with open(Path("tests/county.html")) as county_html:
+            client = CountyPagesClient(county_html.read(), failing_counties=("Kay",))
+        counties = ("Osage", "Kay", "Pawnee")
+        event = {
+            "starting_urls": [
+                f"https://www.landwatch.com/Oklahoma_land_for_sale/{county}_County/Land"
+                for county in counties
+            ],
+            "bucket": BUCKET,
+            "con_limit": 4,
+            "location_concurrency": 2,
+        }
+
+        with mock.patch.object(
+            scrape_landwatch, "event_sessions", return_value=FakeSessions(client)
+        ):
+            results = scrape_landwatch.scrape_landwatch_batch(event, None)["results"]
+        s3_objects = self.s3.list_objects_v2(Bucket=BUCKET)["Contents"]
+        keys = [s3_object["Key"] for s3_object in s3_objects]
+
+        # One failed location leaves the others to finish and upload
+        self.assertEqual([result["starting_url"] for result in results], event["starting_urls"])
+        self.assertEqual(results[0]["location"], "Osage_County-OK")
+        self.assertEqual(results[2]["location"], "Pawnee_County-OK")
+        self.assertIn("ConnectionError", results[1]["error"])
+        self.assertEqual(results[0]["metrics"]["listings"], 13 * 15)
+        # Every attempt at the first page, plus any at the pages fetched with it
+        self.assertEqual(results[1]["metrics"].get("pages_fetched", 0), 0)
+        self.assertGreaterEqual(
+            results[1]["metrics"]["request_errors"], scrape_landwatch.MAX_RETRIES_COUNT
+        )
+        self.assertNotIn("csv_url", results[1])
+        self.assertEqual(len(keys), 2)
+        for result in (results[0], results[2]):
+            self.assertTrue(result["csv_url"].endswith(f"{result['location']}.csv"))
+            self.assertIn(f"{result['location']}.csv", "".join(keys))
+
+    def test_batch_shares_one_parse_pool(self):
+        with open(Path("tests/county.html")) as county_html:
+            client = CountyPagesClient(county_html.read())
+        event = {
+            "starting_urls": [
+                f"https://www.landwatch.com/Oklahoma_land_for_sale/{county}_County/Land"
+                for county in ("Osage", "Kay", "Pawnee")
+            ],
+            "bucket": BUCKET,
+            "location_concurrency": 3,
+            "parse_workers": 2,
+            "emit_metrics": False,
+        }
+        pools = []
+
+        class RecordedPool(ThreadPoolExecutor):
+            # Threads stand in for processes; parse_page_listings runs in either
+            def __init__(self, max_workers):
+                super().__init__(max_workers=max_workers)
+                self.shut_down = False
+                pools.append(self)
+
+            def shutdown(self, wait=True):
+                self.shut_down = True
+                super().shutdown(wait=wait)
+
+        with mock.patch("concurrent.futures.ProcessPoolExecutor", RecordedPool):
+            with mock.patch.object(
+                scrape_landwatch, "event_sessions", return_value=FakeSessions(client)
+            ):
+                results = scrape_landwatch.scrape_landwatch_batch(event, None)["results"]
+
+        self.assertEqual([result["metrics"]["listings"] for result in results], [13 * 15] * 3)
+        self.assertEqual(len(pools), 1)
+        self.assertTrue(pools[0].shut_down)
+
+
+@mock.patch.object(scrape_landwatch, "RETRY_WAIT", wait_none())
+class TestShardedRun(S3TestCase):
+    def run_coordinator(self, shard_pages):
+        with open(Path("tests/county.html")) as county_html:
+            client = ReversedPagesClient(county_html.read())
+        event = {
+            "starting_url": "https://www.landwatch.com/Oklahoma_land_for_sale/Osage_County/Land",
+            "bucket": BUCKET,
+            "shard_pages": shard_pages,
+            "shard_queue": "local",
+            "emit_metrics": False,
+        }
+        with mock.patch.object(
+            scrape_landwatch, "event_sessions", return_value=FakeSessions(client)
+        ):
+            result = scrape_landwatch.scrape_landwatch_coordinator(event, None)
+        key = result["csv_url"].split(".s3.amazonaws.com/")[1]
+        csv_text = self.s3.get_object(Bucket=BUCKET, Key=key)["Body"].read().decode()
+        return result, key, csv_text
+
+    def test_coordinator_with_local_queue(self):
+        result, key, csv_text = self.run_coordinator(shard_pages=5)
+
+        self.assertEqual(result["location"], "Osage_County-OK")
+        self.assertEqual((result["pages"], result["shards"]), (13, 3))
+        self.assertTrue(key.endswith("Osage_County-OK.csv"))
+        self.assertEqual([shard["shard"] for shard in result["results"]], [0, 1, 2])
+        # Only the last worker to finish sees every shard and merges
+        self.assertEqual(result["results"][-1]["csv_url"], result["csv_url"])
+        self.assertNotIn("csv_url", result["results"][0])
+
+        rows = csv_text.splitlines()
+        self.assertEqual(rows[0].split(","), list(scrape_landwatch.LISTING_FIELDS))
+        self.assertEqual(len(rows), 1 + 13 * 15)
+        # The first listing of each page carries its page number as pid
+        first_pids = [rows[1 + page * 15].split(",")[1] for page in range(13)]
+        self.assertEqual(first_pids, [str(page) for page in range(1, 14)])
+
+    def test_rerun_same_day(self):
+        _, key, _ = self.run_coordinator(shard_pages=3)
+        # So the second run's output can't be mistaken for the first's
+        self.s3.delete_object(Bucket=BUCKET, Key=key)
+
+        result, _, csv_text = self.run_coordinator(shard_pages=5)
+
+        self.assertEqual(result["shards"], 3)
+        self.assertEqual(result["results"][-1]["csv_url"], result["csv_url"])
+        self.assertEqual(len(csv_text.splitlines()), 1 + 13 * 15)
+
+    def test_rejects_other_formats(self):
+        with self.assertRaises(ValueError):
+            scrape_landwatch.scrape_landwatch_coordinator(
+                {"starting_url": "x", "bucket": "b", "format": "parquet"}, None
+            )
+
+    def test_rejects_unsupported_options(self):
+        for option, value in (
+            ("delta", True),
+            ("summary", True),
+            ("store", "/tmp/listings.sqlite"),
+            ("checkpoint", "s3"),
+            ("stream_upload", True),
+        ):
+            with self.assertRaises(ValueError, msg=option):
+                scrape_landwatch.scrape_landwatch_coordinator(
+                    {"starting_url": "x", "bucket": "b", option: value}, None
+                )
+
+
+class TestHandlerOutputFormats(S3TestCase):
+    def scrape(self, fixture="county", **event):
+        with open(Path(f"tests/{fixture}.html")) as page_html:
+            client = FakeClient(page_html.read())
+        event.update(
+            starting_url="https://www.landwatch.com/Oklahoma_land_for_sale/Osage_County/Land",
+            bucket=BUCKET,
+            emit_metrics=False,
+        )
+        with mock.patch.object(
+            scrape_landwatch, "event_sessions", return_value=FakeSessions(client)
+        ):
+            result = scrape_landwatch.scrape_landwatch(event, None)
+        key = result["csv_url"].split(".s3.amazonaws.com/")[1]
+        return key, self.s3.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+
+    def test_delta_index_kept_when_upload_fails(self):
+        with mock.patch.object(
+            scrape_landwatch.S3CSVOutput, "finish", side_effect=OSError("upload failed")
+        ):
+            with self.assertRaises(OSError):
+                self.scrape(delta=True)
+        index_key = delta.index_s3_key({"location": "Osage_County-OK"})
+        with self.assertRaises(self.s3.exceptions.NoSuchKey):
+            self.s3.get_object(Bucket=BUCKET, Key=index_key)
+
+        key, body = self.scrape(delta=True)
+
+        self.assertTrue(key.endswith("-delta.csv"))
+        self.s3.get_object(Bucket=BUCKET, Key=index_key)
+
+    def test_missing_dependency_fails_up_front(self):
+        with mock.patch.object(scrape_landwatch.importlib.util, "find_spec", return_value=None):
+            with self.assertRaisesRegex(ImportError, "numpy"):
+                self.scrape(summary=True)
+            with self.assertRaisesRegex(ImportError, "numpy"):
+                scrape_landwatch.scrape_landwatch_batch(
+                    {"starting_urls": [], "bucket": BUCKET, "summary": True}, None
+                )
+            with self.assertRaisesRegex(ImportError, "pyarrow"):
+                self.scrape(format="parquet")
+        self.assertEqual(self.s3.list_objects_v2(Bucket=BUCKET)["KeyCount"], 0)
+
+    def test_failed_finish_publishes_nothing(self):
+        with mock.patch.object(
+            scrape_landwatch.DeltaListingFilter, "finish", side_effect=OSError("index failed")
+        ):
+            with self.assertRaises(OSError):
+                self.scrape(delta=True, stream_upload=True)
+        self.assertEqual(self.s3.list_objects_v2(Bucket=BUCKET)["KeyCount"], 0)
+        uploads = self.s3.list_multipart_uploads(Bucket=BUCKET)
+        self.assertEqual(uploads.get("Uploads", []), [])
+
+    def test_delta_index_loaded_off_the_loop(self):
+        threads = []
+        load_previous_index = scrape_landwatch.load_previous_index
+
+        def load(**kwargs):
+            threads.append(threading.current_thread())
+            return load_previous_index(**kwargs)
+
+        with mock.patch.object(scrape_landwatch, "load_previous_index", side_effect=load):
+            self.scrape(delta=True)
+
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+    def test_parquet(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest("pyarrow not installed")
+
+        key, body = self.scrape(format="parquet")
+
+        self.assertTrue(key.endswith("Osage_County-OK.parquet"))
+        table = pq.read_table(io.BytesIO(body))
+        self.assertEqual(table.num_rows, 13 * 15)
+        self.assertEqual(str(table.schema.field("price").type), "int64")
+        self.assertEqual(str(table.schema.field("acres").type), "double")
+
+    def test_csv_gz_with_nulls(self):
+        # The zipcode page has listings without a description or an office
+        _, body = self.scrape("zipcode", format="csv")
+        self.assertIn("OfficeNameNotPresent", body.decode())
+
+        key, body = self.scrape("zipcode", format="csv.gz", null_sentinels=True)
+
+        self.assertTrue(key.endswith(".csv.gz"))
+        csv_text = gzip.decompress(body).decode()
+        self.assertEqual(len(csv_text.splitlines()), 1 + 9)
+        self.assertNotIn("NotPresent", csv_text)
+        self.assertNotIn("OfficeStatusBlank", csv_text)
+
+    def test_listing_store(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store_path = str(Path(tmp_dir) / "listings.sqlite")
+            self.scrape(store=store_path)
+
+            with scrape_landwatch.ListingStore(store_path) as store:
+                # Every page the fake client serves has the same 15 listings
+                self.assertEqual(store.count(), 15)
+                rows = store.query(locations=["Osage_County-OK"])
+        self.assertEqual(len(rows), 15)
+        self.assertEqual(rows[0]["scrape_date"], str(scrape_landwatch.date.today()))
+
+    def test_market_summary(self):
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            self.skipTest("numpy not installed")
+
+        key, body = self.scrape(summary=True)
+
+        summary_key = key.replace(".csv", "-summary.json")
+        summary_body = self.s3.get_object(Bucket=BUCKET, Key=summary_key)["Body"]
+        summary = json.loads(summary_body.read())
+        self.assertEqual(summary["listings"], 13 * 15)
+        self.assertEqual(summary["price"]["count"], 13 * 15)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            self.scrape(format="xlsx")
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,94 @@
+# Built-in
+import json
+import unittest
+from unittest import mock
+
+# Local imports
+from s3_test_case import S3TestCase
+import sharding
+
+
+class TestPlanShards(unittest.TestCase):
+    def test_ranges_cover_every_page(self):
+        self.assertEqual(sharding.plan_shards(13, 5), [[0, 5], [5, 10], [10, 13]])
+        self.assertEqual(sharding.plan_shards(1, 50), [[0, 1]])
+        shards = sharding.plan_shards(1234, 50)
+        pages = [page for start, stop in shards for page in range(start, stop)]
+        self.assertEqual(pages, list(range(1234)))
+
+
+class TestShardQueues(unittest.TestCase):
+    def test_local_queue_runs_on_drain(self):
+        handled = []
+        queue = sharding.LocalShardQueue(lambda message, context: handled.append(message) or 1)
+        queue.send({"shard": 0})
+        queue.send({"shard": 1})
+        self.assertEqual(handled, [])
+
+        self.assertEqual(queue.drain(), [1, 1])
+        self.assertEqual(handled, [{"shard": 0}, {"shard": 1}])
+        self.assertEqual(queue.drain(), [])
+
+    def test_lambda_queue_invokes_async(self):
+        lambda_client = mock.Mock()
+        queue = sharding.LambdaShardQueue("worker", lambda_client=lambda_client)
+        queue.send({"shard": 2})
+
+        kwargs = lambda_client.invoke.call_args.kwargs
+        self.assertEqual(kwargs["FunctionName"], "worker")
+        self.assertEqual(kwargs["InvocationType"], "Event")
+        self.assertEqual(json.loads(kwargs["Payload"]), {"shard": 2})
+
+
+class TestMergeShards(S3TestCase):
+    def test_merge_in_shard_order(self):
+        shard_bodies = [b"a,b\r\n1,2\r\n", b"", b"a,b\r\n3,4\r\n5,6\r\n"]
+        # Written out of order, as workers finish
+        for shard_num in (2, 0, 1):
+            self.s3.put_object(
+                Bucket="landtoolsai-test",
+                Key=sharding.shard_key("run", "a1", shard_num),
+                Body=shard_bodies[shard_num],
+            )
+        # An earlier run of the same key, with more shards
+        for shard_num in range(5):
+            self.s3.put_object(
+                Bucket="landtoolsai-test",
+                Key=sharding.shard_key("run", "z9", shard_num),
+                Body=b"a,b\r\n7,8\r\n",
+            )
+        self.assertEqual(
+            sharding.completed_shards(
+                s3=self.s3, bucket="landtoolsai-test", run_key="run", run_id="a1"
+            ),
+            {0, 1, 2},
+        )
+
+        key = sharding.merge_shards(
+            s3=self.s3,
+            bucket="landtoolsai-test",
+            run_key="run",
+            run_id="a1",
+            num_of_shards=3,
+            key="run.csv",
+            header=b"a,b\r\n",
+        )
+
+        body = self.s3.get_object(Bucket="landtoolsai-test", Key=key)["Body"].read()
+        self.assertEqual(body, b"a,b\r\n1,2\r\n3,4\r\n5,6\r\n")
+
+    def test_all_shards_written(self):
+        for shard_num in (0, 2, 3):
+            self.s3.put_object(
+                Bucket="landtoolsai-test",
+                Key=sharding.shard_key("run", "a1", shard_num),
+                Body=b"",
+            )
+        shards = dict(s3=self.s3, bucket="landtoolsai-test", run_key="run", run_id="a1")
+        # As many shards as expected, but not the right ones
+        self.assertFalse(sharding.all_shards_written(num_of_shards=3, **shards))
+        self.assertTrue(sharding.all_shards_written(num_of_shards=1, **shards))
+
+
+if __name__ == "__main__":
+    unittest.main()